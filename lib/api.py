@@ -0,0 +1,260 @@
+# lib/api.py
+
+"""
+JSON-ready views of the catalog queries, built on Car.to_dict.
+Shared by the HTTP service and the scripted command line.
+"""
+
+import math
+from itertools import islice
+from models.car import Car, RANGE_COLUMNS
+from models import comparison, facets, histograms
+from models.collection import Collection
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# SQLite integers are signed 64-bit; larger IDs can't be looked up at all
+MIN_CAR_ID = -2 ** 63
+MAX_CAR_ID = 2 ** 63 - 1
+
+# name -> (Car filter key, converter) for filters given as strings
+FILTERS = {
+    'make': ('make', str),
+    'fuel_type': ('fuel_type', str),
+    'is_custom': ('is_custom', lambda value: int(value.strip().lower() in ('1', 'true', 'yes', 'y'))),
+    'min_year': ('year >=', int),
+    'max_year': ('year <=', int),
+    'min_price': ('price >=', float),
+    'max_price': ('price <=', float),
+    'min_horsepower': ('horsepower >=', int),
+    'max_horsepower': ('horsepower <=', int),
+}
+
+def car_id_param(value):
+    """
+    Parse a car ID given as a string or number.
+    
+    Raises:
+        ValueError: If it isn't an integer SQLite can store
+    """
+    try:
+        car_id = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid car ID: {value!r}") from None
+    if not MIN_CAR_ID <= car_id <= MAX_CAR_ID:
+        raise ValueError(f"Car ID out of range: {value}")
+    return car_id
+
+def parse_filters(params):
+    """Turn string parameters such as min_year=2015 into a Car filter dict"""
+    where = {}
+    for name, value in params.items():
+        if name in FILTERS and value not in (None, ''):
+            key, convert = FILTERS[name]
+            try:
+                where[key] = convert(value)
+            except ValueError:
+                raise ValueError(f"Invalid value for {name}: {value!r}")
+    return where
+
+def browse(where=None, after_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of cars in make/model order.
+    
+    Pass the returned 'next_after' back as after_id to get the next page;
+    it is None on the last page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    after = None
+    if after_id is not None:
+        anchor = Car.get_by_id(car_id_param(after_id))
+        if anchor is None:
+            raise ValueError(f"Unknown page cursor: {after_id}")
+        after = (anchor.make, anchor.model, anchor.id)
+    
+    cars = list(islice(Car.iter_all(batch_size=limit, where=where, after=after), limit))
+    return {
+        'cars': [car.to_dict() for car in cars],
+        'next_after': cars[-1].id if len(cars) == limit else None,
+    }
+
+def faceted_browse(selection=None, after_id=None, limit=facets.DEFAULT_PAGE_SIZE):
+    """
+    Facet counts for a drill-down selection plus one page of its cars.
+    
+    selection holds make, fuel_type, is_custom, year (first year of a
+    decade) and/or price (bucket number), as returned in the facet values.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    after = None
+    if after_id is not None:
+        anchor = Car.get_by_id(car_id_param(after_id))
+        if anchor is None:
+            raise ValueError(f"Unknown page cursor: {after_id}")
+        after = (anchor.make, anchor.model, anchor.id)
+    
+    page = facets.browse(selection, after=after, page_size=limit)
+    return {
+        'facets': page['facets'],
+        'total': page['total'],
+        'cars': [car.to_dict() for car in page['cars']],
+        'next_after': page['next_after'][2] if page['next_after'] else None,
+    }
+
+def parse_selection(params):
+    """Turn string parameters into a facet selection"""
+    selection = {}
+    for name in ('make', 'fuel_type', 'is_custom', 'year', 'price'):
+        value = params.get(name)
+        if value in (None, ''):
+            continue
+        if name == 'is_custom':
+            selection[name] = FILTERS['is_custom'][1](value)
+        elif name in ('year', 'price'):
+            try:
+                selection[name] = int(value)
+            except ValueError:
+                raise ValueError(f"Invalid value for {name}: {value!r}")
+        else:
+            selection[name] = value
+    return selection
+
+def range_query(where=None, order_by='price', descending=False, after_id=None, limit=DEFAULT_PAGE_SIZE,
+                estimate_only=False):
+    """
+    Cars within price, horsepower and year ranges, ordered by one of them,
+    with the number of matches estimated from the histograms.
+    
+    where is a Car filter dict as returned by parse_filters. Pass the
+    returned 'next_after' back as after_id to get the next page.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    ranges = {column: (None, None) for column in RANGE_COLUMNS}
+    equal = {}
+    for key, value in (where or {}).items():
+        column, _, operator = key.partition(' ')
+        if column in ranges and operator in ('>=', '<='):
+            low, high = ranges[column]
+            ranges[column] = (value, high) if operator == '>=' else (low, value)
+        elif not operator and column in ('make', 'fuel_type', 'is_custom'):
+            equal[column] = value
+        else:
+            raise ValueError(f"Unsupported range filter: {key!r}")
+    
+    result = {'estimated_total': histograms.estimate_count(ranges, equal)}
+    if estimate_only:
+        return result
+    after = None
+    if after_id is not None:
+        anchor = Car.get_by_id(car_id_param(after_id))
+        if anchor is None:
+            raise ValueError(f"Unknown page cursor: {after_id}")
+        after = (getattr(anchor, order_by), anchor.id)
+    cars = Car.range_query(order_by=order_by, descending=descending, limit=limit, after=after, **ranges, **equal)
+    result['cars'] = [car.to_dict() for car in cars]
+    result['next_after'] = cars[-1].id if len(cars) == limit else None
+    return result
+
+def distribution(column, bins=10, where=None):
+    """
+    Percentiles of price, horsepower or year, plus estimated cars per
+    equal-width bin.
+    
+    Unfiltered distributions come straight from the histogram; with
+    filters the percentiles are exact and no bins are returned.
+    """
+    if not where:
+        result = histograms.distribution(column, int(bins))
+        result['percentiles'] = {f"p{round(fraction * 100)}": value for fraction, value in result['percentiles'].items()}
+        return result
+    values = histograms.percentiles(column, histograms.DISTRIBUTION_PERCENTILES, where)
+    return {
+        'column': column,
+        'percentiles': {f"p{round(fraction * 100)}": value for fraction, value in values.items()},
+        'bins': [],
+    }
+
+def details(car_id):
+    """A single car as a dict, or None if it doesn't exist"""
+    car = Car.get_by_id(car_id_param(car_id))
+    return car.to_dict() if car else None
+
+def search(query, limit=DEFAULT_PAGE_SIZE, offset=0, fuzzy=False):
+    """
+    Full-text search results, best match first.
+    
+    With fuzzy, misspelt words match too and each car carries its
+    similarity 'score' (0-1).
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    offset = max(0, int(offset))
+    if fuzzy:
+        matches = Car.fuzzy_search(query, limit=offset + limit)[offset:]
+        return {'query': query, 'cars': [dict(car.to_dict(), score=round(score, 3)) for car, score in matches]}
+    cars = Car.search(query, limit=limit, offset=offset)
+    return {'query': query, 'cars': [car.to_dict() for car in cars]}
+
+def compare(ids, metrics=comparison.DEFAULT_METRICS):
+    """Side-by-side metrics and winners for any number of car IDs"""
+    ids = [car_id_param(car_id) for car_id in ids]
+    result = comparison.compare(ids, metrics)
+    return {
+        'cars': [car.to_dict() if car else None for car in result['cars']],
+        'metrics': {metric: [_number(value) for value in values] for metric, values in result['metrics'].items()},
+        'winners': result['winners'],
+    }
+
+def rank(metric, k=10, where=None):
+    """The top k cars by a comparison metric"""
+    return {
+        'metric': metric,
+        'cars': [dict(car.to_dict(), value=_number(value)) for car, value in comparison.rank(metric, int(k), where)],
+    }
+
+def stats(is_custom=None, make=None):
+    """Collection statistics with the most expensive car as a dict"""
+    return _stats_dict(Car.get_collection_stats(is_custom=is_custom, make=make))
+
+def collection(user=None, offset=0, limit=DEFAULT_PAGE_SIZE):
+    """One page of a user's collection, in make/model order, with each car's added_at"""
+    offset, limit = int(offset), max(1, min(int(limit), MAX_PAGE_SIZE))
+    user_collection = Collection.for_user(user)
+    page = list(islice(user_collection.items(), offset, offset + limit + 1))
+    return {
+        'user': user_collection.user,
+        'name': user_collection.name,
+        'total': len(user_collection),
+        'cars': [dict(car.to_dict(), added_at=added_at) for car, added_at in page[:limit]],
+        'next_offset': offset + limit if len(page) > limit else None,
+    }
+
+def collection_stats(user=None):
+    """Statistics for a user's collection, shaped like stats()"""
+    return _stats_dict(Collection.for_user(user).stats())
+
+def add_to_collection(car_id, user=None):
+    """Add a car to a user's collection; returns the car with whether it was newly added"""
+    car = Car.get_by_id(car_id_param(car_id))
+    if car is None:
+        raise ValueError(f"No car found with ID {car_id}")
+    added = Collection.for_user(user).add(car)
+    return dict(car.to_dict(), added=added)
+
+def remove_from_collection(car_id, user=None):
+    """Remove a car from a user's collection; returns the removed car"""
+    car = Car.get_by_id(car_id_param(car_id))
+    if car is None or not Collection.for_user(user).remove(car):
+        raise ValueError(f"No car with ID {car_id} in your collection")
+    return car.to_dict()
+
+def _stats_dict(result):
+    most_expensive = result['most_expensive']
+    if most_expensive:
+        make_name, model, price = most_expensive
+        result['most_expensive'] = {'make': make_name, 'model': model, 'price': price}
+    return result
+
+def _number(value):
+    """JSON has no NaN, so undefined metrics become null"""
+    return None if value is None or math.isnan(value) else value
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# lib/benchmark.py
+
+"""
+Benchmarks for Virtual Car Collection Manager
+Run from the project root, e.g. `python lib/benchmark.py startup --rows 100000`
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+
+LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imports the CLI and draws the first menu, printing the elapsed seconds to stderr
+STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import cli
+cli.menu()
+sys.stderr.write(f"{time.perf_counter() - start}\\n")
+"""
+
+SYNTHETIC_MAKES = ['Ferrari', 'Lamborghini', 'McLaren', 'Porsche', 'Tesla', 'BMW', 'Audi', 'Ford', 'Nissan', 'Toyota']
+SYNTHETIC_FUELS = ['Gasoline', 'Gasoline', 'Gasoline', 'Electric', 'Hybrid', 'Diesel']
+
+def synthetic_cars(count, seed=42):
+    """Yield reproducible random car records"""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            'make': rng.choice(SYNTHETIC_MAKES),
+            'model': f"Model {i}",
+            'year': rng.randint(1990, 2024),
+            'engine': f"{rng.randint(10, 80) / 10:.1f}L V{rng.choice((6, 8, 10, 12))}",
+            'horsepower': rng.randint(80, 1500),
+            'price': round(rng.uniform(15000, 3000000), 2),
+            'fuel_type': rng.choice(SYNTHETIC_FUELS),
+            'is_custom': rng.random() < 0.01,
+        }
+
+def build_database(path, rows):
+    """Create a database at path holding the sample cars plus rows synthetic cars"""
+    env = dict(os.environ, CAR_COLLECTION_DB=path)
+    script = (
+        "import sys\n"
+        "from benchmark import synthetic_cars\n"
+        "from models.car import Car\n"
+        f"Car.bulk_insert(synthetic_cars({rows}), defer_indexes=True)\n"
+    )
+    subprocess.run([sys.executable, '-c', script], cwd=LIB_DIR, env=env, check=True)
+
+def time_startup(path, runs):
+    """Start the CLI in fresh interpreters and time import plus first menu render"""
+    env = dict(os.environ, CAR_COLLECTION_DB=path)
+    to_menu = []
+    wall = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=LIB_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        wall.append(time.perf_counter() - start)
+        to_menu.append(float(result.stderr.strip().splitlines()[-1]))
+    return to_menu, wall
+
+def startup_benchmark(rows, runs):
+    """Report CLI time-to-first-menu against an empty and a large database"""
+    print("⏱️  CLI Startup Benchmark")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        empty_db = os.path.join(tmp, 'empty.db')
+        large_db = os.path.join(tmp, 'large.db')
+        print(f"Building a database with {rows:,} synthetic cars...")
+        build_database(large_db, rows)
+        
+        for label, path in (('Empty database', empty_db), (f'{rows:,} cars', large_db)):
+            to_menu, wall = time_startup(path, runs)
+            print(f"\n{label}:")
+            print(f"  Import + first menu: median {statistics.median(to_menu) * 1000:.2f} ms, "
+                  f"max {max(to_menu) * 1000:.2f} ms")
+            print(f"  Whole process:       median {statistics.median(wall) * 1000:.2f} ms")
+        
+        print(f"\nDatabase file created on first query: {os.path.exists(empty_db)}")
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def _client(cars, rng, remaining, latencies, max_id):
+    """Issue a mix of catalog requests until the shared budget runs out"""
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        roll = rng.random()
+        start = time.perf_counter()
+        if roll < 0.5:
+            await cars.get_by_id(rng.randint(1, max_id))
+        elif roll < 0.7:
+            await cars.search(rng.choice(SYNTHETIC_MAKES)[:3], limit=20)
+        elif roll < 0.8:
+            await cars.get_collection_stats()
+        else:
+            async for _ in cars.iter_all(batch_size=50, where={'make': rng.choice(SYNTHETIC_MAKES)}):
+                break
+        latencies.append(time.perf_counter() - start)
+
+async def _loop_lag(stop, lags, interval=0.005):
+    """Measure how late the event loop wakes a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+async def run_load(workers, clients, requests, max_id):
+    """Drive AsyncCar with concurrent clients; return (seconds, latencies, loop lags)"""
+    from models.async_car import AsyncCar
+    
+    latencies = []
+    lags = []
+    remaining = [requests]
+    stop = asyncio.Event()
+    async with AsyncCar(max_workers=workers) as cars:
+        await cars.get_by_id(1)  # open the schema before timing
+        ticker = asyncio.ensure_future(_loop_lag(stop, lags))
+        start = time.perf_counter()
+        await asyncio.gather(*(_client(cars, random.Random(seed), remaining, latencies, max_id)
+                               for seed in range(clients)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+    return elapsed, latencies, lags
+
+def async_benchmark(rows, clients, requests, worker_counts):
+    """Report AsyncCar throughput and latency for several executor sizes"""
+    print("⏱️  Async Load Test")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'load.db')
+        print(f"Building a database with {rows:,} synthetic cars...")
+        build_database(path, rows)
+        
+        # The models package reads the database path when first imported
+        os.environ['CAR_COLLECTION_DB'] = path
+        from models.car import Car
+        
+        print(f"{clients} concurrent clients, {requests:,} requests per run "
+              f"(50% get_by_id, 20% search, 10% stats, 20% browse page)\n")
+        print(f"{'Workers':>7}  {'Req/s':>9}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'Max loop lag ms':>15}")
+        for workers in worker_counts:
+            Car.cache.clear()
+            elapsed, latencies, lags = asyncio.run(run_load(workers, clients, requests, rows))
+            print(f"{workers:>7}  {requests / elapsed:>9,.0f}  "
+                  f"{percentile(latencies, 0.5) * 1000:>8.2f}  {percentile(latencies, 0.95) * 1000:>8.2f}  "
+                  f"{percentile(latencies, 0.99) * 1000:>8.2f}  {max(lags, default=0) * 1000:>15.2f}")
+
+# Operations below this many milliseconds are too noisy to flag on timing alone
+REGRESSION_FLOOR_MS = 0.05
+
+def time_operation(operation, runs, setup=None):
+    """Run operation runs times and return each duration in seconds"""
+    durations = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def peak_memory(operation, setup=None):
+    """Peak bytes allocated by Python during one run of operation"""
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        operation()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure_operations(rows, iterations, workdir, seed=7):
+    """
+    Time the model and helper operations against the current database.
+    
+    Runs in a child process whose CAR_COLLECTION_DB points at a copy of a
+    synthetic catalog of rows cars. Returns {operation: summary}.
+    """
+    from models.car import Car
+    from models import export
+    
+    rng = random.Random(seed)
+    fresh = iter(synthetic_cars(10 ** 9, seed=seed + 1))
+    
+    def car_from(record):
+        return Car(record['make'], record['model'], record['year'], record['engine'],
+                   record['horsepower'], record['price'], record['fuel_type'], is_custom=True)
+    
+    def search_term():
+        if rng.random() < 0.5:
+            return rng.choice(SYNTHETIC_MAKES)
+        return f"Model {rng.randint(0, max(rows - 1, 0))}"
+    
+    export_path = os.path.join(workdir, 'export.csv')
+    # name: (operation, runs, setup)
+    operations = {
+        'get_by_id': (lambda: Car.get_by_id(rng.randint(1, rows)), iterations * 10, Car.cache.clear),
+        'get_by_id_cached': (lambda: Car.get_by_id(1), iterations * 10, None),
+        'search': (lambda: Car.search(search_term(), limit=20), iterations, None),
+        'get_collection_stats': (Car.get_collection_stats, iterations, None),
+        'get_collection': (lambda: list(Car.get_collection()), max(1, iterations // 10), None),
+        'get_all': (Car.get_all, 1 if rows > 1000000 else max(1, iterations // 10), None),
+        'save': (lambda: car_from(next(fresh)).save(), iterations, None),
+        'bulk_insert_10k': (lambda: Car.bulk_insert(islice(fresh, 10000)), 3, None),
+        'export_csv': (lambda: export.export_cars(export_path, fmt='csv'), 1, None),
+    }
+    
+    Car.get_by_id(1)  # open the database and run any migrations before timing
+    results = {}
+    for name, (operation, runs, setup) in operations.items():
+        durations = time_operation(operation, runs, setup)
+        results[name] = {
+            'runs': runs,
+            'mean_ms': statistics.mean(durations) * 1000,
+            'p50_ms': percentile(durations, 0.5) * 1000,
+            'p95_ms': percentile(durations, 0.95) * 1000,
+            'p99_ms': percentile(durations, 0.99) * 1000,
+            'peak_bytes': peak_memory(operation, setup),
+        }
+    return results
+
+def suite_database(rows, data_dir):
+    """Path of a reusable synthetic catalog, building it on first use"""
+    path = os.path.join(data_dir, f'cars_{rows}.db')
+    if not os.path.exists(path):
+        print(f"Building a database with {rows:,} synthetic cars (cached in {data_dir})...")
+        os.makedirs(data_dir, exist_ok=True)
+        partial_path = path + '.building'
+        build_database(partial_path, rows)
+        subprocess.run([sys.executable, '-c',
+                        "import sqlite3, sys\n"
+                        "sqlite3.connect(sys.argv[1]).execute('PRAGMA wal_checkpoint(TRUNCATE)')\n", partial_path],
+                       check=True)
+        os.replace(partial_path, path)
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(partial_path + suffix):
+                os.remove(partial_path + suffix)
+    return path
+
+def run_suite(rows, iterations, data_dir):
+    """Measure every operation in a fresh interpreter on a scratch copy of the catalog"""
+    source = suite_database(rows, data_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cars.db')
+        shutil.copyfile(source, path)
+        env = dict(os.environ, CAR_COLLECTION_DB=path)
+        script = (
+            "import json, sys\n"
+            "from benchmark import measure_operations\n"
+            f"json.dump(measure_operations({rows}, {iterations}, {tmp!r}), sys.stdout)\n"
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=LIB_DIR, env=env,
+                                stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(result.stdout)
+
+def compare_to_baseline(results, baseline, threshold):
+    """Return (rows, operation, metric, baseline, current) for each regression"""
+    regressions = []
+    for rows, operations in results.items():
+        for name, current in operations.items():
+            previous = baseline.get(rows, {}).get(name)
+            if not previous:
+                continue
+            if (current['p50_ms'] > previous['p50_ms'] * (1 + threshold)
+                    and current['p50_ms'] - previous['p50_ms'] > REGRESSION_FLOOR_MS):
+                regressions.append((rows, name, 'p50_ms', previous['p50_ms'], current['p50_ms']))
+            if current['peak_bytes'] > previous['peak_bytes'] * (1 + threshold) + 4096:
+                regressions.append((rows, name, 'peak_bytes', previous['peak_bytes'], current['peak_bytes']))
+    return regressions
+
+def suite_benchmark(sizes, iterations, data_dir, baseline_path=None, save_baseline=None, threshold=0.25):
+    """Run the operation suite for each catalog size and check it against a baseline"""
+    print("⏱️  Model & Helpers Benchmark Suite")
+    print("=" * 78)
+    
+    results = {}
+    for rows in sizes:
+        results[str(rows)] = run_suite(rows, iterations, data_dir)
+    
+    baseline = {}
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    
+    for rows, operations in results.items():
+        print(f"\n{int(rows):,} cars")
+        print(f"{'Operation':<22}{'Runs':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'Peak KiB':>11}{'vs base':>9}")
+        for name, summary in operations.items():
+            previous = baseline.get(rows, {}).get(name)
+            change = f"{(summary['p50_ms'] / previous['p50_ms'] - 1) * 100:+.0f}%" if previous and previous['p50_ms'] else ''
+            print(f"{name:<22}{summary['runs']:>6}{summary['p50_ms']:>11.3f}{summary['p95_ms']:>11.3f}"
+                  f"{summary['p99_ms']:>11.3f}{summary['peak_bytes'] / 1024:>11,.0f}{change:>9}")
+    
+    if save_baseline:
+        with open(save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'iterations': iterations, 'results': results}, f, indent=2)
+        print(f"\n💾 Baseline saved to {save_baseline}")
+    
+    if not baseline:
+        return 0
+    regressions = compare_to_baseline(results, baseline, threshold)
+    if not regressions:
+        print(f"\n✅ No regressions beyond {threshold:.0%} of the baseline")
+        return 0
+    print(f"\n❌ {len(regressions)} regression(s) beyond {threshold:.0%} of the baseline:")
+    for rows, name, metric, previous, current in regressions:
+        print(f"   {int(rows):,} cars / {name}: {metric} {previous:,.3f} -> {current:,.3f}")
+    return 1
+
+def main():
+    """Parse arguments and run the requested benchmark"""
+    parser = argparse.ArgumentParser(description="Virtual Car Collection Manager benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    
+    startup = subparsers.add_parser('startup', help="time CLI import and first menu render")
+    startup.add_argument('--rows', type=int, default=100000, help="synthetic cars in the large database")
+    startup.add_argument('--runs', type=int, default=10, help="interpreter launches per database")
+    
+    load = subparsers.add_parser('async', help="concurrent request throughput through AsyncCar")
+    load.add_argument('--rows', type=int, default=100000, help="synthetic cars in the database")
+    load.add_argument('--clients', type=int, default=50, help="concurrent asyncio clients")
+    load.add_argument('--requests', type=int, default=5000, help="requests per run")
+    load.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="executor sizes to compare")
+    
+    suite = subparsers.add_parser('suite', help="time model/helper operations and compare with a baseline")
+    suite.add_argument('--rows', type=int, nargs='+', default=[10000], help="catalog sizes, e.g. 10000 1000000 10000000")
+    suite.add_argument('--iterations', type=int, default=50, help="base runs per operation")
+    suite.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'car_collection_benchmark'),
+                       help="where generated catalogs are cached between runs")
+    suite.add_argument('--baseline', help="baseline JSON to compare against")
+    suite.add_argument('--save-baseline', metavar='PATH', help="write these results as a new baseline")
+    suite.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    
+    args = parser.parse_args()
+    if args.benchmark == 'suite':
+        sys.exit(suite_benchmark(args.rows, args.iterations, args.data_dir, args.baseline,
+                                 args.save_baseline, args.threshold))
+    if args.benchmark == 'startup':
+        startup_benchmark(args.rows, args.runs)
+    elif args.benchmark == 'async':
+        async_benchmark(args.rows, args.clients, args.requests, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
 #!/usr/bin/env python3
 # lib/cli.py
 
+"""
+Run with no arguments for the interactive menu, or pass a command for
+scripted use, e.g. `python lib/cli.py search Ferrari --json`.
+`python lib/cli.py batch commands.txt` runs one command per line in a
+single process and prints one JSON result per line.
+"""
+
+import argparse
+import json
+import shlex
+import sqlite3
+import sys
+
+import api
+from models import comparison, export, use_database
+from models.snapshot import open_snapshot
 from helpers import (
     exit_program,
     browse_available_cars,
@@ -12,7 +28,10 @@ from helpers import (
     view_collection_stats,
     export_collection,
     remove_from_collection,
-    display_car_details
+    display_car_details,
+    import_cars,
+    import_car_file,
+    rank_cars
 )
 
 def main():
@@ -46,8 +65,12 @@ def main():
             remove_from_collection()
         elif choice == "10":
             export_collection()
+        elif choice == "11":
+            import_cars()
+        elif choice == "12":
+            rank_cars()
         else:
-            print("❌ Invalid choice. Please select a valid option (0-10).")
+            print("❌ Invalid choice. Please select a valid option (0-12).")
         
         if choice != "0":
             input("\nPress Enter to continue...")
@@ -71,12 +94,306 @@ def menu():
     print("   9. Remove car from collection")
     print()
     print("📊 ANALYSIS & TOOLS:")
-    print("   6. Compare two cars")
+    print("   6. Compare cars")
     print("   7. View collection statistics")
     print("   10. Export my collection")
+    print("   11. Import cars from file")
+    print("   12. Rank cars by performance or value")
     print()
     print("   0. Exit program")
     print("=" * 60)
 
+class CommandError(Exception):
+    """A scripted command could not be parsed"""
+
+class CommandParser(argparse.ArgumentParser):
+    """ArgumentParser that raises instead of exiting, so batch mode can carry on"""
+    
+    def error(self, message):
+        raise CommandError(message)
+
+def build_parser():
+    """Argument parser for the scripted subcommands"""
+    parser = CommandParser(prog='cli.py', description="Virtual Car Collection Manager. "
+                           "Run without a command for the interactive menu.")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    
+    def command(name, help_text):
+        subparser = commands.add_parser(name, help=help_text)
+        subparser.add_argument('--json', action='store_true', help="print machine-readable JSON")
+        return subparser
+    
+    def filters(subparser):
+        for name in api.FILTERS:
+            subparser.add_argument(f"--{name.replace('_', '-')}", dest=name, metavar='VALUE')
+    
+    def snapshot(subparser):
+        subparser.add_argument('--snapshot', metavar='PATH', help="read the stock cars from a catalog snapshot")
+    
+    browse = command('browse', "list one page of cars in make/model order")
+    filters(browse)
+    browse.add_argument('--after', type=int, metavar='ID', help="continue after this car (the previous page's next_after)")
+    browse.add_argument('--limit', type=int, default=api.DEFAULT_PAGE_SIZE)
+    snapshot(browse)
+    
+    facet = command('facets', "facet counts and one page of cars for a drill-down")
+    facet.add_argument('--make')
+    facet.add_argument('--fuel-type', dest='fuel_type')
+    facet.add_argument('--year', help="first year of a decade, e.g. 2010")
+    facet.add_argument('--price', help="price bucket number from the price facet")
+    facet.add_argument('--is-custom', dest='is_custom')
+    facet.add_argument('--after', type=int, metavar='ID')
+    facet.add_argument('--limit', type=int, default=20)
+    snapshot(facet)
+    
+    range_command = command('range', "cars within price/horsepower/year ranges, with an estimated count")
+    filters(range_command)
+    range_command.add_argument('--order-by', dest='order_by', choices=list(api.RANGE_COLUMNS), default='price')
+    range_command.add_argument('--desc', action='store_true', help="highest values first")
+    range_command.add_argument('--after', type=int, metavar='ID', help="continue after this car (the previous page's next_after)")
+    range_command.add_argument('--limit', type=int, default=api.DEFAULT_PAGE_SIZE)
+    range_command.add_argument('--estimate', action='store_true', help="only estimate how many cars match")
+    snapshot(range_command)
+    
+    distribution = command('distribution', "percentiles and a histogram of price, horsepower or year")
+    distribution.add_argument('column', choices=list(api.RANGE_COLUMNS))
+    distribution.add_argument('--bins', type=int, default=10)
+    filters(distribution)
+    snapshot(distribution)
+    
+    show = command('show', "show one car")
+    show.add_argument('car_id', type=int)
+    snapshot(show)
+    
+    search = command('search', "full-text search")
+    search.add_argument('query', nargs='+')
+    search.add_argument('--limit', type=int, default=api.DEFAULT_PAGE_SIZE)
+    search.add_argument('--offset', type=int, default=0)
+    search.add_argument('--fuzzy', action='store_true', help="also match misspelt words")
+    snapshot(search)
+    
+    compare = command('compare', "compare two or more cars")
+    compare.add_argument('ids', type=int, nargs='+', metavar='ID')
+    snapshot(compare)
+    
+    rank = command('rank', "top cars by a metric")
+    rank.add_argument('metric', choices=[name for name in comparison.METRICS])
+    rank.add_argument('--top', type=int, default=10)
+    filters(rank)
+    snapshot(rank)
+    
+    stats = command('stats', "collection statistics")
+    stats.add_argument('--collection', action='store_true', help="only cars in my collection")
+    stats.add_argument('--make')
+    stats.add_argument('--user', help="whose collection (default CAR_COLLECTION_USER)")
+    snapshot(stats)
+    
+    collection = command('collection', "list the cars in my collection")
+    collection.add_argument('--user', help="whose collection (default CAR_COLLECTION_USER)")
+    collection.add_argument('--offset', type=int, default=0)
+    collection.add_argument('--limit', type=int, default=api.DEFAULT_PAGE_SIZE)
+    
+    add = command('add', "add a catalog car to my collection")
+    add.add_argument('car_id', type=int)
+    add.add_argument('--user', help="whose collection (default CAR_COLLECTION_USER)")
+    
+    remove = command('remove', "remove a car from my collection")
+    remove.add_argument('car_id', type=int)
+    remove.add_argument('--user', help="whose collection (default CAR_COLLECTION_USER)")
+    
+    import_file = command('import', "bulk-load cars from a .csv or .jsonl file (optionally .gz)")
+    import_file.add_argument('path')
+    import_file.add_argument('--batch-size', type=int, default=10000)
+    rebuild = import_file.add_mutually_exclusive_group()
+    rebuild.add_argument('--defer-indexes', dest='defer_indexes', action='store_const', const=True,
+                         help="rebuild indexes once at the end (default: only for files large next to the catalog)")
+    rebuild.add_argument('--keep-indexes', dest='defer_indexes', action='store_const', const=False,
+                         help="keep indexes up to date row by row")
+    
+    export_file = command('export', "stream cars to a file")
+    export_file.add_argument('path')
+    export_file.add_argument('--format', choices=list(export.FORMATS), default='csv')
+    export_file.add_argument('--gzip', action='store_true')
+    filters(export_file)
+    snapshot(export_file)
+    
+    serve = commands.add_parser('serve', help="run the HTTP/JSON service")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8000)
+    snapshot(serve)
+    
+    batch = commands.add_parser('batch', help="run commands read from a file or stdin, one per line")
+    batch.add_argument('file', nargs='?', default='-', help="command file ('-' for stdin)")
+    batch.add_argument('--stop-on-error', action='store_true')
+    return parser
+
+def run_command(args):
+    """Run a parsed subcommand and return its JSON-ready result"""
+    if getattr(args, 'snapshot', None):
+        if args.command == 'stats' and args.collection:
+            raise ValueError("Collections are not part of the snapshot")
+        with use_database(open_snapshot(args.snapshot)):
+            return run_command(argparse.Namespace(**dict(vars(args), snapshot=None)))
+    where = api.parse_filters(vars(args))
+    if args.command == 'browse':
+        return api.browse(where, args.after, args.limit)
+    if args.command == 'facets':
+        return api.faceted_browse(api.parse_selection(vars(args)), args.after, args.limit)
+    if args.command == 'range':
+        return api.range_query(where, args.order_by, args.desc, args.after, args.limit, args.estimate)
+    if args.command == 'distribution':
+        return api.distribution(args.column, args.bins, where)
+    if args.command == 'show':
+        car = api.details(args.car_id)
+        if car is None:
+            raise ValueError(f"No car found with ID {args.car_id}")
+        return car
+    if args.command == 'search':
+        return api.search(' '.join(args.query), args.limit, args.offset, args.fuzzy)
+    if args.command == 'compare':
+        return api.compare(args.ids)
+    if args.command == 'rank':
+        return api.rank(args.metric, args.top, where)
+    if args.command == 'stats':
+        if args.collection:
+            return api.collection_stats(args.user)
+        return api.stats(make=args.make)
+    if args.command == 'collection':
+        return api.collection(args.user, args.offset, args.limit)
+    if args.command == 'add':
+        return api.add_to_collection(args.car_id, args.user)
+    if args.command == 'remove':
+        return api.remove_from_collection(args.car_id, args.user)
+    if args.command == 'import':
+        return import_car_file(args.path, args.batch_size, args.defer_indexes)
+    if args.command == 'export':
+        return export.export_cars(args.path, fmt=args.format, where=where or None, compress=args.gzip,
+                                  title="VIRTUAL CAR CATALOG")
+    raise CommandError(f"{args.command} can't be run here")
+
+def print_result(result):
+    """Print a command result for people rather than programs"""
+    for facet, entries in result.get('facets', {}).items():
+        print(f"{facet}: " + ", ".join(f"{entry['label']} [{entry['value']}] ({entry['count']:,})" for entry in entries))
+    if 'total' in result:
+        print(f"{result['total']:,} cars")
+    if 'estimated_total' in result:
+        print(f"~{result['estimated_total']:,} cars match (estimated)")
+        if 'cars' not in result:
+            return
+    if 'percentiles' in result:
+        print(f"{result['column']}: " + ", ".join(
+            f"{name} {'-' if value is None else format(value, ',.0f')}" for name, value in result['percentiles'].items()))
+        largest = max([entry['count'] for entry in result['bins']] + [1])
+        for entry in result['bins']:
+            bar = '█' * round(40 * entry['count'] / largest)
+            print(f"{entry['lower']:>14,.0f} - {entry['upper']:<14,.0f} {bar} {entry['count']:,}")
+        return
+    if 'cars' in result and isinstance(result['cars'], list) and 'metrics' not in result:
+        for car in result['cars']:
+            value = f" | {result['metric']}: {car['value']:,.2f}" if 'value' in car and car['value'] is not None else ''
+            if 'score' in car:
+                value = f" | match: {car['score']:.0%}"
+            print(f"ID: {car['id']} | {car['year']} {car['make']} {car['model']} | "
+                  f"{car['horsepower']:,} HP | ${car['price']:,.2f}{value}")
+        if not result['cars']:
+            print("No cars found.")
+        if result.get('next_after'):
+            print(f"... more with --after {result['next_after']}")
+        if result.get('next_offset'):
+            print(f"... more with --offset {result['next_offset']}")
+    elif 'metrics' in result:
+        print("Cars: " + ", ".join(f"{car['year']} {car['make']} {car['model']}" if car else "(missing)"
+                                   for car in result['cars']))
+        for metric, values in result['metrics'].items():
+            formatted = ", ".join('-' if value is None else f"{value:,.2f}" for value in values)
+            print(f"{comparison.METRICS[metric][0]}: {formatted} (winner: {result['winners'][metric] or 'tie'})")
+    else:
+        for key, value in result.items():
+            print(f"{key}: {value}")
+
+def run_batch(lines, out, stop_on_error=False):
+    """
+    Run one command per line against this process's warm connection and
+    caches, writing a JSON object per command to out.
+    
+    Blank lines and lines starting with # are skipped. Returns the number
+    of commands that failed.
+    """
+    parser = build_parser()
+    failures = 0
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        record = {'line': line_number, 'command': line}
+        try:
+            argv = shlex.split(line)
+            if '-h' in argv or '--help' in argv:
+                raise CommandError("help is not available in batch mode")
+            args = parser.parse_args(argv)
+            if args.command is None:
+                raise CommandError("missing command")
+            if args.command in ('batch', 'serve'):
+                raise CommandError(f"{args.command} is not available in batch mode")
+            record['ok'] = True
+            record['result'] = run_command(args)
+        except (CommandError, ValueError, OSError) as e:
+            record['ok'] = False
+            record['error'] = str(e)
+        except Exception as e:
+            # Anything else (a database error, say) fails this line, not the batch
+            record['ok'] = False
+            record['error'] = f"{type(e).__name__}: {e}"
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        if not record['ok']:
+            failures += 1
+            if stop_on_error:
+                break
+    out.flush()
+    return failures
+
+def run(argv):
+    """Entry point: interactive menu without arguments, otherwise a scripted command"""
+    if not argv:
+        main()
+        return 0
+    
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except CommandError as e:
+        parser.print_usage(sys.stderr)
+        print(f"cli.py: error: {e}", file=sys.stderr)
+        return 2
+    
+    if args.command is None:
+        parser.print_help()
+        return 2
+    if args.command == 'serve':
+        from server import serve
+        serve(args.host, args.port, snapshot=args.snapshot)
+        return 0
+    if args.command == 'batch':
+        if args.file == '-':
+            return 1 if run_batch(sys.stdin, sys.stdout, args.stop_on_error) else 0
+        with open(args.file, encoding='utf-8') as f:
+            return 1 if run_batch(f, sys.stdout, args.stop_on_error) else 0
+    
+    try:
+        result = run_command(args)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        if args.json:
+            print(json.dumps({'error': str(e)}))
+        else:
+            print(f"❌ {e}", file=sys.stderr)
+        return 1
+    
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print_result(result)
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(run(sys.argv[1:]))
@@ -6,8 +6,11 @@ Debug script for Virtual Car Collection Manager
 Use this script to test individual functions and debug the application
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from models.car import Car
-from models import get_connection, get_cursor
+from models import get_cursor, POOL
+from models.session import Session
+from models import profiling
 import helpers
 
 def test_database_connection():
@@ -45,6 +48,12 @@ def test_car_model():
         print(f"\nCollection statistics:")
         print(f"- Total value: ${stats['total_value']:,.2f}")
         print(f"- Average price: ${stats['avg_price']:,.2f}")
+        
+        # Test the identity-map cache
+        Car.get_by_id(first_car.id)
+        Car.get_many([first_car.id, first_car.id + 1])
+        cache = Car.cache_stats()
+        print(f"\nCar cache: {cache['hits']} hits, {cache['misses']} misses, {cache['size']}/{cache['maxsize']} entries")
 
 def create_test_custom_car():
     """Create a test custom car for debugging"""
@@ -72,15 +81,16 @@ def cleanup_test_cars():
     print("\n🧹 Cleaning up test cars...")
     
     cursor = get_cursor()
-    connection = get_connection()
-    
     cursor.execute("SELECT id FROM cars WHERE make = 'Debug Motors' OR model LIKE '%Test%'")
-    test_car_ids = cursor.fetchall()
+    test_car_ids = [car_id for (car_id,) in cursor.fetchall()]
+    
+    # One transaction and one executemany for every matching car
+    with Session() as session:
+        for car in Car.get_many(test_car_ids):
+            if car:
+                session.delete(car)
     
     if test_car_ids:
-        for (car_id,) in test_car_ids:
-            cursor.execute("DELETE FROM cars WHERE id = ?", (car_id,))
-        connection.commit()
         print(f"✅ Removed {len(test_car_ids)} test cars")
     else:
         print("No test cars found to clean up")
@@ -103,6 +113,65 @@ def test_helpers():
     except Exception as e:
         print(f"❌ Search function error: {e}")
 
+def test_concurrent_queries(workers=4, queries_per_worker=25):
+    """Run catalog queries from several threads, each on its own pooled connection"""
+    print(f"\n🧪 Running {workers * queries_per_worker} queries across {workers} threads...")
+    
+    def worker(_):
+        try:
+            for _ in range(queries_per_worker):
+                Car.search("Ferrari")
+                Car.get_collection_stats()
+            return id(get_cursor().connection)
+        finally:
+            POOL.release()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            connections = set(executor.map(worker, range(workers)))
+        print(f"✅ Concurrent queries completed using {len(connections)} pooled connection(s)")
+    except Exception as e:
+        print(f"❌ Concurrent query error: {e}")
+
+def profile_queries():
+    """Profile a representative workload and show per-query timings and plans"""
+    print("\n🔬 Profiling queries...")
+    profiler = profiling.PROFILER
+    was_enabled = profiler.enabled
+    profiler.reset()
+    profiler.enable()
+    
+    try:
+        Car.cache.clear()
+        Car.get_all()
+        for car_id in range(1, 21):
+            Car.get_by_id(car_id)
+        Car.get_many(list(range(1, 51)))
+        for query in ("Ferrari", "Tesla", "Porsche 911"):
+            Car.search(query)
+        Car.get_collection_stats()
+        Car.get_collection_stats(is_custom=True)
+        list(Car.get_collection())
+        helpers.comparison.compare([1, 2, 3])
+        helpers.comparison.rank('horsepower', k=5)
+    except Exception as e:
+        print(f"❌ Profiling workload error: {e}")
+    finally:
+        if not was_enabled:
+            profiler.disable()
+    
+    print(profiler.format_report())
+    flagged = profiler.flagged()
+    if flagged:
+        print(f"\n⚠️  {len(flagged)} statement(s) scan a whole table or sort in a temp B-tree")
+    else:
+        print("\n✅ No full table scans or temp B-tree sorts")
+    
+    path = input("\nWrite metrics to a JSON file? Enter a path (or press Enter to skip): ").strip()
+    if path:
+        profiler.dump(path)
+        print(f"✅ Metrics written to {path}")
+
 def display_all_tables():
     """Display all database tables and their contents (for debugging)"""
     print("\n📊 Database Contents:")
@@ -144,6 +213,8 @@ def main():
         print("5. Display database contents")
         print("6. Cleanup test cars")
         print("7. Run all tests")
+        print("8. Test concurrent queries")
+        print("9. Profile queries")
         print("0. Exit debug mode")
         
         choice = input("\nSelect debug option: ").strip()
@@ -163,11 +234,16 @@ def main():
             display_all_tables()
         elif choice == "6":
             cleanup_test_cars()
+        elif choice == "8":
+            test_concurrent_queries()
+        elif choice == "9":
+            profile_queries()
         elif choice == "7":
             print("🚀 Running all tests...")
             test_database_connection()
             test_car_model()
             test_helpers()
+            test_concurrent_queries()
             print("✅ All tests completed!")
         else:
             print("❌ Invalid choice")
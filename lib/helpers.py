@@ -1,9 +1,26 @@
 # lib/helpers.py
 
+import csv
+import gzip
 import json
+import math
 import os
+import time
 from datetime import datetime
-from models.car import Car
+from itertools import islice
+from api import car_id_param
+from models.car import Car, MIN_YEAR, MAX_YEAR, MAX_HORSEPOWER
+from models import comparison, export, facets
+from models.collection import Collection
+
+# Imports expected to add at least this many cars, and at least this share
+# of the catalog's current size, drop the indexes and rebuild them at the end
+DEFER_INDEXES_MIN_ROWS = 20000
+DEFER_INDEXES_FRACTION = 0.5
+# Characters read from the start of a file to estimate its number of rows
+ESTIMATE_SAMPLE_CHARS = 65536
+# Search results shown per page
+SEARCH_PAGE_SIZE = 20
 
 def exit_program():
     """Exit the program with a goodbye message"""
@@ -12,58 +29,91 @@ def exit_program():
     exit()
 
 def browse_available_cars():
-    """Display all available cars in the database"""
-    print("\n🚗 Available Cars in Database:")
-    print("=" * 90)
-    
-    cars = Car.get_all()
-    
-    if not cars:
-        print("No cars found in the database.")
-        return
-    
-    # Group cars by make for better organization
-    cars_by_make = {}
-    for car in cars:
-        if car.make not in cars_by_make:
-            cars_by_make[car.make] = []
-        cars_by_make[car.make].append(car)
+    """Browse the catalog a page at a time, drilling down by make, fuel type, decade and price"""
+    selection = {}
+    after = None
     
-    for make in sorted(cars_by_make.keys()):
-        print(f"\n📍 {make}:")
-        for car in sorted(cars_by_make[make], key=lambda x: x.model):
+    while True:
+        page = facets.browse(selection, after=after)
+        filters = ", ".join(_facet_label(page['facets'], key, value) for key, value in selection.items())
+        print(f"\n🚗 Available Cars{f' ({filters})' if filters else ''}: {page['total']:,} found")
+        print("=" * 90)
+        
+        for key, title in (('make', "Makes"), ('fuel_type', "Fuel"), ('year', "Decades"), ('price', "Prices")):
+            if key not in selection:
+                entries = page['facets'][key]
+                shown = ", ".join(f"{entry['label']} ({entry['count']:,})" for entry in entries[:8])
+                more = f", +{len(entries) - 8} more" if len(entries) > 8 else ""
+                print(f"{title}: {shown}{more}")
+        
+        # Cars arrive in make/model order, so print a heading whenever the make changes
+        current_make = None
+        for car in page['cars']:
+            if car.make != current_make:
+                current_make = car.make
+                print(f"\n📍 {current_make}:")
             custom_tag = " (Custom)" if car.is_custom else ""
             print(f"   ID: {car.id:2d} | {car.year} {car.model}{custom_tag} | {car.horsepower:,} HP | ${car.price:,.2f}")
+        
+        if current_make is None:
+            print("No cars found in the database.")
+            return
+        
+        print("\n[n] next page  [m] make  [f] fuel  [y] decade  [p] price  [c] clear filters  [Enter] done")
+        command = input("> ").strip().lower()
+        if not command:
+            return
+        if command == 'n':
+            if page['next_after']:
+                after = page['next_after']
+            else:
+                print("📄 That was the last page.")
+            continue
+        if command == 'c':
+            selection, after = {}, None
+            continue
+        
+        key = {'m': 'make', 'f': 'fuel_type', 'y': 'year', 'p': 'price'}.get(command)
+        if key is None:
+            print("❌ Invalid choice.")
+            continue
+        entries = page['facets'][key]
+        for number, entry in enumerate(entries, 1):
+            print(f"{number}. {entry['label']} ({entry['count']:,})")
+        try:
+            choice = int(input("Choose a number: "))
+            if not 1 <= choice <= len(entries):
+                raise ValueError
+        except ValueError:
+            print("❌ Invalid choice.")
+            continue
+        selection[key] = entries[choice - 1]['value']
+        after = None
+
+def _facet_label(facet_counts, key, value):
+    """Label for a selected facet value"""
+    for entry in facet_counts.get(key, ()):
+        if entry['value'] == value:
+            return entry['label']
+    return str(value)
 
 def add_existing_car():
     """Add an existing car from the database to collection"""
     browse_available_cars()
     
     try:
-        car_id = int(input("\nEnter the ID of the car you want to add to your collection: "))
+        car_id = car_id_param(input("\nEnter the ID of the car you want to add to your collection: "))
         car = Car.get_by_id(car_id)
         
         if car:
-            if car.is_custom:
-                print(f"\n✅ This custom car is already in your collection!")
-            else:
-                # Create a copy in the user's collection
-                new_car = Car(
-                    make=car.make,
-                    model=car.model,
-                    year=car.year,
-                    engine=car.engine,
-                    horsepower=car.horsepower,
-                    price=car.price,
-                    fuel_type=car.fuel_type,
-                    is_custom=True  # Mark as part of user's collection
-                )
-                new_car.save()
+            if Collection.for_user().add(car):
                 print(f"\n✅ Successfully added {car} to your collection!")
                 print(car.display_details())
+            else:
+                print(f"\n✅ {car} is already in your collection!")
         else:
             print(f"❌ No car found with ID {car_id}")
-            
+    
     except ValueError:
         print("❌ Please enter a valid car ID number.")
 
@@ -77,27 +127,27 @@ def create_custom_car():
         if not make:
             print("❌ Make is required.")
             return
-            
+        
         model = input("Enter car model (e.g., 488 GTB, Model S): ").strip()
         if not model:
             print("❌ Model is required.")
             return
         
         year = int(input("Enter year (e.g., 2023): "))
-        if year < 1886 or year > 2030:  # First car was made in 1886
-            print("❌ Please enter a reasonable year (1886-2030).")
+        if year < MIN_YEAR or year > MAX_YEAR:
+            print(f"❌ Please enter a reasonable year ({MIN_YEAR}-{MAX_YEAR}).")
             return
-            
+        
         engine = input("Enter engine specification (e.g., 3.9L Twin-Turbo V8): ").strip()
         if not engine:
             print("❌ Engine specification is required.")
             return
-            
+        
         horsepower = int(input("Enter horsepower (e.g., 661): "))
-        if horsepower < 1 or horsepower > 5000:
-            print("❌ Please enter a reasonable horsepower (1-5000).")
+        if horsepower < 1 or horsepower > MAX_HORSEPOWER:
+            print(f"❌ Please enter a reasonable horsepower (1-{MAX_HORSEPOWER}).")
             return
-            
+        
         price = float(input("Enter price in USD (e.g., 262000): "))
         if price < 0:
             print("❌ Price cannot be negative.")
@@ -119,30 +169,29 @@ def create_custom_car():
         )
         
         custom_car.save()
+        Collection.for_user().add(custom_car)
         print(f"\n✅ Successfully created your custom {custom_car}!")
         print(custom_car.display_details())
-        
+    
     except ValueError:
         print("❌ Please enter valid numeric values for year, horsepower, and price.")
 
 def view_my_collection():
-    """Display only cars in user's collection (custom cars)"""
+    """Display only cars in the current user's collection"""
     print("\n🏠 Your Personal Car Collection:")
     print("=" * 90)
     
-    cars = [car for car in Car.get_all() if car.is_custom]
-    
-    if not cars:
-        print("Your collection is empty. Add some cars to get started!")
-        return
-    
-    for i, car in enumerate(cars, 1):
-        print(f"\n{i}. {car}")
+    count = 0
+    for count, (car, added_at) in enumerate(Collection.for_user().items(), 1):
+        print(f"\n{count}. {car}")
         print(f"   🔧 Engine: {car.engine}")
         print(f"   ⚡ Power: {car.horsepower:,} HP")
         print(f"   💰 Value: ${car.price:,.2f}")
         print(f"   ⛽ Fuel: {car.fuel_type}")
-        print(f"   📅 Added: {car.date_added}")
+        print(f"   📅 Added: {added_at}")
+    
+    if not count:
+        print("Your collection is empty. Add some cars to get started!")
 
 def search_cars():
     """Search for cars by make, model, or fuel type"""
@@ -152,58 +201,128 @@ def search_cars():
         print("❌ Please enter a search term.")
         return
     
-    cars = Car.search(query)
+    # One extra car tells us whether there is a next page
+    offset = 0
+    cars = Car.search(query, limit=SEARCH_PAGE_SIZE + 1)
     
     if not cars:
-        print(f"No cars found matching '{query}'")
+        matches = Car.fuzzy_search(query)
+        if not matches:
+            print(f"No cars found matching '{query}'")
+            return
+        owned = Collection.for_user().member_ids(car.id for car, _ in matches)
+        print(f"\nNo exact matches for '{query}'. Did you mean ({len(matches)} found):")
+        print("=" * 90)
+        for car, score in matches:
+            custom_tag = " (In Collection)" if car.id in owned else " (Available)"
+            print(f"ID: {car.id:2d} | {car} | {car.horsepower:,} HP | ${car.price:,.2f}{custom_tag} | {score:.0%} match")
         return
     
-    print(f"\n🔍 Search Results for '{query}' ({len(cars)} found):")
-    print("=" * 90)
-    
-    for car in cars:
-        custom_tag = " (In Collection)" if car.is_custom else " (Available)"
-        print(f"ID: {car.id:2d} | {car} | {car.horsepower:,} HP | ${car.price:,.2f}{custom_tag}")
+    while True:
+        has_next = len(cars) > SEARCH_PAGE_SIZE
+        cars = cars[:SEARCH_PAGE_SIZE]
+        owned = Collection.for_user().member_ids(car.id for car in cars)
+        print(f"\n🔍 Search Results for '{query}' ({offset + 1}-{offset + len(cars)}{'+' if has_next else ''}):")
+        print("=" * 90)
+        
+        for car in cars:
+            custom_tag = " (In Collection)" if car.id in owned else " (Available)"
+            print(f"ID: {car.id:2d} | {car} | {car.horsepower:,} HP | ${car.price:,.2f}{custom_tag}")
+        
+        if not has_next and not offset:
+            return
+        print("\n[n] next page  [p] previous page  [Enter] done")
+        command = input("> ").strip().lower()
+        if not command:
+            return
+        if command == 'n' and has_next:
+            offset += SEARCH_PAGE_SIZE
+        elif command == 'p' and offset:
+            offset -= SEARCH_PAGE_SIZE
+        elif command in ('n', 'p'):
+            print("📄 No more pages that way.")
+        else:
+            print("❌ Invalid choice.")
+        cars = Car.search(query, limit=SEARCH_PAGE_SIZE + 1, offset=offset)
 
 def compare_cars():
-    """Compare two cars side by side"""
+    """Compare two or more cars side by side"""
     print("\n⚖️  Car Comparison Tool")
     print("=" * 40)
     
     try:
-        car1_id = int(input("Enter first car ID: "))
-        car2_id = int(input("Enter second car ID: "))
-        
-        car1 = Car.get_by_id(car1_id)
-        car2 = Car.get_by_id(car2_id)
-        
-        if not car1:
-            print(f"❌ No car found with ID {car1_id}")
+        raw_ids = input("Enter the car IDs to compare, separated by commas (e.g. 1, 5, 6): ")
+        car_ids = list(dict.fromkeys(car_id_param(part) for part in raw_ids.replace(',', ' ').split()))
+    except ValueError:
+        print("❌ Please enter valid car ID numbers.")
+        return
+    
+    if len(car_ids) < 2:
+        print("❌ Please enter at least two different car IDs.")
+        return
+    
+    result = comparison.compare(car_ids, metrics=('year', 'horsepower', 'price', 'hp_per_1000', 'score'))
+    cars = result['cars']
+    
+    for car_id, car in zip(car_ids, cars):
+        if not car:
+            print(f"❌ No car found with ID {car_id}")
             return
-        if not car2:
-            print(f"❌ No car found with ID {car2_id}")
+    
+    labels = [f"Car {i}" for i in range(1, len(cars) + 1)]
+    width = max(18, min(35, 100 // len(cars)))
+    
+    def row(attribute, values, winner='-'):
+        cells = " | ".join(f"{str(value)[:width]:<{width}}" for value in values)
+        print(f"{attribute:<15} | {cells} | {winner:<10}")
+    
+    def winner_label(metric):
+        winner_id = result['winners'][metric]
+        return 'Tie' if winner_id is None else labels[car_ids.index(winner_id)]
+    
+    def formatted(metric, template):
+        return ['N/A' if math.isnan(value) else template.format(value) for value in result['metrics'][metric]]
+    
+    print(f"\n⚖️  Comparing {' vs '.join(str(car) for car in cars)}")
+    print("=" * (31 + (width + 3) * len(cars)))
+    
+    # Comparison table
+    row('Attribute', labels, 'Winner')
+    print("-" * (31 + (width + 3) * len(cars)))
+    row('Make/Model', [f"{car.make} {car.model}" for car in cars])
+    row('Year', [car.year for car in cars], winner_label('year'))
+    row('Horsepower', [f"{car.horsepower:,} HP" for car in cars], winner_label('horsepower'))
+    row('Price', [f"${car.price:,.2f}" for car in cars], winner_label('price'))
+    row('Fuel Type', [car.fuel_type for car in cars])
+    row('Engine', [car.engine for car in cars])
+    row('HP per $1000', formatted('hp_per_1000', "{:.2f}"), winner_label('hp_per_1000'))
+    row('Overall Score', formatted('score', "{:.2f}"), winner_label('score'))
+
+def rank_cars():
+    """Show the top cars in the catalog by a chosen metric"""
+    print("\n🏆 Rank Cars")
+    print("=" * 40)
+    
+    metric_names = list(comparison.METRICS)
+    for i, name in enumerate(metric_names, 1):
+        print(f"  {i}. {comparison.METRICS[name][0]}")
+    
+    try:
+        choice = int(input("Choose a metric: "))
+        if not 1 <= choice <= len(metric_names):
+            print("❌ Invalid choice. Please enter a valid number.")
             return
-        
-        print(f"\n⚖️  Comparing {car1} vs {car2}")
-        print("=" * 100)
-        
-        # Comparison table
-        print(f"{'Attribute':<15} | {'Car 1':<35} | {'Car 2':<35} | {'Winner':<10}")
-        print("-" * 100)
-        print(f"{'Make/Model':<15} | {f'{car1.make} {car1.model}':<35} | {f'{car2.make} {car2.model}':<35} | {'-':<10}")
-        print(f"{'Year':<15} | {car1.year:<35} | {car2.year:<35} | {('Car 1' if car1.year > car2.year else 'Car 2' if car2.year > car1.year else 'Tie'):<10}")
-        print(f"{'Horsepower':<15} | {f'{car1.horsepower:,} HP':<35} | {f'{car2.horsepower:,} HP':<35} | {('Car 1' if car1.horsepower > car2.horsepower else 'Car 2' if car2.horsepower > car1.horsepower else 'Tie'):<10}")
-        print(f"{'Price':<15} | {f'${car1.price:,.2f}':<35} | {f'${car2.price:,.2f}':<35} | {('Car 2' if car1.price > car2.price else 'Car 1' if car2.price > car1.price else 'Tie'):<10}")
-        print(f"{'Fuel Type':<15} | {car1.fuel_type:<35} | {car2.fuel_type:<35} | {'-':<10}")
-        print(f"{'Engine':<15} | {car1.engine:<35} | {car2.engine:<35} | {'-':<10}")
-        
-        # Power-to-price ratio
-        ppr1 = car1.horsepower / car1.price * 1000  # HP per $1000
-        ppr2 = car2.horsepower / car2.price * 1000
-        print(f"{'HP per $1000':<15} | {f'{ppr1:.2f}':<35} | {f'{ppr2:.2f}':<35} | {('Car 1' if ppr1 > ppr2 else 'Car 2' if ppr2 > ppr1 else 'Tie'):<10}")
-        
+        count = int(input("How many cars to show? (default 10): ").strip() or 10)
     except ValueError:
-        print("❌ Please enter valid car ID numbers.")
+        print("❌ Please enter a valid number.")
+        return
+    
+    metric = metric_names[choice - 1]
+    label = comparison.METRICS[metric][0]
+    
+    print(f"\n🏆 Top {count} by {label}:")
+    for position, (car, value) in enumerate(comparison.rank(metric, k=count), 1):
+        print(f"{position:3d}. ID: {car.id} | {car} | {label}: {value:,.2f}")
 
 def view_collection_stats():
     """Display statistics about the car collection"""
@@ -219,6 +338,9 @@ def view_collection_stats():
         make, model, price = stats['most_expensive']
         print(f"Most Expensive Car: {make} {model} (${price:,.2f})")
     
+    collection_stats = Collection.for_user().stats()
+    print(f"\n🏠 My Collection: {collection_stats['total_cars']} cars worth ${collection_stats['total_value']:,.2f}")
+    
     print("\n🔋 Fuel Type Breakdown:")
     for fuel_type, count in stats['fuel_breakdown'].items():
         percentage = (count / stats['total_cars']) * 100
@@ -230,61 +352,65 @@ def view_collection_stats():
         print(f"  {make}: {count} cars ({percentage:.1f}%)")
 
 def export_collection():
-    """Export the user's collection to a text file"""
-    my_cars = [car for car in Car.get_all() if car.is_custom]
+    """Export the user's collection, or the whole catalog, to a file"""
+    print("\n📤 Export Cars")
+    print("=" * 40)
+    
+    scope = input("Export (1) my collection or (2) the whole catalog? (default 1): ").strip() or "1"
+    if scope not in ("1", "2"):
+        print("❌ Invalid choice. Please enter 1 or 2.")
+        return
+    collection = Collection.for_user() if scope == "1" else None
     
-    if not my_cars:
-        print("❌ Your collection is empty. Add some cars first!")
+    total_cars = len(collection) if collection is not None else Car.get_collection_stats()['total_cars']
+    if not total_cars:
+        print("❌ Your collection is empty. Add some cars first!" if collection is not None else "❌ The catalog is empty.")
         return
     
+    print(f"Formats: {', '.join(export.FORMATS)}")
+    fmt = input("Choose a format (default txt): ").strip().lower() or "txt"
+    if fmt not in export.FORMATS:
+        print(f"❌ Unsupported format. Choose one of: {', '.join(export.FORMATS)}")
+        return
+    compress = input("Compress with gzip? (y/N): ").strip().lower() == 'y'
+    
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"my_car_collection_{timestamp}.txt"
+    prefix = "my_car_collection" if collection is not None else "car_catalog"
+    filename = f"{prefix}_{timestamp}{export.FORMATS[fmt]}"
+    title = "MY VIRTUAL CAR COLLECTION" if collection is not None else "VIRTUAL CAR CATALOG"
     
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("🚗 MY VIRTUAL CAR COLLECTION 🚗\n")
-            f.write("=" * 50 + "\n")
-            f.write(f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Total Cars: {len(my_cars)}\n")
-            f.write(f"Total Value: ${sum(car.price for car in my_cars):,.2f}\n\n")
-            
-            for i, car in enumerate(my_cars, 1):
-                f.write(f"{i}. {car.year} {car.make} {car.model}\n")
-                f.write(f"   Engine: {car.engine}\n")
-                f.write(f"   Power: {car.horsepower:,} HP\n")
-                f.write(f"   Price: ${car.price:,.2f}\n")
-                f.write(f"   Fuel Type: {car.fuel_type}\n")
-                f.write(f"   Date Added: {car.date_added}\n\n")
-            
-            f.write("-" * 50 + "\n")
-            f.write("Generated by Virtual Car Collection Manager\n")
-        
-        print(f"✅ Collection exported to: {filename}")
-        print(f"📄 File contains {len(my_cars)} cars with complete details.")
-        
+        result = export.export_cars(filename, fmt=fmt, compress=compress, title=title, collection=collection)
     except Exception as e:
         print(f"❌ Error exporting collection: {e}")
+        return
+    
+    print(f"✅ Exported to: {result['path']}")
+    print(f"📄 File contains {result['rows']:,} cars ({result['bytes']:,} bytes) - "
+          f"{result['rows_per_second']:,.0f} rows/sec")
 
 def remove_from_collection():
     """Remove a car from the user's collection"""
-    my_cars = [car for car in Car.get_all() if car.is_custom]
+    collection = Collection.for_user()
+    count = 0
+    for count, car in enumerate(collection.cars(), 1):
+        if count == 1:
+            print("\n🗑️  Your Cars:")
+        print(f"{count}. ID: {car.id} | {car} | ${car.price:,.2f}")
     
-    if not my_cars:
+    if not count:
         print("❌ Your collection is empty. Nothing to remove!")
         return
     
-    print("\n🗑️  Your Cars:")
-    for i, car in enumerate(my_cars, 1):
-        print(f"{i}. ID: {car.id} | {car} | ${car.price:,.2f}")
-    
     try:
         choice = int(input("\nEnter the number of the car to remove: "))
-        if 1 <= choice <= len(my_cars):
-            car_to_remove = my_cars[choice - 1]
+        if 1 <= choice <= count:
+            # Walk the same ordering again rather than holding every car in memory
+            car_to_remove = next(islice(collection.cars(), choice - 1, None))
             confirm = input(f"Are you sure you want to remove {car_to_remove} from your collection? (y/N): ").lower().strip()
             
             if confirm == 'y':
-                car_to_remove.delete()
+                collection.remove(car_to_remove)
                 print(f"✅ Removed {car_to_remove} from your collection.")
             else:
                 print("❌ Removal cancelled.")
@@ -296,13 +422,116 @@ def remove_from_collection():
 def display_car_details():
     """Display detailed information about a specific car"""
     try:
-        car_id = int(input("\nEnter car ID to view details: "))
+        car_id = car_id_param(input("\nEnter car ID to view details: "))
         car = Car.get_by_id(car_id)
         
         if car:
             print(car.display_details())
         else:
             print(f"❌ No car found with ID {car_id}")
-            
+    
     except ValueError:
-        print("❌ Please enter a valid car ID number.")
\ No newline at end of file
+        print("❌ Please enter a valid car ID number.")
+
+def import_cars():
+    """Import cars into the catalog from a CSV or JSON Lines file"""
+    print("\n📥 Import Cars")
+    print("=" * 40)
+    print("Supported formats: .csv, .jsonl (optionally gzipped, e.g. feed.csv.gz)")
+    
+    path = input("Enter the path of the file to import: ").strip()
+    if not path:
+        print("❌ Please enter a file path.")
+        return
+    if not os.path.exists(path):
+        print(f"❌ File not found: {path}")
+        return
+    
+    try:
+        result = import_car_file(path)
+    except Exception as e:
+        print(f"❌ Error importing cars: {e}")
+        return
+    
+    print(f"\n✅ Imported {result['inserted']:,} of {result['read']:,} rows in {result['seconds']:.2f}s "
+          f"({result['rows_per_second']:,.0f} rows/sec)")
+    skipped = result['read'] - result['inserted']
+    if skipped:
+        print(f"⚠️  Skipped {skipped:,} rows that failed validation.")
+
+def import_car_file(path, batch_size=10000, defer_indexes=None):
+    """
+    Stream a CSV or JSON Lines file into Car.bulk_insert and time it.
+    
+    Indexes and summaries are rebuilt once at the end instead of kept up
+    to date row by row only when the file is large compared with the
+    catalog (defer_indexes=None); pass True or False to decide yourself.
+    While they are being rebuilt, searches and stats are unavailable.
+    """
+    if defer_indexes is None:
+        defer_indexes = _worth_deferring_indexes(path)
+    read = 0
+    
+    def counted(records):
+        nonlocal read
+        for record in records:
+            read += 1
+            yield record
+    
+    start = time.perf_counter()
+    with _open_text(path) as f:
+        inserted = Car.bulk_insert(counted(_read_records(f, path)), batch_size=batch_size,
+                                   skip_invalid=True, defer_indexes=defer_indexes)
+    seconds = time.perf_counter() - start
+    
+    return {
+        'read': read,
+        'inserted': inserted,
+        'seconds': seconds,
+        'rows_per_second': inserted / seconds if seconds else 0,
+        'deferred_indexes': defer_indexes,
+    }
+
+def _worth_deferring_indexes(path):
+    """Whether a file holds enough cars, compared with the catalog, for one rebuild to beat row-by-row upkeep"""
+    rows = _estimate_rows(path)
+    return rows >= DEFER_INDEXES_MIN_ROWS and rows >= Car.get_collection_stats()['total_cars'] * DEFER_INDEXES_FRACTION
+
+def _estimate_rows(path):
+    """Rough number of records in a file, from its size and the length of its first lines"""
+    size = os.path.getsize(path)
+    if path.endswith('.gz'):
+        # gzip stores the uncompressed size (modulo 4 GiB) in its last four bytes
+        with open(path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            size = int.from_bytes(f.read(4), 'little')
+    with _open_text(path) as f:
+        sample = f.read(ESTIMATE_SAMPLE_CHARS)
+    lines = sample.count('\n')
+    if len(sample) < ESTIMATE_SAMPLE_CHARS or not lines:
+        return lines
+    return size * lines // len(sample.encode('utf-8'))
+
+def _open_text(path):
+    """Open a possibly gzipped text file for reading"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+def _read_records(f, path):
+    """Yield one dictionary per car from an open CSV or JSON Lines file"""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        # Cheaper than csv.DictReader, which checks every row's length
+        rows = csv.reader(f)
+        header = next(rows, None)
+        if header:
+            for row in rows:
+                if row:
+                    yield dict(zip(header, row))
+    elif name.endswith(('.jsonl', '.ndjson')):
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError("Unsupported file type. Use .csv or .jsonl")
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# lib/migrate.py
+
+"""
+Apply schema migrations to the car collection database
+Use `--dry-run` to list pending migrations with estimated durations
+"""
+
+import argparse
+from models import POOL, create_tables
+from models.migrations import migrate, current_version, count_cars, LATEST_VERSION
+
+def main():
+    """Show or apply pending migrations for the configured database"""
+    parser = argparse.ArgumentParser(description="Apply car collection schema migrations")
+    parser.add_argument('--dry-run', action='store_true', help="list pending migrations with time estimates")
+    args = parser.parse_args()
+    
+    connection = POOL.get_connection()
+    print(f"🗄️  Database: {POOL.database} (schema version {current_version(connection)}, latest {LATEST_VERSION})")
+    
+    plan = migrate(connection, dry_run=True)
+    if not plan:
+        print("✅ Schema is up to date.")
+        return
+    
+    print(f"Pending migrations for {count_cars(connection):,} cars:")
+    for migration, seconds in plan:
+        print(f"  v{migration.version}: {migration.description} (~{seconds:.1f}s)")
+    print(f"Estimated total: ~{sum(seconds for _, seconds in plan):.1f}s")
+    
+    if not args.dry_run:
+        create_tables(report=print)
+        print(f"✅ Upgraded to schema version {current_version(connection)}.")
+
+if __name__ == "__main__":
+    main()
@@ -2,34 +2,249 @@
 
 import sqlite3
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from .cache import IdentityMap
+from .migrations import migrate, current_version, LATEST_VERSION, BASE_VERSION
 
 # Database setup constants
-DATABASE_FILE = "car_collection.db"
-SQLITE_CONNECTION = sqlite3.connect(DATABASE_FILE)
-CURSOR = SQLITE_CONNECTION.cursor()
-
-def create_tables():
-    """Create the necessary database tables if they don't exist"""
-    
-    # Cars table for storing car information
-    CURSOR.execute('''
-        CREATE TABLE IF NOT EXISTS cars (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            make TEXT NOT NULL,
-            model TEXT NOT NULL,
-            year INTEGER NOT NULL,
-            engine TEXT NOT NULL,
-            horsepower INTEGER NOT NULL,
-            price REAL NOT NULL,
-            fuel_type TEXT DEFAULT 'Gasoline',
-            date_added TEXT DEFAULT CURRENT_TIMESTAMP,
-            is_custom BOOLEAN DEFAULT 0
-        )
-    ''')
+DATABASE_FILE = os.environ.get("CAR_COLLECTION_DB", "car_collection.db")
+MAX_IDLE_CONNECTIONS = 8
+
+# Tables rebuilt from cars by the migrations, dropped during bulk loads
+DERIVED_TABLES = ('cars_fts', 'car_stats', 'car_facets', 'cars_fuzzy_vocab', 'cars_fuzzy',
+                  'search_terms', 'search_term_trigrams', 'car_histograms')
+
+class ConnectionPool:
+    """
+    Hands every thread its own SQLite connection.
+    
+    A thread keeps its connection until it calls release() or exits, at which
+    point the connection goes back to an idle queue for the next thread.
+    Connections use WAL journaling so readers never block the writer.
+    Pools for shard files pass seed_samples=False so a new, empty file is
+    not given the sample cars.
+    
+    cursor_factory is the class of every cursor handed out; the profiling
+    module swaps in an instrumented one while it is enabled. read_only
+    pools (snapshots) tell the models not to refresh derived data on read.
+    Every pool has its own identity_map, since cars in different database
+    files (shards, replicas, snapshots) can share IDs.
+    """
+    
+    cursor_factory = sqlite3.Cursor
+    read_only = False
+    
+    def __init__(self, database, max_idle=MAX_IDLE_CONNECTIONS, seed_samples=True):
+        self.database = database
+        self.seed_samples = seed_samples
+        self.schema_ready = False
+        self.identity_map = IdentityMap()
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self._local = threading.local()
+    
+    def connect(self):
+        """Open a new connection configured for concurrent access"""
+        connection = sqlite3.connect(self.database, timeout=30, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+    
+    def get_connection(self):
+        """Get the calling thread's connection, checking one out if needed"""
+        lease = getattr(self._local, 'lease', None)
+        if lease is None:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self.connect()
+            lease = self._local.lease = _Lease(self, connection)
+        return lease.connection
+    
+    def release(self):
+        """Return the calling thread's connection to the pool"""
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            self._local.lease = None
+            lease.close()
+    
+    def begin(self):
+        """
+        Enter a transaction block on the calling thread's connection.
+        
+        The outermost block issues BEGIN; nested blocks join it. Every
+        begin() must be paired with an end().
+        """
+        connection = self.get_connection()
+        lease = self._local.lease
+        lease.depth += 1
+        if lease.depth == 1 and not connection.in_transaction:
+            connection.execute('BEGIN')
+        return connection.cursor(self.cursor_factory)
+    
+    def end(self, commit=True):
+        """Leave a transaction block, committing or rolling back the outermost one"""
+        lease = self._local.lease
+        lease.depth -= 1
+        if lease.depth == 0:
+            if commit:
+                lease.connection.commit()
+            else:
+                lease.connection.rollback()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block in a transaction on the calling thread's connection.
+        
+        Commits when the outermost block exits cleanly and rolls back on
+        any exception; nested blocks join the enclosing transaction.
+        """
+        cursor = self.begin()
+        try:
+            yield cursor
+        except BaseException:
+            self.end(commit=False)
+            raise
+        self.end()
+    
+    def checkin(self, connection):
+        """Keep a connection for reuse, or close it if the pool is full"""
+        if connection.in_transaction:
+            connection.rollback()
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+    
+    def close_all(self):
+        """Close every idle connection and the calling thread's connection"""
+        self.release()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class _Lease:
+    """A thread's hold on a pooled connection, returned when the thread exits"""
+    
+    def __init__(self, pool, connection):
+        self.pool = pool
+        self.connection = connection
+        self.depth = 0
+    
+    def close(self):
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            self.pool.checkin(connection)
+    
+    def __del__(self):
+        self.close()
+
+POOL = ConnectionPool(DATABASE_FILE)
+
+_schema_lock = threading.Lock()
+_active = threading.local()
+
+# (pool, job name) pairs with a background job running, guarded by _background_lock
+_background_jobs = set()
+_background_lock = threading.Lock()
+
+def current_pool():
+    """The pool the calling thread is using: POOL unless use_database() says otherwise"""
+    return getattr(_active, 'pool', None) or POOL
+
+@contextmanager
+def use_database(pool):
+    """
+    Point the calling thread's queries at another pool, e.g. one shard.
+    
+    Everything built on get_cursor(), get_connection() and transaction(),
+    including the Car methods, runs against pool inside the block.
+    """
+    previous = getattr(_active, 'pool', None)
+    _active.pool = pool
+    try:
+        yield pool
+    finally:
+        _active.pool = previous
+
+def run_in_background(pool, name, function, *args):
+    """
+    Call function(*args) against pool on a daemon thread, unless a job of
+    the same name is already running for that pool.
+    
+    Used to refresh derived data (histograms, search terms) without
+    making the read that noticed it was stale wait for the write lock.
+    A sqlite3 error, such as the database being locked, is dropped: the
+    next read that finds the data stale starts the job again.
+    """
+    key = (pool, name)
+    with _background_lock:
+        if key in _background_jobs:
+            return
+        _background_jobs.add(key)
+    
+    def run():
+        try:
+            with use_database(pool):
+                try:
+                    function(*args)
+                except sqlite3.Error:
+                    pass
+                finally:
+                    pool.release()
+        finally:
+            with _background_lock:
+                _background_jobs.discard(key)
+    
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+def get_connection():
+    """Get the calling thread's database connection, preparing the schema on first use"""
+    pool = current_pool()
+    connection = pool.get_connection()
+    if not pool.schema_ready:
+        ensure_schema()
+    return connection
+
+def get_cursor():
+    """Get a new cursor on the calling thread's database connection"""
+    return get_connection().cursor(current_pool().cursor_factory)
+
+def ensure_schema():
+    """
+    Create or upgrade the current pool's schema once per process.
+    
+    The schema version is stored in PRAGMA user_version by the migrations
+    module, so a database that is already current costs a single pragma
+    read and no DDL.
+    """
+    pool = current_pool()
+    with _schema_lock:
+        if pool.schema_ready:
+            return
+        if current_version(pool.get_connection()) < LATEST_VERSION:
+            create_tables()
+        pool.schema_ready = True
+
+def transaction():
+    """Context manager yielding a cursor inside a transaction"""
+    get_connection()
+    return current_pool().transaction()
+
+def create_tables(report=None):
+    """Apply any pending schema migrations and seed sample cars into an empty database"""
+    pool = current_pool()
+    connection = pool.get_connection()
+    migrate(connection, report=report)
+    cursor = connection.cursor()
     
     # Pre-populate with some sample cars if the table is empty
-    CURSOR.execute('SELECT COUNT(*) FROM cars')
-    if CURSOR.fetchone()[0] == 0:
+    cursor.execute('SELECT COUNT(*) FROM cars')
+    if pool.seed_samples and cursor.fetchone()[0] == 0:
         sample_cars = [
             ('Ferrari', '488 GTB', 2022, '3.9L Twin-Turbo V8', 661, 262000, 'Gasoline', '2024-01-01', 0),
             ('Lamborghini', 'Huracán', 2023, '5.2L V10', 630, 248295, 'Gasoline', '2024-01-01', 0),
@@ -52,20 +267,39 @@ def create_tables():
             ('Rimac', 'Nevera', 2023, 'Four Electric Motors', 1914, 2400000, 'Electric', '2024-01-01', 0)
         ]
         
-        CURSOR.executemany('''
+        cursor.executemany('''
             INSERT INTO cars (make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', sample_cars)
     
-    SQLITE_CONNECTION.commit()
-
-# Initialize the database when the module is imported
-create_tables()
+    connection.commit()
 
-def get_connection():
-    """Get the database connection"""
-    return SQLITE_CONNECTION
+def drop_derived_tables():
+    """
+    Drop the secondary indexes, search indexes, stats and facet summaries,
+    histograms, and the change counter and change log triggers.
+    
+    Bulk loads call this so rows are written without per-row index and
+    trigger maintenance; create_tables() then rebuilds everything in a
+    single pass over the cars table. The change log itself is kept, and
+    each loader logs the rows it wrote in one statement
+    (migrations.LOG_LOADED_CARS_SQL). The schema version is reset to the
+    base migration so an interrupted load is repaired the next time the
+    database is opened.
+    """
+    connection = current_pool().get_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT type, name FROM sqlite_master WHERE name LIKE 'idx_cars_%' OR name LIKE 'cars_fts%' "
+                   "OR name LIKE 'car_stats%' OR name LIKE 'car_facets%' OR name LIKE 'change_counter_%' "
+                   "OR name LIKE 'cars_fuzzy%' OR name LIKE 'search_term%' OR name LIKE 'car_histograms%' "
+                   "OR name LIKE 'car_changes_%'")
+    for object_type, name in cursor.fetchall():
+        if object_type in ('index', 'trigger') or name in DERIVED_TABLES:
+            cursor.execute(f'DROP {object_type.upper()} IF EXISTS {name}')
+    cursor.execute(f'PRAGMA user_version = {BASE_VERSION}')
+    connection.commit()
 
-def get_cursor():
-    """Get the database cursor"""
-    return CURSOR
\ No newline at end of file
+# CAR_COLLECTION_PROFILE=<path> profiles every query and writes the metrics there at exit
+if os.environ.get("CAR_COLLECTION_PROFILE"):
+    from . import profiling
+    profiling.enable(dump_path=os.environ["CAR_COLLECTION_PROFILE"])
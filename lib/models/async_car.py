@@ -0,0 +1,99 @@
+# lib/models/async_car.py
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from .car import Car
+
+DEFAULT_WORKERS = 4
+
+class AsyncCar:
+    """
+    asyncio front end for the Car model.
+    
+    Every query runs on a bounded thread pool so SQLite I/O never blocks the
+    event loop. The connection pool hands each worker thread its own WAL
+    connection, so up to max_workers reads run in parallel while extra
+    requests queue on the executor instead of opening more connections.
+    
+        async with AsyncCar() as cars:
+            car = await cars.get_by_id(1)
+            async for car in cars.iter_all(where={'make': 'Ferrari'}):
+                ...
+    """
+    
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='car-db')
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
+    
+    def close(self):
+        """Stop the worker threads once queued queries have finished"""
+        self.executor.shutdown(wait=True)
+    
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on the executor and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+    
+    async def get_all(self):
+        """Async Car.get_all()"""
+        return await self.run(Car.get_all)
+    
+    async def get_by_id(self, car_id):
+        """Async Car.get_by_id()"""
+        return await self.run(Car.get_by_id, car_id)
+    
+    async def get_many(self, car_ids):
+        """Async Car.get_many()"""
+        return await self.run(Car.get_many, car_ids)
+    
+    async def search(self, query, limit=None, offset=0):
+        """Async Car.search()"""
+        return await self.run(Car.search, query, limit, offset)
+    
+    async def get_collection(self, **filters):
+        """Async Car.get_collection(), returned as a list"""
+        return await self.run(lambda: list(Car.get_collection(**filters)))
+    
+    async def get_collection_stats(self, is_custom=None, make=None):
+        """Async Car.get_collection_stats()"""
+        return await self.run(Car.get_collection_stats, is_custom, make)
+    
+    async def save(self, car):
+        """Async car.save()"""
+        await self.run(car.save)
+        return car
+    
+    async def delete(self, car):
+        """Async car.delete()"""
+        await self.run(car.delete)
+    
+    async def iter_all(self, batch_size=500, where=None):
+        """
+        Asynchronously yield cars in make/model order, one page per query.
+        
+        Each page is a separate keyset query on the executor, so no cursor is
+        held open between pages and other requests interleave freely.
+        """
+        after = None
+        while True:
+            rows = await self.run(self._fetch_page, batch_size, where, after)
+            for row in rows:
+                yield Car._from_row(row)
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            after = (last[1], last[2], last[0])
+    
+    @staticmethod
+    def _fetch_page(batch_size, where, after):
+        return list(islice(Car.iter_rows(batch_size=batch_size, where=where, after=after), batch_size))
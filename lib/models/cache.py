@@ -0,0 +1,91 @@
+# lib/models/cache.py
+
+from collections import OrderedDict
+import threading
+import time
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 60  # seconds; other processes may change rows behind our back
+
+# Default for configure() arguments that should be left as they are
+_UNCHANGED = object()
+
+class IdentityMap:
+    """
+    Thread-safe LRU cache mapping database IDs to loaded objects.
+    
+    Repeated lookups of the same ID return the same object without a
+    query. Entries expire after ttl seconds (None keeps them until evicted)
+    and are dropped explicitly when a row is saved or deleted.
+    """
+    
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached object for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        """Cache value under key, evicting the least recently used entries"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key):
+        """Drop key from the cache if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def configure(self, maxsize=_UNCHANGED, ttl=_UNCHANGED):
+        """
+        Change the size limit and/or TTL, evicting entries if the cache shrinks.
+        
+        Arguments left out keep their current value; ttl=None turns expiry off.
+        """
+        with self._lock:
+            if maxsize is not _UNCHANGED:
+                self.maxsize = maxsize
+            if ttl is not _UNCHANGED:
+                self.ttl = ttl
+            while len(self._entries) > max(self.maxsize, 0):
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        """Return hit/miss counters and current occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
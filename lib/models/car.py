@@ -1,9 +1,46 @@
 # lib/models/car.py
 
-from . import get_connection, get_cursor
+from . import POOL, current_pool, get_cursor, transaction, create_tables, drop_derived_tables
+from .migrations import LOG_LOADED_CARS_SQL
+from . import fuzzy
 from datetime import datetime
+import re
+
+# Column list shared by every query that builds Car objects
+CAR_FIELDS = ('id', 'make', 'model', 'year', 'engine', 'horsepower', 'price', 'fuel_type', 'date_added', 'is_custom')
+CAR_COLUMNS = ', '.join(CAR_FIELDS)
+WHERE_OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit
+MAX_IN_PARAMETERS = 500
+
+# Full-text search ranks this many matches by relevance; any later ones follow in ID order
+SEARCH_RANKED_CANDIDATES = 1000
+
+# Fuzzy search re-ranks this many matches per result requested
+FUZZY_CANDIDATE_FACTOR = 10
+FUZZY_MIN_CANDIDATES = 200
+
+# Columns range_query() can filter and order by
+RANGE_COLUMNS = ('price', 'horsepower', 'year')
+
+# Limits applied to every new car (the first car was made in 1886)
+MIN_YEAR = 1886
+MAX_YEAR = 2030
+MAX_HORSEPOWER = 5000
+
+INSERT_SQL = '''
+    INSERT INTO cars (make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
 
 class Car:
+    __slots__ = ('id', 'make', 'model', 'year', 'engine', 'horsepower', 'price', 'fuel_type', '_date_added', 'is_custom')
+    
+    # Identity map of the default database; resize with Car.cache.configure().
+    # Other databases each keep their own, see _identity_map()
+    cache = POOL.identity_map
+    
     def __init__(self, make, model, year, engine, horsepower, price, fuel_type="Gasoline", car_id=None, date_added=None, is_custom=False):
         """
         Initialize a Car object.
@@ -17,7 +54,9 @@ class Car:
             price (float): Car price in USD
             fuel_type (str): Type of fuel (Gasoline, Electric, Hybrid)
             car_id (int): Database ID (for existing cars)
-            date_added (str): Date when car was added to collection
+            date_added (str): Date when car was added to collection; defaults to
+                the time it is first read, so rows loaded from the database
+                never pay for formatting a timestamp
             is_custom (bool): Whether this is a custom user-created car
         """
         self.id = car_id
@@ -28,139 +67,593 @@ class Car:
         self.horsepower = horsepower
         self.price = price
         self.fuel_type = fuel_type
-        self.date_added = date_added or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._date_added = date_added or None
         self.is_custom = is_custom
     
+    @property
+    def date_added(self):
+        """Date the car was added, stamped with the current time on first access if unset"""
+        if self._date_added is None:
+            self._date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return self._date_added
+    
+    @date_added.setter
+    def date_added(self, value):
+        self._date_added = value
+    
     def save(self):
         """Save the car to the database"""
-        cursor = get_cursor()
-        connection = get_connection()
-        
-        if self.id is None:
-            # Insert new car
-            cursor.execute('''
-                INSERT INTO cars (make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (self.make, self.model, self.year, self.engine, self.horsepower, 
-                  self.price, self.fuel_type, self.date_added, self.is_custom))
-            self.id = cursor.lastrowid
-        else:
-            # Update existing car
-            cursor.execute('''
-                UPDATE cars SET make=?, model=?, year=?, engine=?, horsepower=?, 
-                               price=?, fuel_type=?, is_custom=?
-                WHERE id=?
-            ''', (self.make, self.model, self.year, self.engine, self.horsepower,
-                  self.price, self.fuel_type, self.is_custom, self.id))
-        
-        connection.commit()
+        with transaction() as cursor:
+            if self.id is None:
+                # Insert new car
+                cursor.execute(INSERT_SQL, (self.make, self.model, self.year, self.engine, self.horsepower, 
+                      self.price, self.fuel_type, self.date_added, self.is_custom))
+                self.id = cursor.lastrowid
+            else:
+                # Update existing car
+                cursor.execute('''
+                    UPDATE cars SET make=?, model=?, year=?, engine=?, horsepower=?, 
+                                   price=?, fuel_type=?, is_custom=?
+                    WHERE id=?
+                ''', (self.make, self.model, self.year, self.engine, self.horsepower,
+                      self.price, self.fuel_type, self.is_custom, self.id))
+        
+        self._identity_map().put(self.id, self)
         return self.id
     
     def delete(self):
         """Delete the car from the database"""
         if self.id is not None:
-            cursor = get_cursor()
-            connection = get_connection()
-            cursor.execute('DELETE FROM cars WHERE id=?', (self.id,))
-            connection.commit()
+            with transaction() as cursor:
+                cursor.execute('DELETE FROM cars WHERE id=?', (self.id,))
+            self._identity_map().invalidate(self.id)
             return True
         return False
     
+    def validate(self):
+        """Raise ValueError if the car fails the checks applied to custom cars"""
+        error = validation_error(self.make, self.model, self.year, self.engine, self.horsepower, self.price)
+        if error:
+            raise ValueError(error)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a new Car from a dictionary such as a to_dict() result or a CSV row.
+        
+        Numeric fields are converted from strings, and any id is ignored so
+        the car is inserted as a new row.
+        """
+        return cls(**_car_kwargs(data))
+    
+    @classmethod
+    def bulk_insert(cls, cars, batch_size=10000, skip_invalid=False, defer_indexes=False):
+        """
+        Insert many cars with executemany, committing once per batch.
+        
+        Pooled connections already use WAL mode with relaxed syncing; the
+        page cache is enlarged here, and large imports pay one fsync per
+        batch instead of one per car. Rows are validated with the same checks as
+        create_custom_car.
+        
+        Args:
+            cars (iterable): Car objects or dictionaries accepted by from_dict
+            batch_size (int): Number of rows written per transaction
+            skip_invalid (bool): Drop rows that fail validation instead of raising
+            defer_indexes (bool): Drop indexes, the search index and the stats
+                summary during the load and rebuild them once at the end, which
+                is much faster for loads that are large relative to the table;
+                the loaded cars are written to the change log in one pass.
+                Either way, stale histograms and the fuzzy search terms are
+                brought up to date before returning
+        
+        Returns:
+            int: Number of cars inserted
+        """
+        get_cursor().execute('PRAGMA cache_size=-65536')
+        
+        if defer_indexes:
+            drop_derived_tables()
+            cursor = get_cursor()
+            cursor.execute('SELECT IFNULL(MAX(id), 0) FROM cars')
+            last_id = cursor.fetchone()[0]
+            try:
+                inserted = cls._insert_batches(cars, batch_size, skip_invalid)
+            finally:
+                # IDs only grow, so every car above last_id was just loaded
+                with transaction() as cursor:
+                    cursor.execute(LOG_LOADED_CARS_SQL, (last_id,))
+                create_tables()
+        else:
+            inserted = cls._insert_batches(cars, batch_size, skip_invalid)
+        
+        # Bring histograms and search terms up to date now, not on the next read
+        from . import histograms
+        histograms.refresh()
+        fuzzy.sync_terms(cls.change_version())
+        return inserted
+    
+    @classmethod
+    def _insert_batches(cls, cars, batch_size, skip_invalid):
+        """Validate cars and write them with one executemany per batch"""
+        default_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        inserted = 0
+        batch = []
+        
+        for number, car in enumerate(cars, 1):
+            try:
+                fields = car.to_dict() if isinstance(car, cls) else _car_kwargs(car)
+                error = validation_error(fields['make'], fields['model'], fields['year'],
+                                         fields['engine'], fields['horsepower'], fields['price'])
+                if error:
+                    raise ValueError(error)
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                if skip_invalid:
+                    continue
+                raise ValueError(f"Row {number}: {e}") from e
+            
+            batch.append((fields['make'], fields['model'], fields['year'], fields['engine'],
+                          fields['horsepower'], fields['price'], fields['fuel_type'],
+                          fields['date_added'] or default_date, fields['is_custom']))
+            
+            if len(batch) >= batch_size:
+                with transaction() as cursor:
+                    cursor.executemany(INSERT_SQL, batch)
+                inserted += len(batch)
+                batch = []
+        
+        if batch:
+            with transaction() as cursor:
+                cursor.executemany(INSERT_SQL, batch)
+            inserted += len(batch)
+        
+        return inserted
+    
     @classmethod
     def get_all(cls):
         """Get all cars from the database"""
+        return list(cls.iter_all())
+    
+    @classmethod
+    def iter_all(cls, batch_size=500, where=None, after=None):
+        """
+        Lazily yield cars ordered by make, model and id.
+        
+        Rows are fetched one page at a time using keyset pagination on
+        (make, model, id), so memory stays flat regardless of table size and
+        the shared cursor is free between pages.
+        
+        Args:
+            batch_size (int): Number of rows fetched per query
+            where (dict): Column filters, e.g. {'is_custom': 1} or {'year >=': 2020}
+            after (tuple): (make, model, id) of the last car already seen
+        """
+        for row in cls.iter_rows(batch_size=batch_size, where=where, after=after):
+            yield cls._from_row(row)
+    
+    @classmethod
+    def iter_rows(cls, batch_size=500, where=None, after=None):
+        """Lazily yield raw CAR_COLUMNS tuples; same arguments and order as iter_all"""
         cursor = get_cursor()
-        cursor.execute('''
-            SELECT id, make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom
-            FROM cars ORDER BY make, model
-        ''')
-        
-        cars = []
-        for row in cursor.fetchall():
-            car = cls(
-                make=row[1], model=row[2], year=row[3], engine=row[4],
-                horsepower=row[5], price=row[6], fuel_type=row[7],
-                car_id=row[0], date_added=row[8], is_custom=bool(row[9])
-            )
-            cars.append(car)
-        return cars
+        clauses, params = cls._where_clause(where)
+        if cls._walk_in_order(where, batch_size):
+            # A unary + keeps the range indexes out of the plan
+            clauses = ['+' + clause if clause.split(' ', 1)[0] in RANGE_COLUMNS else clause for clause in clauses]
+        
+        while True:
+            page_clauses = list(clauses)
+            page_params = list(params)
+            if after is not None:
+                page_clauses.append('(make, model, id) > (?, ?, ?)')
+                page_params.extend(after)
+            
+            sql = f'SELECT {CAR_COLUMNS} FROM cars'
+            if page_clauses:
+                sql += ' WHERE ' + ' AND '.join(page_clauses)
+            sql += ' ORDER BY make, model, id LIMIT ?'
+            
+            cursor.execute(sql, page_params + [batch_size])
+            rows = cursor.fetchall()
+            
+            yield from rows
+            
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            after = (last[1], last[2], last[0])
+    
+    @classmethod
+    def _walk_in_order(cls, where, page_size):
+        """
+        Whether pages with range filters should walk a make/model index and
+        skip the cars out of range, instead of reading every match from a
+        range index and sorting it, which SQLite does for each page.
+        
+        Walking reads about page_size * partition / matches cars a page and
+        sorting reads all the matches, so walking wins once matches squared
+        exceeds page_size * partition. Both are estimated from the
+        histograms and car_stats; filters these can't estimate leave the
+        choice to SQLite.
+        """
+        ranges, equalities = {}, {}
+        for key, value in (where or {}).items():
+            column, _, operator = key.partition(' ')
+            if value is None:
+                return False
+            if column in RANGE_COLUMNS and operator in ('>', '>=', '<', '<='):
+                low, high = ranges.get(column, (None, None))
+                ranges[column] = (value, high) if operator.startswith('>') else (low, value)
+            elif column in ('is_custom', 'make', 'fuel_type') and operator in ('', '='):
+                equalities[column] = value
+            else:
+                return False
+        if not ranges:
+            return False
+        
+        from . import histograms
+        matches = histograms.estimate_count(ranges, equalities)
+        partition = histograms.estimate_count(None, equalities)
+        return matches * matches > page_size * partition
+    
+    @classmethod
+    def get_collection(cls, is_custom=True, make=None, fuel_type=None, min_year=None, max_year=None,
+                       min_price=None, max_price=None, batch_size=500):
+        """
+        Lazily yield cars matching the given filters, in make/model order.
+        
+        Defaults to custom cars. Filters left as None are ignored. Equality
+        filters alone are served by indexes already in make/model order
+        (is_custom, make or fuel_type first), so a page costs its own rows.
+        Year and price ranges can't share that order: a range matching many
+        cars walks the make/model index and skips the rest, while a narrow
+        one reads its matches from a range index and sorts them for each
+        page (see _walk_in_order). Use range_query() to page through ranges
+        in value order without sorting.
+        
+        Args:
+            is_custom (bool): True for custom cars, False for stock cars, None for both
+            make (str): Exact manufacturer name
+            fuel_type (str): Exact fuel type
+            min_year, max_year (int): Inclusive year range
+            min_price, max_price (float): Inclusive price range
+            batch_size (int): Number of rows fetched per query
+        """
+        filters = {
+            'is_custom': None if is_custom is None else int(bool(is_custom)),
+            'make': make,
+            'fuel_type': fuel_type,
+            'year >=': min_year,
+            'year <=': max_year,
+            'price >=': min_price,
+            'price <=': max_price,
+        }
+        where = {key: value for key, value in filters.items() if value is not None}
+        return cls.iter_all(batch_size=batch_size, where=where)
+    
+    @classmethod
+    def range_query(cls, price=None, horsepower=None, year=None, fuel_type=None, make=None, is_custom=None,
+                    order_by='price', descending=False, limit=50, after=None):
+        """
+        Cars within numeric ranges, ordered by one of the range columns.
+        
+        Each range is a (low, high) pair, inclusive, with None for an open
+        end, e.g. electric cars between $100k and $300k with over 800 HP:
+        
+            Car.range_query(price=(100000, 300000), horsepower=(801, None), fuel_type='Electric')
+        
+        The range indexes lead with the ordering column and carry the other
+        range columns, so non-matching cars are skipped inside the index.
+        
+        Args:
+            price, horsepower, year (tuple): (low, high) ranges
+            fuel_type, make (str): Exact values
+            is_custom (bool): True for custom cars, False for stock cars, None for both
+            order_by (str): price, horsepower or year
+            descending (bool): Highest values first
+            limit (int): Maximum number of cars to return
+            after (tuple): (value, id) of the last car on the previous page
+        
+        Returns:
+            list: Matching cars
+        """
+        if order_by not in RANGE_COLUMNS:
+            raise ValueError(f"Cannot order by {order_by!r} (use {', '.join(RANGE_COLUMNS)})")
+        where = {'fuel_type': fuel_type, 'make': make,
+                 'is_custom': None if is_custom is None else int(bool(is_custom))}
+        for column, bounds in (('price', price), ('horsepower', horsepower), ('year', year)):
+            low, high = bounds or (None, None)
+            where[f'{column} >='] = low
+            where[f'{column} <='] = high
+        clauses, params = cls._where_clause({key: value for key, value in where.items() if value is not None})
+        
+        direction = 'DESC' if descending else 'ASC'
+        if after is not None:
+            clauses.append(f"({order_by}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        sql = f'SELECT {CAR_COLUMNS} FROM cars'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY {order_by} {direction}, id {direction} LIMIT ?'
+        
+        cursor = get_cursor()
+        cursor.execute(sql, params + [limit])
+        return [cls._from_row(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _where_clause(where):
+        """
+        Build SQL clauses and parameters from a {'column [op]': value} dict.
+        
+        A None value with = or != becomes IS NULL or IS NOT NULL.
+        """
+        clauses, params = [], []
+        for key, value in (where or {}).items():
+            column, _, operator = key.partition(' ')
+            operator = operator or '='
+            if column not in CAR_FIELDS or operator not in WHERE_OPERATORS:
+                raise ValueError(f"Unsupported filter: {key!r}")
+            if value is None and operator in ('=', '!='):
+                clauses.append(f"{column} IS {'NOT ' if operator == '!=' else ''}NULL")
+                continue
+            clauses.append(f'{column} {operator} ?')
+            params.append(value)
+        return clauses, params
+    
+    @classmethod
+    def _from_row(cls, row):
+        """Build a Car from a row selected with CAR_COLUMNS"""
+        return cls(
+            make=row[1], model=row[2], year=row[3], engine=row[4],
+            horsepower=row[5], price=row[6], fuel_type=row[7],
+            car_id=row[0], date_added=row[8], is_custom=bool(row[9])
+        )
     
     @classmethod
     def get_by_id(cls, car_id):
-        """Get a specific car by ID"""
+        """Get a specific car by ID, served from the identity map when cached"""
+        cache = cls._identity_map()
+        car = cache.get(car_id)
+        if car is not None:
+            return car
+        
         cursor = get_cursor()
-        cursor.execute('''
-            SELECT id, make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom
-            FROM cars WHERE id=?
-        ''', (car_id,))
+        cursor.execute(f'SELECT {CAR_COLUMNS} FROM cars WHERE id=?', (car_id,))
         
         row = cursor.fetchone()
         if row:
-            return cls(
-                make=row[1], model=row[2], year=row[3], engine=row[4],
-                horsepower=row[5], price=row[6], fuel_type=row[7],
-                car_id=row[0], date_added=row[8], is_custom=bool(row[9])
-            )
+            car = cls._from_row(row)
+            cache.put(car.id, car)
+            return car
         return None
     
     @classmethod
-    def search(cls, query):
-        """Search cars by make, model, or fuel type"""
+    def get_many(cls, car_ids):
+        """
+        Get several cars by ID with at most one query per 500 uncached IDs.
+        
+        Returns a list aligned with car_ids, holding None for unknown IDs.
+        """
+        cache = cls._identity_map()
+        found = {}
+        missing = []
+        for car_id in dict.fromkeys(car_ids):
+            car = cache.get(car_id)
+            if car is None:
+                missing.append(car_id)
+            else:
+                found[car_id] = car
+        
+        cursor = get_cursor()
+        for start in range(0, len(missing), MAX_IN_PARAMETERS):
+            chunk = missing[start:start + MAX_IN_PARAMETERS]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT {CAR_COLUMNS} FROM cars WHERE id IN ({placeholders})', chunk)
+            for row in cursor.fetchall():
+                car = cls._from_row(row)
+                cache.put(car.id, car)
+                found[car.id] = car
+        
+        return [found.get(car_id) for car_id in car_ids]
+    
+    @classmethod
+    def _identity_map(cls):
+        """The identity map of the database the calling thread is using"""
+        return current_pool().identity_map
+    
+    @classmethod
+    def change_version(cls):
+        """Counter that increases with every insert, update or delete of a car"""
+        cursor = get_cursor()
+        cursor.execute("SELECT version FROM change_counter WHERE name = 'cars'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    @classmethod
+    def cache_stats(cls):
+        """Return identity-map hit/miss counters for sizing the cache"""
+        return cls._identity_map().stats()
+    
+    @classmethod
+    def search(cls, query, limit=None, offset=0):
+        """
+        Search cars by make, model, or fuel type using the full-text index.
+        
+        Every word in the query must prefix-match a word in the make, model
+        or fuel type (so "ferr" finds Ferrari and "gt r" finds GT-R).
+        Results are ranked by BM25 relevance, best match first, within the
+        first SEARCH_RANKED_CANDIDATES matches (see search_ranked).
+        
+        Args:
+            query (str): Search terms
+            limit (int): Maximum number of cars to return (None for all)
+            offset (int): Number of ranked results to skip, for paging
+        """
+        return [car for car, _ in cls.search_ranked(query, limit, offset)]
+    
+    @classmethod
+    def search_ranked(cls, query, limit=None, offset=0):
+        """
+        Like search(), but returns (Car, BM25 rank) pairs; lower ranks are better matches.
+        
+        Ordering every match by rank would score all of them before the
+        first row came back, which for a broad query ("nissan" in a
+        million-car catalog) means scoring 100,000 cars to show 20. Only
+        the first SEARCH_RANKED_CANDIDATES matches in ID order, which
+        FTS5 produces without looking further, are ranked; any later
+        matches follow them unranked, with rank None, in ID order. The
+        order is the same for every page, so paging stays consistent. The
+        trade-off is that a stronger match among newer cars past the
+        window is not moved to the front; narrower queries have fewer
+        matches than the window and are ranked in full.
+        """
+        match = cls._fts_query(query)
+        if not match:
+            return []
+        
+        window = SEARCH_RANKED_CANDIDATES
+        end = None if limit is None else offset + limit
+        columns = ', '.join('c.' + field for field in CAR_FIELDS)
         cursor = get_cursor()
-        search_term = f"%{query}%"
-        cursor.execute('''
-            SELECT id, make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom
-            FROM cars 
-            WHERE LOWER(make) LIKE LOWER(?) OR LOWER(model) LIKE LOWER(?) OR LOWER(fuel_type) LIKE LOWER(?)
-            ORDER BY make, model
-        ''', (search_term, search_term, search_term))
-        
-        cars = []
-        for row in cursor.fetchall():
-            car = cls(
-                make=row[1], model=row[2], year=row[3], engine=row[4],
-                horsepower=row[5], price=row[6], fuel_type=row[7],
-                car_id=row[0], date_added=row[8], is_custom=bool(row[9])
-            )
-            cars.append(car)
-        return cars
-    
-    @classmethod
-    def get_collection_stats(cls):
-        """Get statistics about the car collection"""
+        rows = []
+        if offset < window:
+            cursor.execute(f'''
+                SELECT {columns}, hits.rank
+                FROM (
+                    SELECT rowid, rank FROM cars_fts
+                    WHERE cars_fts MATCH ?
+                    LIMIT ?
+                ) AS hits
+                JOIN cars c ON c.id = hits.rowid
+                ORDER BY hits.rank, c.make, c.model, c.id
+                LIMIT ? OFFSET ?
+            ''', (match, window, (window if end is None else min(end, window)) - offset, offset))
+            rows = cursor.fetchall()
+        if end is None or end > window:
+            skip = max(offset, window)
+            cursor.execute(f'''
+                SELECT {columns}, NULL
+                FROM (
+                    SELECT rowid FROM cars_fts
+                    WHERE cars_fts MATCH ?
+                    LIMIT ? OFFSET ?
+                ) AS hits
+                JOIN cars c ON c.id = hits.rowid
+                ORDER BY c.id
+            ''', (match, -1 if end is None else end - skip, skip))
+            rows += cursor.fetchall()
+        
+        return [(cls._from_row(row), row[10]) for row in rows]
+    
+    @classmethod
+    def fuzzy_search(cls, query, limit=20, threshold=fuzzy.DEFAULT_THRESHOLD):
+        """
+        Typo-tolerant search over make, model and engine.
+        
+        Each query word matches catalog words that start with it or are
+        similar to it by trigrams, with case and accents folded, so
+        "Lamborgini Huracan" finds the Lamborghini Huracán. Words shorter
+        than three characters or starting with a digit only match as prefixes.
+        
+        Args:
+            query (str): Search terms
+            limit (int): Maximum number of cars to return
+            threshold (float): Minimum similarity (0-1) for a word to match
+        
+        Returns:
+            list: (Car, score) pairs, best first; score is the mean similarity
+            of each query word to the closest word in the car's description
+        """
+        query_words = fuzzy.words(query)
+        if not query_words:
+            return []
+        fuzzy.sync_terms_later(cls.change_version())
+        
+        groups = []
+        for word in query_words:
+            alternatives = [f'"{word}"*'] + [f'"{term}"' for term, _ in fuzzy.similar_terms(word, threshold)]
+            groups.append('(' + ' OR '.join(alternatives) + ')')
+        
+        # Take the first window of matches in rowid order, which FTS5 can stop
+        # early on, and rank that window by similarity
         cursor = get_cursor()
+        cursor.execute(f'''
+            SELECT {', '.join('c.' + field for field in CAR_FIELDS)}
+            FROM (
+                SELECT rowid FROM cars_fuzzy
+                WHERE cars_fuzzy MATCH ?
+                LIMIT ?
+            ) AS hits
+            JOIN cars c ON c.id = hits.rowid
+        ''', (' AND '.join(groups), max(limit * FUZZY_CANDIDATE_FACTOR, FUZZY_MIN_CANDIDATES)))
+        
+        # Many candidates share a description (same make, model and engine),
+        # so each distinct one is scored once
+        scores = {}
+        scored = []
+        for position, row in enumerate(cursor.fetchall()):
+            car = cls._from_row(row)
+            description = f"{car.make} {car.model} {car.engine}"
+            score = scores.get(description)
+            if score is None:
+                car_words = fuzzy.words(description)
+                score = scores[description] = sum(
+                    max((fuzzy.word_score(word, car_word) for car_word in car_words), default=0.0)
+                    for word in query_words) / len(query_words)
+            scored.append((-score, position, car))
+        scored.sort(key=lambda item: item[:2])
+        return [(car, -negative_score) for negative_score, _, car in scored[:limit]]
+    
+    @staticmethod
+    def _fts_query(query):
+        """Turn free text into an FTS5 query of quoted prefix terms"""
+        terms = re.findall(r"\w+", query or "")
+        return " ".join(f'"{term}"*' for term in terms)
+    
+    @classmethod
+    def get_collection_stats(cls, is_custom=None, make=None):
+        """
+        Get statistics about the car collection.
         
-        # Total cars
-        cursor.execute('SELECT COUNT(*) FROM cars')
-        total_cars = cursor.fetchone()[0]
+        Counts and totals come from the car_stats summary table, which
+        triggers keep up to date, so every aggregate is computed from one
+        small read regardless of catalog size. The most expensive car is a
+        single lookup on a price index.
         
-        # Total value
-        cursor.execute('SELECT SUM(price) FROM cars')
-        total_value = cursor.fetchone()[0] or 0
+        Args:
+            is_custom (bool): Limit to the collection (True) or stock cars (False)
+            make (str): Limit to a single manufacturer
+        """
+        cursor = get_cursor()
+        filters = {'is_custom': None if is_custom is None else int(bool(is_custom)), 'make': make}
+        where = {key: value for key, value in filters.items() if value is not None}
+        clauses, params = cls._where_clause(where)
+        condition = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
         
-        # Average price
-        cursor.execute('SELECT AVG(price) FROM cars')
-        avg_price = cursor.fetchone()[0] or 0
+        cursor.execute(f'SELECT make, fuel_type, car_count, total_price FROM car_stats{condition}', params)
         
-        # Most expensive car
-        cursor.execute('SELECT make, model, price FROM cars ORDER BY price DESC LIMIT 1')
-        most_expensive = cursor.fetchone()
+        total_cars = 0
+        total_value = 0
+        fuel_breakdown = {}
+        make_counts = {}
+        for row_make, fuel_type, car_count, total_price in cursor.fetchall():
+            total_cars += car_count
+            total_value += total_price
+            fuel_breakdown[fuel_type] = fuel_breakdown.get(fuel_type, 0) + car_count
+            make_counts[row_make] = make_counts.get(row_make, 0) + car_count
         
-        # Fuel type breakdown
-        cursor.execute('SELECT fuel_type, COUNT(*) FROM cars GROUP BY fuel_type')
-        fuel_breakdown = dict(cursor.fetchall())
+        top_makes = sorted(make_counts.items(), key=lambda item: (-item[1], item[0]))[:5]
         
-        # Make breakdown
-        cursor.execute('SELECT make, COUNT(*) FROM cars GROUP BY make ORDER BY COUNT(*) DESC LIMIT 5')
-        make_breakdown = dict(cursor.fetchall())
+        # Most expensive car, served by the price indexes
+        cursor.execute(f'SELECT make, model, price FROM cars{condition} ORDER BY price DESC LIMIT 1', params)
+        most_expensive = cursor.fetchone()
         
         return {
             'total_cars': total_cars,
             'total_value': total_value,
-            'avg_price': avg_price,
+            'avg_price': total_value / total_cars if total_cars else 0,
             'most_expensive': most_expensive,
-            'fuel_breakdown': fuel_breakdown,
-            'make_breakdown': make_breakdown
+            'fuel_breakdown': dict(sorted(fuel_breakdown.items())),
+            'make_breakdown': dict(top_makes)
         }
     
     def __str__(self):
@@ -199,4 +692,37 @@ class Car:
             'fuel_type': self.fuel_type,
             'date_added': self.date_added,
             'is_custom': self.is_custom
-        }
\ No newline at end of file
+        }
+
+def validation_error(make, model, year, engine, horsepower, price):
+    """Return the reason a car's fields are invalid, or None if they pass"""
+    if not make:
+        return "Make is required."
+    if not model:
+        return "Model is required."
+    if year < MIN_YEAR or year > MAX_YEAR:
+        return f"Please enter a reasonable year ({MIN_YEAR}-{MAX_YEAR})."
+    if not engine:
+        return "Engine specification is required."
+    if horsepower < 1 or horsepower > MAX_HORSEPOWER:
+        return f"Please enter a reasonable horsepower (1-{MAX_HORSEPOWER})."
+    if price < 0:
+        return "Price cannot be negative."
+    return None
+
+def _car_kwargs(data):
+    """Convert a loosely typed record into Car constructor arguments"""
+    is_custom = data.get('is_custom') or False
+    if isinstance(is_custom, str):
+        is_custom = is_custom.strip().lower() in ('1', 'true', 'yes', 'y')
+    return {
+        'make': (data['make'] or '').strip(),
+        'model': (data['model'] or '').strip(),
+        'year': int(data['year']),
+        'engine': (data['engine'] or '').strip(),
+        'horsepower': int(data['horsepower']),
+        'price': float(data['price']),
+        'fuel_type': data.get('fuel_type') or "Gasoline",
+        'date_added': data.get('date_added') or None,
+        'is_custom': bool(is_custom),
+    }
@@ -0,0 +1,122 @@
+# lib/models/car_frame.py
+
+from array import array
+from functools import lru_cache
+from itertools import islice
+import sys
+
+from .car import Car, CAR_FIELDS
+
+# array typecodes for the numeric columns
+NUMERIC_COLUMNS = {'id': 'q', 'year': 'h', 'horsepower': 'i', 'price': 'd', 'is_custom': 'b'}
+TEXT_COLUMNS = ('make', 'model', 'engine', 'fuel_type', 'date_added')
+INTERNED_COLUMNS = ('make', 'fuel_type')
+
+@lru_cache(maxsize=None)
+def load_numpy():
+    """
+    The numpy module, or None if it isn't installed.
+    
+    NumPy is optional (columns stay plain arrays without it) and takes
+    about a tenth of a second to import, so it is only imported once a
+    caller actually needs it rather than when the program starts.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class CarFrame:
+    """
+    Column-oriented container for large batches of cars.
+    
+    Numeric columns are packed into typed arrays and repeated strings
+    (make and fuel type) are interned, so a million cars take a fraction of
+    the memory of a million Car objects. Cars are only built on demand.
+    """
+    
+    def __init__(self):
+        """Create an empty frame"""
+        self.columns = {name: array(typecode) for name, typecode in NUMERIC_COLUMNS.items()}
+        self.columns.update({name: [] for name in TEXT_COLUMNS})
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a frame from rows selected with CAR_COLUMNS"""
+        frame = cls()
+        frame.extend(rows)
+        return frame
+    
+    @classmethod
+    def load(cls, where=None, batch_size=5000):
+        """
+        Load cars from the database into a frame.
+        
+        Args:
+            where (dict): Column filters, as accepted by Car.iter_all
+            batch_size (int): Number of rows fetched per query
+        """
+        return cls.from_rows(Car.iter_rows(batch_size=batch_size, where=where))
+    
+    def extend(self, rows, chunk_size=5000):
+        """Append rows selected with CAR_COLUMNS, transposing a chunk at a time"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            for name, values in zip(CAR_FIELDS, zip(*chunk)):
+                if name in INTERNED_COLUMNS:
+                    values = [value if value is None else sys.intern(value) for value in values]
+                self.columns[name].extend(values)
+    
+    def __len__(self):
+        return len(self.columns['id'])
+    
+    def __getitem__(self, index):
+        """Materialise the car at a position in the frame"""
+        columns = self.columns
+        return Car(
+            make=columns['make'][index], model=columns['model'][index], year=columns['year'][index],
+            engine=columns['engine'][index], horsepower=columns['horsepower'][index],
+            price=columns['price'][index], fuel_type=columns['fuel_type'][index],
+            car_id=columns['id'][index], date_added=columns['date_added'][index],
+            is_custom=bool(columns['is_custom'][index])
+        )
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+    
+    def column(self, name):
+        """Return a column: an array for numeric fields, a list for text fields"""
+        return self.columns[name]
+    
+    def as_numpy(self, name):
+        """Return a numeric column as a zero-copy NumPy array (requires NumPy)"""
+        numpy = load_numpy()
+        if numpy is None:
+            raise RuntimeError("NumPy is not installed")
+        column = self.columns[name]
+        return numpy.frombuffer(column, dtype=column.typecode)
+    
+    def total(self, name):
+        """Sum of a numeric column"""
+        return sum(self.columns[name])
+    
+    def mean(self, name):
+        """Mean of a numeric column, or 0 for an empty frame"""
+        return self.total(name) / len(self) if len(self) else 0
+    
+    def argmax(self, name):
+        """Position of the largest value in a numeric column, or None if empty"""
+        column = self.columns[name]
+        if not column:
+            return None
+        return max(range(len(column)), key=column.__getitem__)
+    
+    def nbytes(self):
+        """Approximate memory held by the numeric columns"""
+        return sum(column.itemsize * len(column) for name, column in self.columns.items()
+                   if name in NUMERIC_COLUMNS)
@@ -0,0 +1,246 @@
+# lib/models/changes.py
+
+"""
+Change data capture and incremental sync between catalog databases.
+
+Triggers append every insert, update and delete of a car to car_changes,
+numbered by an ever-increasing sequence number, with inserts and updates
+carrying a JSON copy of the row. A replica remembers in sync_checkpoints
+the last sequence number it applied from each source, so bringing it up
+to date reads only the log entries after that point and costs time
+proportional to what changed, not to the size of the catalog.
+
+Changes are applied in batches, each in one transaction together with
+its checkpoint, so an interrupted sync loses nothing and applies nothing
+twice. Within a batch only the last change to each car is applied.
+
+Usage:
+    changes.clone('catalog.db', 'replica.db')     # once, copies the whole file
+    with use_database(ConnectionPool('replica.db')):
+        changes.pull('catalog.db')                 # then as often as wanted
+"""
+
+import gzip
+import json
+import os
+import time
+from itertools import islice
+
+from . import ConnectionPool, current_pool, get_connection, get_cursor, transaction, use_database
+from .car import Car, CAR_FIELDS
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Rows already identical on the replica are left alone, so their triggers don't fire
+UPSERT_SQL = f'''
+    INSERT INTO cars ({', '.join(CAR_FIELDS)}) VALUES ({', '.join('?' * len(CAR_FIELDS))})
+    ON CONFLICT (id) DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in CAR_FIELDS[1:])}
+    WHERE ({', '.join(f'cars.{field}' for field in CAR_FIELDS[1:])})
+          IS NOT ({', '.join(f'excluded.{field}' for field in CAR_FIELDS[1:])})
+'''
+
+def latest_seq():
+    """Sequence number of the newest change ever logged in the current database"""
+    cursor = get_cursor()
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'car_changes'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def changes_since(seq, limit=DEFAULT_BATCH_SIZE):
+    """
+    Up to limit changes logged after seq, oldest first, as
+    (seq, car_id, op, row) with row a JSON string or None.
+    
+    Raises:
+        ValueError: If changes after seq have already been pruned
+    """
+    cursor = get_cursor()
+    cursor.execute('SELECT seq, car_id, op, row FROM car_changes WHERE seq > ? ORDER BY seq LIMIT ?',
+                   (seq, limit))
+    rows = cursor.fetchall()
+    # Sequence numbers have no gaps, so a missing next change was pruned
+    first = rows[0][0] if rows else latest_seq() + 1
+    if first > seq + 1:
+        raise ValueError(f"Changes after {seq} have been pruned from the log; clone the replica again")
+    return rows
+
+def prune(before_seq):
+    """
+    Delete logged changes older than before_seq.
+    
+    Returns:
+        int: Number of changes deleted
+    """
+    with transaction() as cursor:
+        cursor.execute('DELETE FROM car_changes WHERE seq < ?', (before_seq,))
+        return cursor.rowcount
+
+def checkpoint(source):
+    """Last sequence number from source applied to the current database (0 if never synced)"""
+    cursor = get_cursor()
+    cursor.execute('SELECT seq FROM sync_checkpoints WHERE source = ?', (source,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def apply(source, changes):
+    """
+    Apply a batch of (seq, car_id, op, row) changes from source to the
+    current database in one transaction, and advance its checkpoint.
+    
+    Changes at or before the checkpoint are skipped, so a batch can be
+    applied again safely.
+    
+    Returns:
+        int: Number of cars written or deleted
+    """
+    changes = list(changes)
+    if not changes:
+        return 0
+    with transaction() as cursor:
+        done = checkpoint(source)
+        latest = {}
+        for seq, car_id, op, row in changes:
+            if seq > done:
+                latest[car_id] = (op, row)
+        upserts = []
+        deletes = []
+        for car_id, (op, row) in latest.items():
+            if op == 'delete':
+                deletes.append((car_id,))
+            else:
+                values = json.loads(row) if isinstance(row, str) else row
+                upserts.append(tuple(values[field] for field in CAR_FIELDS))
+        upserts.sort()  # in ID order, so neighbouring rows share pages
+        cursor.executemany(UPSERT_SQL, upserts)
+        cursor.executemany('DELETE FROM cars WHERE id = ?', deletes)
+        cursor.execute('''
+            INSERT INTO sync_checkpoints (source, seq, synced_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (source) DO UPDATE SET seq = MAX(seq, excluded.seq), synced_at = excluded.synced_at
+        ''', (source, max(change[0] for change in changes)))
+    cache = Car._identity_map()
+    for car_id in latest:
+        cache.invalidate(car_id)
+    return len(latest)
+
+def source_name(path):
+    """Checkpoint key for a source database file"""
+    return os.path.abspath(path)
+
+def pull(source, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Bring the current database up to date with the source database file.
+    
+    Returns:
+        dict: changes read, cars written, batches, last sequence number applied, seconds
+    """
+    start = time.perf_counter()
+    name = source_name(source)
+    seq = checkpoint(name)
+    source_pool = ConnectionPool(source, seed_samples=False)
+    read = written = batches = 0
+    try:
+        while True:
+            with use_database(source_pool):
+                batch = changes_since(seq, batch_size)
+            if not batch:
+                break
+            written += apply(name, batch)
+            read += len(batch)
+            batches += 1
+            seq = batch[-1][0]
+            if len(batch) < batch_size:
+                break
+    finally:
+        source_pool.close_all()
+    return {'changes': read, 'cars': written, 'batches': batches, 'seq': seq,
+            'seconds': time.perf_counter() - start}
+
+def clone(source, replica):
+    """
+    Start a replica as a full copy of source, using SQLite's online backup
+    so the source can stay in use, checkpointed at the copied log's end.
+    
+    Returns:
+        int: The replica's checkpoint
+    """
+    if os.path.exists(replica):
+        raise ValueError(f"{replica} already exists")
+    source_pool = ConnectionPool(source, seed_samples=False)
+    try:
+        with use_database(source_pool):
+            target = ConnectionPool(replica, seed_samples=False).connect()
+            try:
+                get_connection().backup(target)
+            finally:
+                target.close()
+    finally:
+        source_pool.close_all()
+    replica_pool = ConnectionPool(replica, seed_samples=False)
+    try:
+        with use_database(replica_pool):
+            seq = latest_seq()
+            with transaction() as cursor:
+                cursor.execute('DELETE FROM sync_checkpoints')
+                cursor.execute('INSERT INTO sync_checkpoints (source, seq) VALUES (?, ?)', (source_name(source), seq))
+    finally:
+        replica_pool.close_all()
+    return seq
+
+def export_changes(path, since=0):
+    """
+    Write the current database's changes logged after since to a JSON
+    Lines file (gzipped if path ends in .gz), for a replica on another
+    machine to apply. The first line names the source and where the
+    changes start.
+    
+    Returns:
+        dict: path, changes written, last sequence number
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    seq = since
+    count = 0
+    with opener(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'source': source_name(current_pool().database), 'since': since}) + '\n')
+        while True:
+            batch = changes_since(seq, DEFAULT_BATCH_SIZE)
+            for change_seq, car_id, op, row in batch:
+                f.write(json.dumps({'seq': change_seq, 'car_id': car_id, 'op': op,
+                                    'row': json.loads(row) if row else None}, ensure_ascii=False) + '\n')
+            count += len(batch)
+            if batch:
+                seq = batch[-1][0]
+            if len(batch) < DEFAULT_BATCH_SIZE:
+                break
+    return {'path': path, 'changes': count, 'seq': seq}
+
+def apply_file(path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Apply a file written by export_changes to the current database.
+    
+    Returns:
+        dict: changes read, cars written, batches, last sequence number applied
+    
+    Raises:
+        ValueError: If the file starts after the replica's checkpoint, so
+            changes in between would be missed
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    read = written = batches = 0
+    with opener(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        name = header['source']
+        seq = checkpoint(name)
+        if header['since'] > seq:
+            raise ValueError(f"{path} starts after change {header['since']} but the replica is at {seq}; "
+                             f"export again with --since {seq}")
+        records = (json.loads(line) for line in f if line.strip())
+        while True:
+            batch = [(record['seq'], record['car_id'], record['op'], record['row'])
+                     for record in islice(records, batch_size)]
+            if not batch:
+                break
+            written += apply(name, batch)
+            read += len(batch)
+            batches += 1
+            seq = max(seq, batch[-1][0])
+    return {'changes': read, 'cars': written, 'batches': batches, 'seq': seq}
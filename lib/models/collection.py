@@ -0,0 +1,192 @@
+# lib/models/collection.py
+
+"""
+Per-user car collections.
+
+A collection belongs to one user and lists catalog cars by ID in
+collection_items, so adding a car is a single small insert and no car row
+is ever copied. collection_items is clustered by collection, so listing,
+counting, summarising or exporting a collection reads only that
+collection's items, however many users and cars the catalog holds.
+
+The current user comes from CAR_COLLECTION_USER (default "default").
+"""
+
+import os
+
+from . import get_cursor, transaction
+from .car import Car, CAR_FIELDS, MAX_IN_PARAMETERS
+from .migrations import DEFAULT_USER, DEFAULT_COLLECTION
+
+CURRENT_USER = os.environ.get('CAR_COLLECTION_USER', DEFAULT_USER)
+
+# Car columns prefixed for queries joining collection_items to cars
+ITEM_CAR_COLUMNS = ', '.join('c.' + field for field in CAR_FIELDS)
+
+class Collection:
+    """One user's named collection of catalog and custom cars"""
+    
+    def __init__(self, collection_id, user, name):
+        self.id = collection_id
+        self.user = user
+        self.name = name
+    
+    def __repr__(self):
+        return f"Collection(id={self.id}, user={self.user!r}, name={self.name!r})"
+    
+    @classmethod
+    def for_user(cls, user=None, name=DEFAULT_COLLECTION):
+        """Get a user's collection by name, creating it if needed (user defaults to CURRENT_USER)"""
+        user = user or CURRENT_USER
+        cursor = get_cursor()
+        cursor.execute('SELECT id FROM collections WHERE user = ? AND name = ?', (user, name))
+        row = cursor.fetchone()
+        if row is None:
+            with transaction() as cursor:
+                cursor.execute('INSERT OR IGNORE INTO collections (user, name) VALUES (?, ?)', (user, name))
+                cursor.execute('SELECT id FROM collections WHERE user = ? AND name = ?', (user, name))
+                row = cursor.fetchone()
+        return cls(row[0], user, name)
+    
+    @classmethod
+    def names_for_user(cls, user=None):
+        """Names of every collection a user has"""
+        cursor = get_cursor()
+        cursor.execute('SELECT name FROM collections WHERE user = ? ORDER BY name', (user or CURRENT_USER,))
+        return [name for (name,) in cursor.fetchall()]
+    
+    def add(self, car):
+        """
+        Add a car (or car ID) to the collection.
+        
+        Returns:
+            bool: False if the car was already in the collection
+        """
+        car_id = getattr(car, 'id', car)
+        with transaction() as cursor:
+            cursor.execute('INSERT OR IGNORE INTO collection_items (collection_id, car_id) VALUES (?, ?)',
+                           (self.id, car_id))
+            return cursor.rowcount > 0
+    
+    def remove(self, car):
+        """
+        Remove a car from the collection.
+        
+        A custom car exists only for the collections holding it, so it is
+        deleted once no collection holds it any more.
+        
+        Returns:
+            bool: False if the car was not in the collection
+        """
+        car = car if isinstance(car, Car) else Car.get_by_id(car)
+        if car is None:
+            return False
+        with transaction() as cursor:
+            cursor.execute('DELETE FROM collection_items WHERE collection_id = ? AND car_id = ?', (self.id, car.id))
+            if not cursor.rowcount:
+                return False
+            cursor.execute('SELECT 1 FROM collection_items WHERE car_id = ? LIMIT 1', (car.id,))
+            if car.is_custom and cursor.fetchone() is None:
+                car.delete()
+        return True
+    
+    def __contains__(self, car):
+        cursor = get_cursor()
+        cursor.execute('SELECT 1 FROM collection_items WHERE collection_id = ? AND car_id = ?',
+                       (self.id, getattr(car, 'id', car)))
+        return cursor.fetchone() is not None
+    
+    def member_ids(self, car_ids):
+        """The subset of car_ids that are in the collection"""
+        car_ids = list(dict.fromkeys(car_ids))
+        members = set()
+        cursor = get_cursor()
+        for start in range(0, len(car_ids), MAX_IN_PARAMETERS):
+            chunk = car_ids[start:start + MAX_IN_PARAMETERS]
+            cursor.execute(f'SELECT car_id FROM collection_items WHERE collection_id = ? '
+                           f'AND car_id IN ({", ".join("?" * len(chunk))})', [self.id] + chunk)
+            members.update(car_id for (car_id,) in cursor.fetchall())
+        return members
+    
+    def __len__(self):
+        cursor = get_cursor()
+        cursor.execute('SELECT COUNT(*) FROM collection_items WHERE collection_id = ?', (self.id,))
+        return cursor.fetchone()[0]
+    
+    def iter_batches(self, batch_size=5000):
+        """Yield lists of CAR_COLUMNS rows in make/model order from one open cursor"""
+        cursor = get_cursor()
+        cursor.execute(f'''
+            SELECT {ITEM_CAR_COLUMNS}
+            FROM collection_items i JOIN cars c ON c.id = i.car_id
+            WHERE i.collection_id = ?
+            ORDER BY c.make, c.model, c.id
+        ''', (self.id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    
+    def items(self, batch_size=500):
+        """Lazily yield (Car, added_at) for every car in the collection, in make/model order"""
+        cursor = get_cursor()
+        cursor.execute(f'''
+            SELECT {ITEM_CAR_COLUMNS}, i.added_at
+            FROM collection_items i JOIN cars c ON c.id = i.car_id
+            WHERE i.collection_id = ?
+            ORDER BY c.make, c.model, c.id
+        ''', (self.id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield Car._from_row(row), row[len(CAR_FIELDS)]
+    
+    def cars(self, batch_size=500):
+        """Lazily yield every car in the collection, in make/model order"""
+        for car, _ in self.items(batch_size):
+            yield car
+    
+    def stats(self):
+        """
+        Statistics for this collection, shaped like Car.get_collection_stats().
+        
+        Aggregated over the collection's own items only.
+        """
+        cursor = get_cursor()
+        cursor.execute('''
+            SELECT c.make, IFNULL(c.fuel_type, 'Unknown'), COUNT(*), SUM(c.price)
+            FROM collection_items i JOIN cars c ON c.id = i.car_id
+            WHERE i.collection_id = ?
+            GROUP BY 1, 2
+        ''', (self.id,))
+        
+        total_cars = 0
+        total_value = 0
+        fuel_breakdown = {}
+        make_counts = {}
+        for make, fuel_type, car_count, total_price in cursor.fetchall():
+            total_cars += car_count
+            total_value += total_price
+            fuel_breakdown[fuel_type] = fuel_breakdown.get(fuel_type, 0) + car_count
+            make_counts[make] = make_counts.get(make, 0) + car_count
+        
+        cursor.execute('''
+            SELECT c.make, c.model, c.price
+            FROM collection_items i JOIN cars c ON c.id = i.car_id
+            WHERE i.collection_id = ?
+            ORDER BY c.price DESC LIMIT 1
+        ''', (self.id,))
+        most_expensive = cursor.fetchone()
+        
+        top_makes = sorted(make_counts.items(), key=lambda item: (-item[1], item[0]))[:5]
+        return {
+            'total_cars': total_cars,
+            'total_value': total_value,
+            'avg_price': total_value / total_cars if total_cars else 0,
+            'most_expensive': most_expensive,
+            'fuel_breakdown': dict(sorted(fuel_breakdown.items())),
+            'make_breakdown': dict(top_makes)
+        }
@@ -0,0 +1,197 @@
+# lib/models/comparison.py
+
+"""
+Vectorized comparison and ranking of cars.
+
+Numeric columns are loaded with a single query into NumPy arrays (or
+plain lists when NumPy is not installed), and every metric is computed
+for all cars at once. Metrics that are undefined for a car, such as
+power-to-price for a car priced at 0, come back as NaN and never win.
+"""
+
+from array import array
+from datetime import datetime
+import heapq
+import math
+
+from . import get_cursor
+from .car import Car, MAX_IN_PARAMETERS
+from .car_frame import load_numpy
+
+# name -> (label, higher_is_better)
+METRICS = {
+    'year': ("Year", True),
+    'horsepower': ("Horsepower", True),
+    'price': ("Price", False),
+    'hp_per_1000': ("HP per $1000", True),
+    'hp_per_year': ("HP per year of age", True),
+    'score': ("Weighted score", True),
+}
+
+DEFAULT_METRICS = ('year', 'horsepower', 'price', 'hp_per_1000')
+
+# Weights used by the 'score' metric; each metric is scaled to 0..1 first
+DEFAULT_WEIGHTS = {'horsepower': 1.0, 'hp_per_1000': 1.0, 'year': 0.5, 'price': 0.5}
+
+NUMERIC_SQL = 'SELECT id, year, horsepower, price FROM cars'
+
+def load_columns(ids=None, where=None, batch_size=10000):
+    """
+    Load id, year, horsepower and price columns in one query.
+    
+    Args:
+        ids (list): Only load these car IDs
+        where (dict): Column filters, as accepted by Car.iter_all
+        batch_size (int): Rows fetched from the cursor at a time
+    """
+    columns = {'id': array('q'), 'year': array('d'), 'horsepower': array('d'), 'price': array('d')}
+    cursor = get_cursor()
+    
+    if ids is not None:
+        queries = []
+        ids = list(dict.fromkeys(ids))
+        for start in range(0, len(ids), MAX_IN_PARAMETERS):
+            chunk = ids[start:start + MAX_IN_PARAMETERS]
+            queries.append((f"{NUMERIC_SQL} WHERE id IN ({', '.join('?' * len(chunk))})", chunk))
+    else:
+        clauses, params = Car._where_clause(where)
+        sql = NUMERIC_SQL + (' WHERE ' + ' AND '.join(clauses) if clauses else '')
+        queries = [(sql, params)]
+    
+    for sql, params in queries:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for name, values in zip(('id', 'year', 'horsepower', 'price'), zip(*rows)):
+                columns[name].extend(values)
+    
+    numpy = load_numpy()  # None without NumPy: fall back to pure-Python columns
+    if numpy is not None:
+        return {name: numpy.frombuffer(column, dtype=column.typecode) for name, column in columns.items()}
+    return {name: list(column) for name, column in columns.items()}
+
+def metric_values(columns, metric, weights=None):
+    """Compute one metric for every loaded car"""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric!r}")
+    
+    year, horsepower, price = columns['year'], columns['horsepower'], columns['price']
+    numpy = load_numpy()
+    
+    if metric in ('year', 'horsepower', 'price'):
+        return columns[metric]
+    
+    if metric == 'hp_per_1000':
+        if numpy is not None:
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                return numpy.where(price > 0, horsepower / price * 1000, numpy.nan)
+        return [hp / p * 1000 if p > 0 else math.nan for hp, p in zip(horsepower, price)]
+    
+    if metric == 'hp_per_year':
+        current_year = datetime.now().year
+        if numpy is not None:
+            return horsepower / numpy.maximum(current_year - year + 1, 1)
+        return [hp / max(current_year - y + 1, 1) for hp, y in zip(horsepower, year)]
+    
+    # Weighted score: scale each component to 0..1 (inverting lower-is-better ones) and sum
+    total = None
+    for name, weight in (weights or DEFAULT_WEIGHTS).items():
+        scaled = _scale(metric_values(columns, name), METRICS[name][1])
+        if numpy is not None:
+            total = scaled * weight if total is None else total + scaled * weight
+        else:
+            weighted = [value * weight for value in scaled]
+            total = weighted if total is None else [a + b for a, b in zip(total, weighted)]
+    return total
+
+def _scale(values, higher_is_better):
+    """Min-max scale values to 0..1, treating NaN as the worst score"""
+    numpy = load_numpy()
+    if numpy is not None:
+        values = numpy.asarray(values, dtype=float)
+        finite = values[~numpy.isnan(values)]
+        if not finite.size:
+            return numpy.zeros_like(values)
+        low, high = finite.min(), finite.max()
+        span = (high - low) or 1.0
+        scaled = (values - low) / span if higher_is_better else (high - values) / span
+        return numpy.nan_to_num(scaled, nan=0.0)
+    
+    finite = [value for value in values if not math.isnan(value)]
+    if not finite:
+        return [0.0] * len(values)
+    low, high = min(finite), max(finite)
+    span = (high - low) or 1.0
+    return [0.0 if math.isnan(value) else ((value - low) if higher_is_better else (high - value)) / span
+            for value in values]
+
+def _best_position(values, higher_is_better):
+    """Position of the winning value, or None when all are NaN or tied"""
+    candidates = [(value, index) for index, value in enumerate(values) if not math.isnan(value)]
+    if not candidates:
+        return None
+    best = max(candidates)[0] if higher_is_better else min(candidates)[0]
+    positions = [index for value, index in candidates if value == best]
+    return positions[0] if len(positions) == 1 else None
+
+def compare(ids, metrics=DEFAULT_METRICS, weights=None):
+    """
+    Compare any number of cars across the given metrics.
+    
+    Returns:
+        dict: 'cars' (Car or None per requested ID), 'metrics' (metric ->
+        list of values aligned with ids, NaN where undefined or missing)
+        and 'winners' (metric -> winning car ID, or None for a tie)
+    """
+    ids = list(ids)
+    columns = load_columns(ids=ids)
+    position = {int(car_id): index for index, car_id in enumerate(columns['id'])}
+    
+    result = {'cars': Car.get_many(ids), 'metrics': {}, 'winners': {}}
+    for metric in metrics:
+        values = metric_values(columns, metric, weights)
+        aligned = [float(values[position[car_id]]) if car_id in position else math.nan for car_id in ids]
+        result['metrics'][metric] = aligned
+        winner = _best_position(aligned, METRICS[metric][1])
+        result['winners'][metric] = None if winner is None else ids[winner]
+    return result
+
+def rank(metric, k=10, where=None, weights=None):
+    """
+    Return the top k cars by a metric as (Car, value) pairs, best first.
+    
+    Args:
+        metric (str): One of METRICS
+        k (int): Number of cars to return
+        where (dict): Column filters, as accepted by Car.iter_all
+        weights (dict): Component weights for the 'score' metric
+    """
+    columns = load_columns(where=where)
+    values = metric_values(columns, metric, weights)
+    higher_is_better = METRICS[metric][1]
+    count = len(columns['id'])
+    k = min(k, count)
+    if k <= 0:
+        return []
+    
+    numpy = load_numpy()
+    if numpy is not None:
+        keys = numpy.asarray(values, dtype=float)
+        keys = numpy.where(numpy.isnan(keys), -numpy.inf, keys if higher_is_better else -keys)
+        # Take everything above the k-th best value, then fill ties in row order
+        kth = numpy.partition(keys, count - k)[count - k]
+        above = numpy.flatnonzero(keys > kth)
+        tied = numpy.flatnonzero(keys == kth)[:k - above.size]
+        top = numpy.concatenate([above, tied])
+        top = top[numpy.lexsort((top, -keys[top]))]
+        positions = [int(index) for index in top if keys[index] != -numpy.inf]
+    else:
+        sign = 1 if higher_is_better else -1
+        ranked = ((value * sign, -index) for index, value in enumerate(values) if not math.isnan(value))
+        positions = [-index for _, index in heapq.nlargest(k, ranked)]
+    
+    car_ids = [int(columns['id'][index]) for index in positions]
+    cars = Car.get_many(car_ids)
+    return [(car, float(values[index])) for car, index in zip(cars, positions) if car is not None]
@@ -0,0 +1,205 @@
+# lib/models/export.py
+
+"""
+Streaming export of cars to text, CSV, JSON Lines or a binary columnar format.
+
+Rows are read from a single open cursor with fetchmany, written out batch
+by batch and never held in memory all at once, so exporting the whole
+catalog costs the same memory as exporting ten cars. Any format can be
+gzip-compressed on the fly.
+"""
+
+from array import array
+from datetime import datetime
+import csv
+import gzip
+import json
+import struct
+import sys
+import time
+
+from . import get_cursor
+from .car import Car, CAR_FIELDS, CAR_COLUMNS
+from .car_frame import CarFrame, NUMERIC_COLUMNS, TEXT_COLUMNS
+
+FORMATS = {
+    'txt': '.txt',
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'columnar': '.carcol',
+}
+
+# Columnar layout: MAGIC, then blocks of <row count> + numeric columns as
+# little-endian arrays + text columns as UTF-8 lengths and bytes; a block
+# with a row count of 0 ends the file.
+COLUMNAR_MAGIC = b'CARCOL1\n'
+BLOCK_HEADER = struct.Struct('<I')
+
+def export_cars(path, fmt='csv', where=None, compress=False, batch_size=5000, title="MY VIRTUAL CAR COLLECTION",
+                collection=None):
+    """
+    Write cars matching the filters to path, streaming in batches.
+    
+    Args:
+        path (str): Output file; '.gz' is appended when compressing
+        fmt (str): One of FORMATS
+        where (dict): Column filters, as accepted by Car.iter_all (None for the whole catalog)
+        compress (bool): gzip the output
+        batch_size (int): Rows fetched and written at a time
+        title (str): Heading used by the text format
+        collection (Collection): Export this collection's cars instead of filtering the catalog
+    
+    Returns:
+        dict: path, rows, bytes written and throughput
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+    if compress and not path.endswith('.gz'):
+        path += '.gz'
+    
+    start = time.perf_counter()
+    binary = fmt == 'columnar'
+    opener = gzip.open if compress else open
+    mode = 'wb' if binary else 'wt'
+    options = {} if binary else {'encoding': 'utf-8', 'newline': ''}
+    
+    with opener(path, mode, **options) as f:
+        batches = collection.iter_batches(batch_size) if collection is not None else iter_batches(where, batch_size)
+        if fmt == 'txt':
+            rows = write_text(f, batches, where, title, collection)
+        elif fmt == 'csv':
+            rows = write_csv(f, batches)
+        elif fmt == 'jsonl':
+            rows = write_jsonl(f, batches)
+        else:
+            rows = write_columnar(f, batches)
+    
+    seconds = time.perf_counter() - start
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+    
+    return {
+        'path': path,
+        'rows': rows,
+        'bytes': size,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0,
+    }
+
+def iter_batches(where=None, batch_size=5000):
+    """Yield lists of CAR_COLUMNS rows in make/model order from one open cursor"""
+    clauses, params = Car._where_clause(where)
+    sql = f'SELECT {CAR_COLUMNS} FROM cars'
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY make, model, id'
+    
+    cursor = get_cursor()
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+def write_text(f, batches, where, title, collection=None):
+    """Write the human-readable report used by the collection export"""
+    if collection is not None:
+        stats = collection.stats()
+        total_cars, total_value = stats['total_cars'], stats['total_value']
+    else:
+        clauses, params = Car._where_clause(where)
+        cursor = get_cursor()
+        cursor.execute('SELECT COUNT(*), SUM(price) FROM cars' + (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params)
+        total_cars, total_value = cursor.fetchone()
+    
+    f.write(f"🚗 {title} 🚗\n")
+    f.write("=" * 50 + "\n")
+    f.write(f"Exported on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    f.write(f"Total Cars: {total_cars}\n")
+    f.write(f"Total Value: ${total_value or 0:,.2f}\n\n")
+    
+    rows = 0
+    for batch in batches:
+        for row in batch:
+            car = Car._from_row(row)
+            rows += 1
+            f.write(f"{rows}. {car.year} {car.make} {car.model}\n")
+            f.write(f"   Engine: {car.engine}\n")
+            f.write(f"   Power: {car.horsepower:,} HP\n")
+            f.write(f"   Price: ${car.price:,.2f}\n")
+            f.write(f"   Fuel Type: {car.fuel_type}\n")
+            f.write(f"   Date Added: {car.date_added}\n\n")
+    
+    f.write("-" * 50 + "\n")
+    f.write("Generated by Virtual Car Collection Manager\n")
+    return rows
+
+def write_csv(f, batches):
+    """Write a header row and one CSV row per car"""
+    writer = csv.writer(f)
+    writer.writerow(CAR_FIELDS)
+    rows = 0
+    for batch in batches:
+        writer.writerows((*row[:-1], bool(row[-1])) for row in batch)
+        rows += len(batch)
+    return rows
+
+def write_jsonl(f, batches):
+    """Write one Car.to_dict() JSON object per line"""
+    rows = 0
+    for batch in batches:
+        f.write(''.join(json.dumps(Car._from_row(row).to_dict(), ensure_ascii=False) + '\n' for row in batch))
+        rows += len(batch)
+    return rows
+
+def write_columnar(f, batches):
+    """Write each batch as a block of packed column arrays"""
+    f.write(COLUMNAR_MAGIC)
+    rows = 0
+    for batch in batches:
+        frame = CarFrame.from_rows(batch)
+        f.write(BLOCK_HEADER.pack(len(frame)))
+        for name in NUMERIC_COLUMNS:
+            column = frame.column(name)
+            f.write(_little_endian(column).tobytes())
+        for name in TEXT_COLUMNS:
+            encoded = [('' if value is None else str(value)).encode('utf-8') for value in frame.column(name)]
+            f.write(struct.pack(f'<{len(encoded)}I', *map(len, encoded)))
+            f.write(b''.join(encoded))
+        rows += len(frame)
+    f.write(BLOCK_HEADER.pack(0))
+    return rows
+
+def read_columnar(path):
+    """Yield a CarFrame per block of a (possibly gzipped) columnar export"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar car export")
+        while True:
+            (count,) = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+            if not count:
+                return
+            frame = CarFrame()
+            for name, typecode in NUMERIC_COLUMNS.items():
+                column = array(typecode)
+                column.frombytes(f.read(column.itemsize * count))
+                frame.columns[name] = _little_endian(column)
+            for name in TEXT_COLUMNS:
+                lengths = struct.unpack(f'<{count}I', f.read(4 * count))
+                data = f.read(sum(lengths))
+                values, offset = [], 0
+                for length in lengths:
+                    values.append(data[offset:offset + length].decode('utf-8'))
+                    offset += length
+                frame.columns[name] = values
+            yield frame
+
+def _little_endian(column):
+    """Return column in little-endian byte order (a copy on big-endian hosts)"""
+    if sys.byteorder == 'little':
+        return column
+    swapped = column[:]
+    swapped.byteswap()
+    return swapped
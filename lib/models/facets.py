@@ -0,0 +1,134 @@
+# lib/models/facets.py
+
+"""
+Faceted browsing of the catalog.
+
+Facet counts come from car_facets, a summary table that triggers keep in
+step with cars, holding one count per (collection, make, fuel type,
+decade, price bucket). Any drill-down over those dimensions is a GROUP BY
+over a few hundred rows, however large the catalog. Only the page of cars
+being shown is read from cars, in the usual make/model order.
+"""
+
+from itertools import islice
+
+from . import get_cursor
+from .car import Car
+from .migrations import PRICE_BUCKET_BOUNDS
+
+# Selection key -> car_facets column
+FACETS = {
+    'make': 'make',
+    'fuel_type': 'fuel_type',
+    'year': 'decade',
+    'price': 'price_bucket',
+}
+
+DEFAULT_PAGE_SIZE = 20
+
+# Facet value counting the cars with no fuel type (NULL in cars)
+UNKNOWN_FUEL_TYPE = 'Unknown'
+
+def price_bucket_label(bucket):
+    """Human-readable range for a price bucket number"""
+    if bucket == 0:
+        return f"Under ${PRICE_BUCKET_BOUNDS[0]:,}"
+    if bucket >= len(PRICE_BUCKET_BOUNDS):
+        return f"${PRICE_BUCKET_BOUNDS[-1]:,} and up"
+    return f"${PRICE_BUCKET_BOUNDS[bucket - 1]:,} - ${PRICE_BUCKET_BOUNDS[bucket]:,}"
+
+def facet_counts(selection=None):
+    """
+    Count cars per value of every facet, within the current selection.
+    
+    Args:
+        selection (dict): Chosen facet values: make, fuel_type, year (first
+            year of a decade), price (bucket number) and/or is_custom
+    
+    Returns:
+        dict: facet -> list of {'value', 'label', 'count'}; makes by count,
+        other facets in value order
+    """
+    clauses, params = _facet_clause(selection)
+    condition = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+    cursor = get_cursor()
+    
+    counts = {}
+    for facet, column in FACETS.items():
+        order = f'SUM(car_count) DESC, {column}' if facet == 'make' else column
+        cursor.execute(f'SELECT {column}, SUM(car_count) FROM car_facets{condition} '
+                       f'GROUP BY {column} ORDER BY {order}', params)
+        counts[facet] = [
+            {'value': value, 'label': _label(facet, value), 'count': count}
+            for value, count in cursor.fetchall()
+        ]
+    return counts
+
+def browse(selection=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Facet counts plus one page of matching cars in make/model order.
+    
+    Args:
+        selection (dict): Chosen facet values, as for facet_counts
+        after (tuple): (make, model, id) of the last car on the previous page
+        page_size (int): Cars per page
+    
+    Returns:
+        dict: 'facets', 'total' matching cars, 'cars' on this page and
+        'next_after' to pass back for the next page (None on the last page)
+    """
+    where = car_filters(selection)
+    facets = facet_counts(selection)
+    total = sum(entry['count'] for entry in facets['make'])
+    cars = list(islice(Car.iter_all(batch_size=page_size, where=where, after=after), page_size))
+    next_after = (cars[-1].make, cars[-1].model, cars[-1].id) if len(cars) == page_size else None
+    return {'facets': facets, 'total': total, 'cars': cars, 'next_after': next_after}
+
+def car_filters(selection):
+    """Translate a facet selection into Car.iter_all filters"""
+    where = {}
+    for key, value in (selection or {}).items():
+        if value is None:
+            continue
+        if key == 'fuel_type' and value == UNKNOWN_FUEL_TYPE:
+            where['fuel_type'] = None  # matched with IS NULL
+        elif key in ('make', 'fuel_type'):
+            where[key] = value
+        elif key == 'is_custom':
+            where['is_custom'] = int(bool(value))
+        elif key == 'year':
+            where['year >='] = int(value)
+            where['year <'] = int(value) + 10
+        elif key == 'price':
+            bucket = int(value)
+            if not 0 <= bucket <= len(PRICE_BUCKET_BOUNDS):
+                raise ValueError(f"Unknown price bucket: {value!r}")
+            if bucket > 0:
+                where['price >='] = PRICE_BUCKET_BOUNDS[bucket - 1]
+            if bucket < len(PRICE_BUCKET_BOUNDS):
+                where['price <'] = PRICE_BUCKET_BOUNDS[bucket]
+        else:
+            raise ValueError(f"Unsupported facet: {key!r}")
+    return where
+
+def _facet_clause(selection):
+    clauses, params = [], []
+    for key, value in (selection or {}).items():
+        if value is None:
+            continue
+        if key == 'is_custom':
+            clauses.append('is_custom = ?')
+            params.append(int(bool(value)))
+        elif key in FACETS:
+            clauses.append(f'{FACETS[key]} = ?')
+            params.append(int(value) if key in ('year', 'price') else value)
+        else:
+            raise ValueError(f"Unsupported facet: {key!r}")
+    return clauses, params
+
+def _label(facet, value):
+    if facet == 'year':
+        return f"{value}s"
+    if facet == 'price':
+        return price_bucket_label(value)
+    return value
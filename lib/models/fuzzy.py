@@ -0,0 +1,143 @@
+# lib/models/fuzzy.py
+
+"""
+Typo-tolerant matching of search words against the catalog vocabulary.
+
+cars_fuzzy indexes make, model and engine with accents folded, and
+search_terms holds every distinct word in it that starts with a letter,
+indexed by trigram. A misspelt query word ("lamborgini") is looked up in
+that small term index, scored against candidate terms by trigram
+similarity, and replaced by the terms that are close enough
+("lamborghini") before the cars themselves are matched.
+
+search_terms is kept in step with the catalog off the read path: bulk
+loads sync it when they finish, and a search that finds it behind starts
+a sync on a background thread and answers with the terms it has.
+"""
+
+import threading
+import unicodedata
+from functools import lru_cache
+
+from . import current_pool, get_connection, get_cursor, run_in_background
+
+DEFAULT_THRESHOLD = 0.3
+
+# Candidate terms fetched from the trigram index per query word, and how
+# many of the closest ones are kept
+CANDIDATE_TERMS = 200
+TERMS_PER_WORD = 8
+
+# Word pairs whose scores are remembered; the catalog's vocabulary repeats
+# heavily, so re-ranking mostly scores pairs it has seen before
+SCORE_CACHE_SIZE = 65536
+
+# Change version each database's term index was last synced at
+_synced_versions = {}
+_sync_lock = threading.Lock()
+
+def fold(text):
+    """Lower-case text with accents removed, so "Huracán" matches "huracan" """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def words(text):
+    """Folded words of text, split the way the unicode61 tokenizer splits them"""
+    folded = fold(text)
+    return ''.join(char if char.isalnum() else ' ' for char in folded).split()
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def trigrams(word):
+    """Trigrams of a word padded like pg_trgm, so short words still have some"""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def similarity(a, b):
+    """Jaccard similarity of the trigram sets of two words, from 0 to 1"""
+    first, second = trigrams(a), trigrams(b)
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def word_score(word, candidate):
+    """
+    How well a query word matches a catalog word: 1 for the same word, at
+    least 0.5 for a prefix (more the more of it is covered), otherwise
+    their trigram similarity
+    """
+    if candidate == word:
+        return 1.0
+    if candidate.startswith(word):
+        return 0.5 + 0.5 * len(word) / len(candidate)
+    return similarity(word, candidate)
+
+def similar_terms(word, threshold=DEFAULT_THRESHOLD):
+    """
+    Catalog terms within threshold of word, closest first, as (term, score).
+    
+    Words shorter than three characters or starting with a digit have no
+    fuzzy matches; they only match as prefixes, so 911 and GT stay exact.
+    """
+    if len(word) < 3 or not word[0].isalpha():
+        return []
+    query = ' OR '.join(f'"{gram}"' for gram in sorted({word[i:i + 3] for i in range(len(word) - 2)}))
+    cursor = get_cursor()
+    cursor.execute('''
+        SELECT term FROM search_term_trigrams
+        WHERE search_term_trigrams MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (query, CANDIDATE_TERMS))
+    scored = [(term, similarity(word, term)) for (term,) in cursor.fetchall()]
+    scored = [(term, score) for term, score in scored if score >= threshold]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:TERMS_PER_WORD]
+
+def sync_terms_later(version):
+    """
+    Start sync_terms(version) on a background thread if the term index
+    may be behind the catalog.
+    
+    Searches call this instead of sync_terms so they never take the write
+    lock; until the sync finishes, words added since the last one still
+    match by prefix but aren't offered as spelling corrections.
+    """
+    pool = current_pool()
+    if pool.read_only or _synced_versions.get(pool.database) == version:
+        return
+    run_in_background(pool, 'search-terms-sync', sync_terms, version)
+
+def sync_terms(version):
+    """
+    Bring search_terms up to date with the cars_fuzzy vocabulary.
+    
+    Runs at most once per change version, and only walks words starting
+    with a letter, so it is cheap even on very large catalogs.
+    """
+    pool = current_pool()
+    if pool.read_only:
+        return  # snapshots are built with their terms in sync
+    database = pool.database
+    with _sync_lock:
+        if _synced_versions.get(database) == version:
+            return
+        connection = get_connection()
+        if connection.in_transaction:
+            return  # don't commit someone else's transaction; sync next time
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('''
+                INSERT INTO search_terms (term)
+                SELECT term FROM cars_fuzzy_vocab
+                WHERE term >= 'a' AND term NOT IN (SELECT term FROM search_terms)
+            ''')
+            connection.execute('''
+                DELETE FROM search_terms
+                WHERE term NOT IN (SELECT term FROM cars_fuzzy_vocab WHERE term >= 'a')
+            ''')
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+        _synced_versions[database] = version
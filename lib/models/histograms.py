@@ -0,0 +1,315 @@
+# lib/models/histograms.py
+
+"""
+Equi-depth histograms over the numeric car columns.
+
+Each histogram splits a column's values, read in order from its range
+index, into HISTOGRAM_BUCKETS buckets holding the same number of cars, and
+is stored in car_histograms with the change counter version it was built
+at. Range filters can then be costed, and percentiles approximated, from
+a few dozen rows instead of the whole table.
+
+Reads never wait for a full rebuild once a histogram exists: when enough
+cars have changed since it was built, the read uses it as it is and a
+background thread rebuilds it. Only a missing histogram (a new or freshly
+bulk-loaded catalog) is built on the spot. refresh() brings every
+histogram up to date, and bulk loads call it when they finish.
+"""
+
+import threading
+
+from . import current_pool, get_connection, get_cursor, run_in_background
+from .car import Car
+
+HISTOGRAM_COLUMNS = ('price', 'horsepower', 'year')
+HISTOGRAM_BUCKETS = 64
+
+# A histogram is rebuilt once the changes since it was built exceed this
+# many cars or this fraction of the catalog, whichever is larger
+STALE_MIN_CHANGES = 1000
+STALE_FRACTION = 0.1
+
+DEFAULT_PERCENTILES = (0.5, 0.9)
+DISTRIBUTION_PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+# Sorted values are streamed from the index this many rows at a time
+FETCH_SIZE = 10000
+
+_build_lock = threading.Lock()
+
+class Histogram:
+    """Equi-depth buckets of one column: (lower, upper, row_count, distinct_count) each"""
+    
+    def __init__(self, column, buckets, built_version):
+        self.column = column
+        self.buckets = buckets
+        self.built_version = built_version
+        self.total = sum(bucket[2] for bucket in buckets)
+    
+    def estimate(self, low=None, high=None):
+        """
+        Estimated number of cars with low <= value <= high.
+        
+        Buckets wholly inside the range count in full; a bucket the range
+        cuts through counts in proportion to the part of its span covered.
+        """
+        count = 0.0
+        for lower, upper, row_count, distinct_count in self.buckets:
+            start = lower if low is None else max(low, lower)
+            end = upper if high is None else min(high, upper)
+            if start > end:
+                continue
+            if upper == lower or (start == lower and end == upper):
+                count += row_count
+            else:
+                # Assume values are spread evenly over the span, and that
+                # even a single value holds one distinct value's share
+                covered = (end - start) / (upper - lower)
+                count += row_count * max(covered, 1 / distinct_count)
+        return count
+    
+    def percentile(self, fraction):
+        """Approximate value below which fraction of the cars fall"""
+        if not self.buckets:
+            return None
+        target = min(max(fraction, 0.0), 1.0) * self.total
+        seen = 0
+        for lower, upper, row_count, _ in self.buckets:
+            if seen + row_count >= target:
+                return lower + (upper - lower) * (target - seen) / row_count
+            seen += row_count
+        return self.buckets[-1][1]
+    
+    def bins(self, count=10):
+        """Estimated cars per equal-width bin between the smallest and largest value"""
+        if not self.buckets:
+            return []
+        low, high = self.buckets[0][0], self.buckets[-1][1]
+        if high == low:
+            return [{'lower': low, 'upper': high, 'count': self.total}]
+        width = (high - low) / count
+        edges = [low + width * index for index in range(count)] + [high]
+        result = []
+        for index in range(count):
+            lower, upper = edges[index], edges[index + 1]
+            # Cars up to each bin's upper edge, differenced below
+            below = self.estimate(None, upper) if index < count - 1 else self.total
+            result.append({'lower': lower, 'upper': upper, 'count': below})
+        for index in range(count - 1, 0, -1):
+            result[index]['count'] -= result[index - 1]['count']
+        for entry in result:
+            entry['count'] = round(max(entry['count'], 0))
+        return result
+
+def _check_column(column):
+    if column not in HISTOGRAM_COLUMNS:
+        raise ValueError(f"No histogram for {column!r} (use {', '.join(HISTOGRAM_COLUMNS)})")
+
+def _change_version(cursor):
+    cursor.execute("SELECT version FROM change_counter WHERE name = 'cars'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def rebuild(column, buckets=HISTOGRAM_BUCKETS):
+    """
+    Rebuild the histogram for column from a scan of its range index.
+    
+    Values are streamed in order and folded into buckets as they arrive,
+    so memory use doesn't grow with the catalog.
+    
+    Returns:
+        Histogram: The new histogram
+    """
+    _check_column(column)
+    connection = get_connection()
+    cursor = get_cursor()
+    version = _change_version(cursor)
+    cursor.execute(f'SELECT COUNT({column}) FROM cars')
+    count = cursor.fetchone()[0]
+    buckets = min(buckets, count)
+    # Position in the sorted values at which each bucket ends; any cars
+    # added since the count was taken go into the last bucket
+    ends = iter([count * (bucket + 1) // buckets for bucket in range(buckets)])
+    end = next(ends, None)
+    
+    rows = []
+    bucket = None  # [lower, upper, row_count, distinct_count] being filled
+    seen = 0
+    cursor.execute(f'SELECT {column} FROM cars WHERE {column} IS NOT NULL ORDER BY {column}')
+    while True:
+        values = [value for (value,) in cursor.fetchmany(FETCH_SIZE)]
+        start = 0
+        while start < len(values):
+            part = values[start:start + (len(values) if end is None else end - seen)]
+            if bucket is None:
+                bucket = [part[0], part[0], 0, 0]
+                rows.append(bucket)
+            # Values arrive sorted, so only the first can repeat the bucket's last one
+            bucket[3] += len(set(part)) - (1 if bucket[2] and part[0] == bucket[1] else 0)
+            bucket[1] = part[-1]
+            bucket[2] += len(part)
+            seen += len(part)
+            start += len(part)
+            if seen == end:
+                end = next(ends, None)
+                if end is not None:
+                    bucket = None
+        if not values:
+            break
+    rows = [tuple(row) for row in rows]
+    
+    owns_transaction = not connection.in_transaction
+    if owns_transaction:
+        connection.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('DELETE FROM car_histograms WHERE column_name = ?', (column,))
+        cursor.executemany('''
+            INSERT INTO car_histograms
+                (column_name, bucket, lower, upper, row_count, distinct_count, built_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(column, number, *row, version) for number, row in enumerate(rows, 1)])
+    except BaseException:
+        if owns_transaction:
+            connection.rollback()
+        raise
+    if owns_transaction:
+        connection.commit()
+    return Histogram(column, rows, version)
+
+def _stored(column):
+    """The histogram for column as last built, or None if it has never been"""
+    cursor = get_cursor()
+    cursor.execute('''
+        SELECT lower, upper, row_count, distinct_count, built_version
+        FROM car_histograms WHERE column_name = ? ORDER BY bucket
+    ''', (column,))
+    rows = cursor.fetchall()
+    return Histogram(column, [row[:4] for row in rows], rows[0][4]) if rows else None
+
+def _is_stale(stored):
+    changes = _change_version(get_cursor()) - stored.built_version
+    return changes > max(STALE_MIN_CHANGES, STALE_FRACTION * stored.total)
+
+def histogram(column):
+    """
+    The histogram for column, built first only if it is missing.
+    
+    A stale histogram is returned as is and rebuilt in the background, so
+    the read isn't held up by a scan of the whole column. A read-only
+    snapshot is built with its histograms current and never rebuilds them.
+    """
+    _check_column(column)
+    current = _stored(column)
+    pool = current_pool()
+    if pool.read_only:
+        return current or Histogram(column, [], 0)
+    if current is None:
+        with _build_lock:
+            return rebuild(column)
+    if _is_stale(current):
+        run_in_background(pool, 'histogram-refresh', refresh)
+    return current
+
+def refresh(columns=HISTOGRAM_COLUMNS):
+    """
+    Rebuild every histogram that is missing or stale.
+    
+    Returns:
+        list: The columns rebuilt
+    """
+    rebuilt = []
+    for column in columns:
+        _check_column(column)
+        stored = _stored(column)
+        if stored is None or _is_stale(stored):
+            with _build_lock:
+                rebuild(column)
+            rebuilt.append(column)
+    return rebuilt
+
+def estimate_count(ranges=None, where=None):
+    """
+    Estimated number of cars matching range and equality filters.
+    
+    Range selectivities come from the histograms and equality filters on
+    is_custom, make and fuel_type from the car_stats summary, and are
+    combined as if the columns were independent.
+    
+    Args:
+        ranges (dict): column -> (low, high), inclusive, None for an open end
+        where (dict): is_custom, make and/or fuel_type values
+    
+    Returns:
+        int: Estimated matching cars
+    """
+    clauses, params = [], []
+    for key, value in (where or {}).items():
+        if key not in ('is_custom', 'make', 'fuel_type'):
+            raise ValueError(f"Unsupported filter: {key!r}")
+        if value is not None:
+            clauses.append(f'{key} = ?')
+            params.append(int(bool(value)) if key == 'is_custom' else value)
+    cursor = get_cursor()
+    condition = (' WHERE ' + ' AND '.join(clauses)) if clauses else ''
+    cursor.execute(f'SELECT IFNULL(SUM(car_count), 0) FROM car_stats{condition}', params)
+    estimate = cursor.fetchone()[0]
+    
+    for column, (low, high) in (ranges or {}).items():
+        if low is None and high is None:
+            continue
+        column_histogram = histogram(column)
+        if not column_histogram.total:
+            return 0
+        estimate *= column_histogram.estimate(low, high) / column_histogram.total
+    return round(estimate)
+
+def percentiles(column, fractions=DEFAULT_PERCENTILES, where=None, exact=False):
+    """
+    Percentiles of a column, e.g. the median and p90 price.
+    
+    Without filters the values are interpolated from the histogram. With
+    filters, or exact=True, each one is read at its rank from the column's
+    range index, which skips rows without fetching them.
+    
+    Args:
+        column (str): price, horsepower or year
+        fractions (tuple): Percentiles wanted, between 0 and 1
+        where (dict): Optional Car filters, e.g. {'fuel_type': 'Electric'}
+        exact (bool): Read exact values even without filters
+    
+    Returns:
+        dict: fraction -> value (None when no cars match)
+    """
+    _check_column(column)
+    if not where and not exact:
+        column_histogram = histogram(column)
+        return {fraction: column_histogram.percentile(fraction) for fraction in fractions}
+    
+    clauses, params = Car._where_clause(where)
+    clauses.append(f'{column} IS NOT NULL')
+    condition = ' WHERE ' + ' AND '.join(clauses)
+    cursor = get_cursor()
+    cursor.execute(f'SELECT COUNT(*) FROM cars{condition}', params)
+    count = cursor.fetchone()[0]
+    result = {}
+    for fraction in fractions:
+        if not count:
+            result[fraction] = None
+            continue
+        rank = min(count - 1, max(0, int(fraction * count + 0.5) - 1))
+        cursor.execute(f'SELECT {column} FROM cars{condition} ORDER BY {column} LIMIT 1 OFFSET ?', params + [rank])
+        result[fraction] = cursor.fetchone()[0]
+    return result
+
+def distribution(column, bins=10, fractions=DISTRIBUTION_PERCENTILES):
+    """
+    Summary of a column for display: total cars, percentiles and estimated
+    counts per equal-width bin.
+    """
+    column_histogram = histogram(column)
+    return {
+        'column': column,
+        'total': column_histogram.total,
+        'percentiles': {fraction: column_histogram.percentile(fraction) for fraction in fractions},
+        'bins': column_histogram.bins(bins),
+    }
@@ -0,0 +1,566 @@
+# lib/models/migrations.py
+
+"""
+Versioned schema migrations for the car collection database.
+
+The applied version lives in PRAGMA user_version. Each migration is a list
+of steps; every step runs and commits in its own transaction, so a large
+upgrade builds one index at a time and, with WAL journaling, readers keep
+using the database throughout. Steps are idempotent, so an interrupted
+upgrade simply resumes from the last recorded version.
+
+Run `python lib/migrate.py --dry-run` to see pending migrations and an
+estimated duration without changing anything.
+"""
+
+import time
+
+# Rough throughput used for dry-run estimates, in rows per second
+INDEX_ROWS_PER_SECOND = 500000
+FTS_ROWS_PER_SECOND = 150000
+SCAN_ROWS_PER_SECOND = 2000000
+
+class Step:
+    """One or more SQL statements applied in a single transaction"""
+    
+    rows_per_second = None
+    
+    def __init__(self, description, *statements):
+        self.description = description
+        self.statements = statements
+    
+    def apply(self, connection):
+        """Run the statements and commit"""
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for statement in self.statements:
+                connection.execute(statement)
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+    
+    def estimate(self, row_count):
+        """Estimated seconds to apply this step to a table of row_count cars"""
+        if self.rows_per_second is None:
+            return 0.0
+        return row_count / self.rows_per_second
+
+class Index(Step):
+    """Build one index in its own transaction"""
+    
+    rows_per_second = INDEX_ROWS_PER_SECOND
+    
+    def __init__(self, name, table, columns):
+        super().__init__(f"Build index {name}",
+                         f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+class Backfill(Step):
+    """Populate a derived structure from a full scan of the cars table"""
+    
+    def __init__(self, description, *statements, rows_per_second=SCAN_ROWS_PER_SECOND):
+        super().__init__(description, *statements)
+        self.rows_per_second = rows_per_second
+
+class Migration:
+    """A numbered schema change made of ordered steps"""
+    
+    def __init__(self, version, description, steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+    
+    def estimate(self, row_count):
+        """Estimated seconds to apply every step"""
+        return sum(step.estimate(row_count) for step in self.steps)
+
+# Upper bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKET_BOUNDS = (50000, 100000, 250000, 500000, 1000000)
+
+def price_bucket_sql(column):
+    """SQL expression mapping a price to its bucket number"""
+    cases = ' '.join(f"WHEN {column} < {bound} THEN {index}" for index, bound in enumerate(PRICE_BUCKET_BOUNDS))
+    return f"CASE {cases} ELSE {len(PRICE_BUCKET_BOUNDS)} END"
+
+def decade_sql(column):
+    """SQL expression mapping a year to the first year of its decade"""
+    return f"CAST({column} / 10 AS INTEGER) * 10"
+
+FACET_KEY_NEW = (f"IFNULL(new.is_custom, 0), new.make, IFNULL(new.fuel_type, 'Unknown'), "
+                 f"{decade_sql('new.year')}, {price_bucket_sql('new.price')}")
+FACET_MATCH_OLD = (f"is_custom = IFNULL(old.is_custom, 0) AND make = old.make "
+                   f"AND fuel_type = IFNULL(old.fuel_type, 'Unknown') AND decade = {decade_sql('old.year')} "
+                   f"AND price_bucket = {price_bucket_sql('old.price')}")
+
+# Owner and name of the collection that pre-v10 collection cars move into
+DEFAULT_USER = 'default'
+DEFAULT_COLLECTION = 'My Collection'
+
+STATS_KEY_NEW = "IFNULL(new.is_custom, 0), new.make, IFNULL(new.fuel_type, 'Unknown')"
+STATS_MATCH_OLD = "is_custom = IFNULL(old.is_custom, 0) AND make = old.make AND fuel_type = IFNULL(old.fuel_type, 'Unknown')"
+
+# Trigger conditions: an update moves a car to another summary row
+STATS_KEY_CHANGED = ("old.is_custom IS NOT new.is_custom OR old.make IS NOT new.make "
+                     "OR old.fuel_type IS NOT new.fuel_type")
+FACET_KEY_CHANGED = (f"{STATS_KEY_CHANGED} OR {decade_sql('old.year')} IS NOT {decade_sql('new.year')} "
+                     f"OR {price_bucket_sql('old.price')} IS NOT {price_bucket_sql('new.price')}")
+
+# Car columns copied into the change log
+CHANGE_COLUMNS = ('id', 'make', 'model', 'year', 'engine', 'horsepower', 'price', 'fuel_type', 'date_added', 'is_custom')
+
+def change_row_sql(alias):
+    """SQL expression building the change log's JSON copy of a car row"""
+    return 'json_object(' + ', '.join(f"'{column}', {alias}.{column}" for column in CHANGE_COLUMNS) + ')'
+
+# Logs every car with an ID above the parameter, for loads made with the
+# change log's triggers dropped (bulk inserts, shard splits, snapshots)
+LOG_LOADED_CARS_SQL = f'''
+    INSERT INTO car_changes (car_id, op, row)
+    SELECT id, 'upsert', {change_row_sql('cars')} FROM cars WHERE id > ? ORDER BY id
+'''
+
+MIGRATIONS = [
+    Migration(1, "Create cars table", [
+        Step("Create cars table", '''
+            CREATE TABLE IF NOT EXISTS cars (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                make TEXT NOT NULL,
+                model TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                engine TEXT NOT NULL,
+                horsepower INTEGER NOT NULL,
+                price REAL NOT NULL,
+                fuel_type TEXT DEFAULT 'Gasoline',
+                date_added TEXT DEFAULT CURRENT_TIMESTAMP,
+                is_custom BOOLEAN DEFAULT 0
+            )
+        '''),
+    ]),
+    
+    Migration(2, "Add browse and collection indexes", [
+        # Supports the (make, model, id) ordering used for browsing and paging
+        Index('idx_cars_make_model', 'cars', 'make, model, id'),
+        # Composite indexes so collection queries only touch the matching rows
+        Index('idx_cars_custom_make_model', 'cars', 'is_custom, make, model, id'),
+        Index('idx_cars_custom_fuel', 'cars', 'is_custom, fuel_type, make, model, id'),
+        Index('idx_cars_custom_year', 'cars', 'is_custom, year'),
+        Index('idx_cars_custom_price', 'cars', 'is_custom, price'),
+    ]),
+    
+    Migration(3, "Add full-text search index", [
+        Step("Create cars_fts table and triggers", '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS cars_fts USING fts5(
+                make, model, fuel_type,
+                content='cars', content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2"
+            )
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS cars_fts_insert AFTER INSERT ON cars BEGIN
+                INSERT INTO cars_fts (rowid, make, model, fuel_type)
+                VALUES (new.id, new.make, new.model, new.fuel_type);
+            END
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS cars_fts_delete AFTER DELETE ON cars BEGIN
+                INSERT INTO cars_fts (cars_fts, rowid, make, model, fuel_type)
+                VALUES ('delete', old.id, old.make, old.model, old.fuel_type);
+            END
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS cars_fts_update AFTER UPDATE OF make, model, fuel_type ON cars BEGIN
+                INSERT INTO cars_fts (cars_fts, rowid, make, model, fuel_type)
+                VALUES ('delete', old.id, old.make, old.model, old.fuel_type);
+                INSERT INTO cars_fts (rowid, make, model, fuel_type)
+                VALUES (new.id, new.make, new.model, new.fuel_type);
+            END
+        '''),
+        Backfill("Index existing cars for search",
+                 "INSERT INTO cars_fts (cars_fts) VALUES ('rebuild')",
+                 rows_per_second=FTS_ROWS_PER_SECOND),
+    ]),
+    
+    Migration(4, "Add stats summary table", [
+        Step("Create car_stats table and triggers", '''
+            CREATE TABLE IF NOT EXISTS car_stats (
+                is_custom BOOLEAN NOT NULL,
+                make TEXT NOT NULL,
+                fuel_type TEXT NOT NULL,
+                car_count INTEGER NOT NULL,
+                total_price REAL NOT NULL,
+                PRIMARY KEY (is_custom, make, fuel_type)
+            ) WITHOUT ROWID
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_stats_insert AFTER INSERT ON cars BEGIN
+                INSERT INTO car_stats (is_custom, make, fuel_type, car_count, total_price)
+                VALUES ({STATS_KEY_NEW}, 1, new.price)
+                ON CONFLICT (is_custom, make, fuel_type) DO UPDATE
+                SET car_count = car_count + 1, total_price = total_price + excluded.total_price;
+            END
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_stats_delete AFTER DELETE ON cars BEGIN
+                UPDATE car_stats SET car_count = car_count - 1, total_price = total_price - old.price
+                WHERE {STATS_MATCH_OLD};
+                DELETE FROM car_stats WHERE {STATS_MATCH_OLD} AND car_count <= 0;
+            END
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_stats_update AFTER UPDATE OF is_custom, make, fuel_type, price ON cars BEGIN
+                UPDATE car_stats SET car_count = car_count - 1, total_price = total_price - old.price
+                WHERE {STATS_MATCH_OLD};
+                DELETE FROM car_stats WHERE {STATS_MATCH_OLD} AND car_count <= 0;
+                INSERT INTO car_stats (is_custom, make, fuel_type, car_count, total_price)
+                VALUES ({STATS_KEY_NEW}, 1, new.price)
+                ON CONFLICT (is_custom, make, fuel_type) DO UPDATE
+                SET car_count = car_count + 1, total_price = total_price + excluded.total_price;
+            END
+        '''),
+        Backfill("Summarise existing cars", "DELETE FROM car_stats", '''
+            INSERT INTO car_stats (is_custom, make, fuel_type, car_count, total_price)
+            SELECT IFNULL(is_custom, 0), make, IFNULL(fuel_type, 'Unknown'), COUNT(*), SUM(price)
+            FROM cars GROUP BY 1, 2, 3
+        '''),
+        # Let the most expensive car be found without sorting the table
+        Index('idx_cars_price', 'cars', 'price'),
+        Index('idx_cars_make_price', 'cars', 'make, price'),
+    ]),
+    
+    Migration(5, "Skip search reindexing for unchanged text", [
+        # Batched updates rewrite every column, so only touch the search
+        # index when a searchable value actually changed
+        Step("Recreate cars_fts_update trigger", '''
+            DROP TRIGGER IF EXISTS cars_fts_update
+        ''', '''
+            CREATE TRIGGER cars_fts_update AFTER UPDATE OF make, model, fuel_type ON cars
+            WHEN old.make IS NOT new.make OR old.model IS NOT new.model OR old.fuel_type IS NOT new.fuel_type
+            BEGIN
+                INSERT INTO cars_fts (cars_fts, rowid, make, model, fuel_type)
+                VALUES ('delete', old.id, old.make, old.model, old.fuel_type);
+                INSERT INTO cars_fts (rowid, make, model, fuel_type)
+                VALUES (new.id, new.make, new.model, new.fuel_type);
+            END
+        '''),
+    ]),
+    
+    Migration(6, "Add change counter", [
+        # A version number bumped by every write to cars, used for ETags and
+        # response cache invalidation; the bump at the end also covers bulk
+        # loads, which drop and recreate these triggers
+        Step("Create change_counter table and triggers", '''
+            CREATE TABLE IF NOT EXISTS change_counter (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        ''', "INSERT OR IGNORE INTO change_counter (name, version) VALUES ('cars', 0)", *[f'''
+            CREATE TRIGGER IF NOT EXISTS change_counter_{event.lower()} AFTER {event} ON cars BEGIN
+                UPDATE change_counter SET version = version + 1 WHERE name = 'cars';
+            END
+        ''' for event in ('INSERT', 'UPDATE', 'DELETE')],
+            "UPDATE change_counter SET version = version + 1 WHERE name = 'cars'"),
+    ]),
+    
+    Migration(7, "Add browse facet counts", [
+        Step("Create car_facets table and triggers", '''
+            CREATE TABLE IF NOT EXISTS car_facets (
+                is_custom BOOLEAN NOT NULL,
+                make TEXT NOT NULL,
+                fuel_type TEXT NOT NULL,
+                decade INTEGER NOT NULL,
+                price_bucket INTEGER NOT NULL,
+                car_count INTEGER NOT NULL,
+                PRIMARY KEY (is_custom, make, fuel_type, decade, price_bucket)
+            ) WITHOUT ROWID
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_facets_insert AFTER INSERT ON cars BEGIN
+                INSERT INTO car_facets (is_custom, make, fuel_type, decade, price_bucket, car_count)
+                VALUES ({FACET_KEY_NEW}, 1)
+                ON CONFLICT (is_custom, make, fuel_type, decade, price_bucket) DO UPDATE
+                SET car_count = car_count + 1;
+            END
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_facets_delete AFTER DELETE ON cars BEGIN
+                UPDATE car_facets SET car_count = car_count - 1 WHERE {FACET_MATCH_OLD};
+                DELETE FROM car_facets WHERE {FACET_MATCH_OLD} AND car_count <= 0;
+            END
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_facets_update AFTER UPDATE OF is_custom, make, fuel_type, year, price ON cars BEGIN
+                UPDATE car_facets SET car_count = car_count - 1 WHERE {FACET_MATCH_OLD};
+                DELETE FROM car_facets WHERE {FACET_MATCH_OLD} AND car_count <= 0;
+                INSERT INTO car_facets (is_custom, make, fuel_type, decade, price_bucket, car_count)
+                VALUES ({FACET_KEY_NEW}, 1)
+                ON CONFLICT (is_custom, make, fuel_type, decade, price_bucket) DO UPDATE
+                SET car_count = car_count + 1;
+            END
+        '''),
+        Backfill("Count existing cars per facet", "DELETE FROM car_facets", f'''
+            INSERT INTO car_facets (is_custom, make, fuel_type, decade, price_bucket, car_count)
+            SELECT IFNULL(is_custom, 0), make, IFNULL(fuel_type, 'Unknown'), {decade_sql('year')},
+                   {price_bucket_sql('price')}, COUNT(*)
+            FROM cars GROUP BY 1, 2, 3, 4, 5
+        '''),
+    ]),
+    
+    Migration(8, "Add fuzzy search indexes", [
+        Step("Create cars_fuzzy table, term index and triggers", '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS cars_fuzzy USING fts5(
+                make, model, engine,
+                content='cars', content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2"
+            )
+        ''', '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS cars_fuzzy_vocab USING fts5vocab(cars_fuzzy, 'row')
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS cars_fuzzy_insert AFTER INSERT ON cars BEGIN
+                INSERT INTO cars_fuzzy (rowid, make, model, engine)
+                VALUES (new.id, new.make, new.model, new.engine);
+            END
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS cars_fuzzy_delete AFTER DELETE ON cars BEGIN
+                INSERT INTO cars_fuzzy (cars_fuzzy, rowid, make, model, engine)
+                VALUES ('delete', old.id, old.make, old.model, old.engine);
+            END
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS cars_fuzzy_update AFTER UPDATE OF make, model, engine ON cars
+            WHEN old.make IS NOT new.make OR old.model IS NOT new.model OR old.engine IS NOT new.engine
+            BEGIN
+                INSERT INTO cars_fuzzy (cars_fuzzy, rowid, make, model, engine)
+                VALUES ('delete', old.id, old.make, old.model, old.engine);
+                INSERT INTO cars_fuzzy (rowid, make, model, engine)
+                VALUES (new.id, new.make, new.model, new.engine);
+            END
+        ''', '''
+            CREATE TABLE IF NOT EXISTS search_terms (
+                id INTEGER PRIMARY KEY,
+                term TEXT NOT NULL UNIQUE
+            )
+        ''', '''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_term_trigrams USING fts5(
+                term, content='search_terms', content_rowid='id', tokenize='trigram'
+            )
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS search_terms_insert AFTER INSERT ON search_terms BEGIN
+                INSERT INTO search_term_trigrams (rowid, term) VALUES (new.id, new.term);
+            END
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS search_terms_delete AFTER DELETE ON search_terms BEGIN
+                INSERT INTO search_term_trigrams (search_term_trigrams, rowid, term) VALUES ('delete', old.id, old.term);
+            END
+        '''),
+        Backfill("Index existing cars for fuzzy search",
+                 "INSERT INTO cars_fuzzy (cars_fuzzy) VALUES ('rebuild')",
+                 rows_per_second=FTS_ROWS_PER_SECOND),
+        # Only words starting with a letter are matched fuzzily, which keeps
+        # the term index small however many model numbers the catalog holds
+        Step("Collect fuzzy search terms", "DELETE FROM search_terms",
+             "INSERT INTO search_terms (term) SELECT term FROM cars_fuzzy_vocab WHERE term >= 'a'"),
+    ]),
+    
+    Migration(9, "Add range query indexes and histograms", [
+        # Each range column leads one index and carries the other filter
+        # columns, so range filters are checked in the index and only
+        # matching cars are read from the table
+        Index('idx_cars_price_range', 'cars', 'price, horsepower, year, is_custom'),
+        Index('idx_cars_horsepower_range', 'cars', 'horsepower, price, year, is_custom'),
+        Index('idx_cars_year_range', 'cars', 'year, price, horsepower, is_custom'),
+        Index('idx_cars_fuel_price', 'cars', 'fuel_type, price, horsepower, year, is_custom'),
+        Step("Drop idx_cars_price, now a prefix of idx_cars_price_range", "DROP INDEX IF EXISTS idx_cars_price"),
+        # Filled and refreshed on demand by models/histograms.py
+        Step("Create car_histograms table", '''
+            CREATE TABLE IF NOT EXISTS car_histograms (
+                column_name TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                lower REAL NOT NULL,
+                upper REAL NOT NULL,
+                row_count INTEGER NOT NULL,
+                distinct_count INTEGER NOT NULL,
+                built_version INTEGER NOT NULL,
+                PRIMARY KEY (column_name, bucket)
+            ) WITHOUT ROWID
+        '''),
+    ]),
+    
+    Migration(10, "Add per-user collections", [
+        # Items are clustered by collection, so a user's collection is one
+        # contiguous range of this table however many users there are
+        Step("Create collections and collection_items tables", '''
+            CREATE TABLE IF NOT EXISTS collections (
+                id INTEGER PRIMARY KEY,
+                user TEXT NOT NULL,
+                name TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user, name)
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS collection_items (
+                collection_id INTEGER NOT NULL REFERENCES collections (id),
+                car_id INTEGER NOT NULL REFERENCES cars (id),
+                added_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (collection_id, car_id)
+            ) WITHOUT ROWID
+        ''', "CREATE INDEX IF NOT EXISTS idx_collection_items_car ON collection_items (car_id)"),
+        # Collection cars used to be is_custom copies of catalog cars. Point
+        # each copy's item at the catalog car it was copied from and delete
+        # the copy; cars designed by the user stay, as custom cars. Bulk
+        # loads rerun this migration, so it only acts while there are no
+        # collections yet and the first one created gets id 1.
+        Backfill("Move collection cars into the default user's collection", '''
+            INSERT OR IGNORE INTO collection_items (collection_id, car_id, added_at)
+            SELECT 1,
+                   IFNULL((SELECT stock.id FROM cars stock
+                           WHERE stock.is_custom = 0 AND stock.make = copy.make AND stock.model = copy.model
+                             AND stock.year = copy.year AND stock.engine = copy.engine
+                             AND stock.horsepower = copy.horsepower AND stock.price = copy.price
+                             AND stock.fuel_type IS copy.fuel_type
+                           ORDER BY stock.id LIMIT 1), copy.id),
+                   IFNULL(copy.date_added, CURRENT_TIMESTAMP)
+            FROM cars copy
+            WHERE copy.is_custom = 1 AND NOT EXISTS (SELECT 1 FROM collections)
+        ''', '''
+            DELETE FROM cars
+            WHERE is_custom = 1 AND id NOT IN (SELECT car_id FROM collection_items)
+              AND NOT EXISTS (SELECT 1 FROM collections)
+        ''', f'''
+            INSERT INTO collections (id, user, name)
+            SELECT 1, '{DEFAULT_USER}', '{DEFAULT_COLLECTION}'
+            WHERE NOT EXISTS (SELECT 1 FROM collections)
+        '''),
+        Step("Remove deleted cars from collections", '''
+            CREATE TRIGGER IF NOT EXISTS collection_items_car_delete AFTER DELETE ON cars BEGIN
+                DELETE FROM collection_items WHERE car_id = old.id;
+            END
+        '''),
+    ]),
+    
+    Migration(11, "Add the change log", [
+        # AUTOINCREMENT so sequence numbers only ever grow, even once the
+        # log has been pruned empty
+        Step("Create car_changes and sync_checkpoints tables", '''
+            CREATE TABLE IF NOT EXISTS car_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                car_id INTEGER NOT NULL,
+                op TEXT NOT NULL CHECK (op IN ('upsert', 'delete')),
+                row TEXT,
+                changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                source TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                synced_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        '''),
+        Step("Log car changes", f'''
+            CREATE TRIGGER IF NOT EXISTS car_changes_insert AFTER INSERT ON cars BEGIN
+                INSERT INTO car_changes (car_id, op, row) VALUES (new.id, 'upsert', {change_row_sql('new')});
+            END
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_changes_update AFTER UPDATE ON cars
+            WHEN {' OR '.join(f"old.{column} IS NOT new.{column}" for column in CHANGE_COLUMNS)}
+            BEGIN
+                INSERT INTO car_changes (car_id, op, row) VALUES (new.id, 'upsert', {change_row_sql('new')});
+            END
+        ''', '''
+            CREATE TRIGGER IF NOT EXISTS car_changes_delete AFTER DELETE ON cars BEGIN
+                INSERT INTO car_changes (car_id, op, row) VALUES (old.id, 'delete', NULL);
+            END
+        '''),
+    ]),
+    
+    Migration(12, "Skip summary updates that change nothing they count", [
+        # Updates that rewrite every column (Session.flush, sync) fired the
+        # stats and facet triggers for every car. Now a car only moves
+        # between summary rows when its key changes, and a new price within
+        # the same stats row adjusts the total in place.
+        Step("Recreate car_stats and car_facets update triggers", '''
+            DROP TRIGGER IF EXISTS car_stats_update
+        ''', f'''
+            CREATE TRIGGER car_stats_update AFTER UPDATE OF is_custom, make, fuel_type ON cars
+            WHEN {STATS_KEY_CHANGED}
+            BEGIN
+                UPDATE car_stats SET car_count = car_count - 1, total_price = total_price - old.price
+                WHERE {STATS_MATCH_OLD};
+                DELETE FROM car_stats WHERE {STATS_MATCH_OLD} AND car_count <= 0;
+                INSERT INTO car_stats (is_custom, make, fuel_type, car_count, total_price)
+                VALUES ({STATS_KEY_NEW}, 1, new.price)
+                ON CONFLICT (is_custom, make, fuel_type) DO UPDATE
+                SET car_count = car_count + 1, total_price = total_price + excluded.total_price;
+            END
+        ''', f'''
+            CREATE TRIGGER IF NOT EXISTS car_stats_price AFTER UPDATE OF price ON cars
+            WHEN old.price IS NOT new.price AND NOT ({STATS_KEY_CHANGED})
+            BEGIN
+                UPDATE car_stats SET total_price = total_price - old.price + new.price
+                WHERE {STATS_MATCH_OLD};
+            END
+        ''', '''
+            DROP TRIGGER IF EXISTS car_facets_update
+        ''', f'''
+            CREATE TRIGGER car_facets_update AFTER UPDATE OF is_custom, make, fuel_type, year, price ON cars
+            WHEN {FACET_KEY_CHANGED}
+            BEGIN
+                UPDATE car_facets SET car_count = car_count - 1 WHERE {FACET_MATCH_OLD};
+                DELETE FROM car_facets WHERE {FACET_MATCH_OLD} AND car_count <= 0;
+                INSERT INTO car_facets (is_custom, make, fuel_type, decade, price_bucket, car_count)
+                VALUES ({FACET_KEY_NEW}, 1)
+                ON CONFLICT (is_custom, make, fuel_type, decade, price_bucket) DO UPDATE
+                SET car_count = car_count + 1;
+            END
+        '''),
+    ]),
+    
+    Migration(13, "Index fuel type in make/model order", [
+        # Browsing one fuel type across stock and custom cars matched
+        # idx_cars_fuel_price and sorted every page; this index returns the
+        # cars already in page order
+        Index('idx_cars_fuel_make_model', 'cars', 'fuel_type, make, model, id'),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+# Version that only has the cars table; later migrations add derived structures
+BASE_VERSION = 1
+
+def current_version(connection):
+    """Return the schema version recorded in the database"""
+    return connection.execute('PRAGMA user_version').fetchone()[0]
+
+def pending_migrations(connection):
+    """Return the migrations newer than the database's schema version"""
+    version = current_version(connection)
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+def count_cars(connection):
+    """Number of cars, or 0 if the table doesn't exist yet"""
+    exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='cars'").fetchone()
+    if not exists:
+        return 0
+    return connection.execute('SELECT COUNT(*) FROM cars').fetchone()[0]
+
+def migrate(connection, dry_run=False, report=None):
+    """
+    Apply every pending migration in order.
+    
+    Args:
+        connection: sqlite3 connection to upgrade
+        dry_run (bool): Only report what would run and how long it should take
+        report (callable): Called with a progress message for each step
+    
+    Returns:
+        list: (migration, estimated_seconds) for each pending migration
+    """
+    connection.commit()
+    pending = pending_migrations(connection)
+    if not pending:
+        return []
+    
+    row_count = count_cars(connection)
+    plan = [(migration, migration.estimate(row_count)) for migration in pending]
+    if dry_run:
+        return plan
+    
+    for migration, _ in plan:
+        for step in migration.steps:
+            start = time.perf_counter()
+            step.apply(connection)
+            if report:
+                report(f"  v{migration.version}: {step.description} ({time.perf_counter() - start:.2f}s)")
+        connection.execute(f'PRAGMA user_version = {migration.version}')
+        connection.commit()
+    return plan
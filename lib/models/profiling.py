@@ -0,0 +1,250 @@
+# lib/models/profiling.py
+
+"""
+Query profiling for the data access layer.
+
+While enabled, every cursor handed out by get_cursor() and transaction()
+is a ProfilingCursor that times each statement, counts the rows fetched
+from it and captures its EXPLAIN QUERY PLAN the first time the statement
+is seen. Statements whose plan scans a whole table or sorts in a
+temporary B-tree are flagged, unless they only read the small summary
+tables. When disabled the pool hands out plain sqlite3 cursors again, so
+the only cost left is a class lookup.
+
+Set CAR_COLLECTION_PROFILE=<path> to profile a whole run and write the
+metrics to <path> as JSON when the process exits.
+"""
+
+import atexit
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from . import ConnectionPool
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+# "SCAN cars" is a full table scan; "SCAN cars USING INDEX ..." and virtual
+# table scans are not
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+TABLE_READ = re.compile(r'^(?:SCAN|SEARCH) (\w+)')
+SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+# Tables small by construction (a row per summary key, term, collection or
+# replica): scanning or sorting them is expected and not flagged
+SMALL_TABLES = frozenset(('car_stats', 'car_facets', 'car_histograms', 'change_counter',
+                          'collections', 'search_terms', 'sync_checkpoints'))
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+class QueryStats:
+    """Running totals for one normalized SQL statement"""
+    
+    __slots__ = ('sql', 'calls', 'total_seconds', 'max_seconds', 'rows', 'buckets', 'plan', 'warnings')
+    
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.plan = None
+        self.warnings = []
+    
+    def add(self, seconds):
+        self.calls += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        milliseconds = seconds * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if milliseconds < bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+    
+    def percentile(self, fraction):
+        """Approximate latency percentile in ms (the upper bound of its bucket)"""
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_seconds * 1000
+        return 0.0
+    
+    def to_dict(self):
+        return {
+            'sql': self.sql,
+            'calls': self.calls,
+            'total_ms': self.total_seconds * 1000,
+            'mean_ms': self.total_seconds * 1000 / self.calls if self.calls else 0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max_seconds * 1000,
+            'rows': self.rows,
+            'histogram': {
+                (f"<{bound}ms" if index < len(LATENCY_BUCKETS_MS) else f">={LATENCY_BUCKETS_MS[-1]}ms"): count
+                for index, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.buckets))
+            },
+            'plan': self.plan,
+            'warnings': self.warnings,
+        }
+
+class Profiler:
+    """Collects QueryStats from every ProfilingCursor"""
+    
+    def __init__(self):
+        self.enabled = False
+        self.started = None
+        self._queries = {}
+        self._lock = threading.Lock()
+    
+    def enable(self):
+        """Start instrumenting cursors handed out by the connection pool"""
+        self.enabled = True
+        self.started = self.started or time.time()
+        ConnectionPool.cursor_factory = ProfilingCursor
+    
+    def disable(self):
+        """Go back to plain cursors; collected metrics are kept"""
+        self.enabled = False
+        ConnectionPool.cursor_factory = sqlite3.Cursor
+    
+    def reset(self):
+        """Forget all collected metrics"""
+        with self._lock:
+            self._queries = {}
+        self.started = time.time() if self.enabled else None
+    
+    def stats_for(self, sql):
+        """Return the QueryStats for sql and whether it was seen for the first time"""
+        key = ' '.join(sql.split())
+        with self._lock:
+            stats = self._queries.get(key)
+            if stats is None:
+                stats = self._queries[key] = QueryStats(key)
+                return stats, True
+            return stats, False
+    
+    def record(self, stats, seconds):
+        with self._lock:
+            stats.add(seconds)
+    
+    def add_rows(self, stats, count):
+        with self._lock:
+            stats.rows += count
+    
+    def report(self):
+        """Per-statement metrics, slowest total time first"""
+        with self._lock:
+            queries = [stats.to_dict() for stats in self._queries.values()]
+        return sorted(queries, key=lambda query: -query['total_ms'])
+    
+    def flagged(self):
+        """Statements whose query plan raised a warning"""
+        return [query for query in self.report() if query['warnings']]
+    
+    def dump(self, path):
+        """Write every metric to path as JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'started': self.started, 'dumped': time.time(), 'queries': self.report()}, f, indent=2)
+    
+    def format_report(self, limit=15):
+        """Human-readable summary of the slowest statements"""
+        lines = [f"{'Calls':>7} {'Total ms':>10} {'Mean ms':>9} {'p95 ms':>8} {'Rows':>9}  Statement"]
+        for query in self.report()[:limit]:
+            sql = query['sql'] if len(query['sql']) <= 70 else query['sql'][:67] + '...'
+            lines.append(f"{query['calls']:>7} {query['total_ms']:>10.2f} {query['mean_ms']:>9.3f} "
+                         f"{query['p95_ms']:>8.2f} {query['rows']:>9,}  {sql}")
+            for warning in query['warnings']:
+                lines.append(f"{'':>47}⚠️  {warning}")
+        return '\n'.join(lines)
+
+PROFILER = Profiler()
+
+class ProfilingCursor(sqlite3.Cursor):
+    """sqlite3 cursor that reports timings and fetched rows to PROFILER"""
+    
+    _stats = None
+    
+    def execute(self, sql, parameters=()):
+        stats, first = PROFILER.stats_for(sql)
+        if first:
+            explain(stats, self.connection, sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            PROFILER.record(stats, time.perf_counter() - start)
+            self._stats = stats
+    
+    def executemany(self, sql, seq_of_parameters):
+        stats, _ = PROFILER.stats_for(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            PROFILER.record(stats, time.perf_counter() - start)
+            self._stats = None
+    
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self._stats:
+            PROFILER.add_rows(self._stats, 1)
+        return row
+    
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self._stats:
+            PROFILER.add_rows(self._stats, len(rows))
+        return rows
+    
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._stats:
+            PROFILER.add_rows(self._stats, len(rows))
+        return rows
+    
+    def __next__(self):
+        row = super().__next__()
+        if self._stats:
+            PROFILER.add_rows(self._stats, 1)
+        return row
+
+def explain(stats, connection, sql, parameters):
+    """Store the statement's query plan on stats and flag scans and temp sorts"""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return
+    try:
+        plan = [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+    except sqlite3.Error:
+        return
+    stats.plan = plan
+    # Statements that only read the summary tables are cheap however they run
+    tables = {match.group(1) for match in map(TABLE_READ.match, plan) if match}
+    if tables and tables <= SMALL_TABLES:
+        return
+    # Scanning a materialized subquery reads its result, not a table
+    subqueries = {match.group(1) for match in map(SUBQUERY.match, plan) if match}
+    for detail in plan:
+        match = FULL_SCAN.match(detail)
+        if match and match.group(1) not in subqueries and match.group(1) not in SMALL_TABLES:
+            stats.warnings.append(f"Full table scan of {match.group(1)}")
+        elif TEMP_SORT.search(detail):
+            stats.warnings.append(f"Sorts in a temporary B-tree ({detail})")
+
+def enable(dump_path=None):
+    """Enable profiling, optionally writing the metrics to dump_path at exit"""
+    PROFILER.enable()
+    if dump_path:
+        atexit.register(PROFILER.dump, dump_path)
+
+def disable():
+    """Disable profiling"""
+    PROFILER.disable()
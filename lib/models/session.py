@@ -0,0 +1,222 @@
+# lib/models/session.py
+
+from . import current_pool, get_connection
+from .car import Car, INSERT_SQL, MAX_IN_PARAMETERS
+
+# Columns an update can change, in the order they are compared and written
+UPDATE_FIELDS = ('make', 'model', 'year', 'engine', 'horsepower', 'price', 'fuel_type', 'is_custom')
+UPDATE_COLUMNS = ', '.join(UPDATE_FIELDS)
+
+class Session:
+    """
+    Unit of work that batches Car inserts, updates and deletes.
+    
+    Changes are queued by add() and delete() and written by flush() with one
+    executemany per kind of change (updates are grouped by which columns
+    changed), all inside a single transaction that commit() ends. Used as a context manager, the session commits on a clean
+    exit and rolls back if the block raises:
+    
+        with Session() as session:
+            session.add(car)
+            session.delete(other_car)
+    
+    savepoint() marks a point that a failing block can be rolled back to
+    without losing earlier work.
+    """
+    
+    def __init__(self, batch_size=10000):
+        """
+        Args:
+            batch_size (int): Pending changes that trigger an automatic flush
+        """
+        self.batch_size = batch_size
+        self._new = {}
+        self._dirty = {}
+        self._deleted = {}
+        self._inserted = []
+        self._touched = {}
+        self._savepoints = 0
+        self._active = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+    
+    def add(self, car):
+        """Queue a new car for insertion or an existing one for update"""
+        if car.id is None:
+            if id(car) not in self._new:
+                self._new[id(car)] = car
+        else:
+            self._deleted.pop(car.id, None)
+            self._dirty[car.id] = car
+        self._autoflush()
+    
+    def delete(self, car):
+        """Queue a car for deletion (an unsaved car is simply dropped)"""
+        if car.id is None:
+            self._new.pop(id(car), None)
+            return
+        self._dirty.pop(car.id, None)
+        self._deleted[car.id] = car
+        self._autoflush()
+    
+    def _autoflush(self):
+        if len(self._new) + len(self._dirty) + len(self._deleted) >= self.batch_size:
+            self.flush()
+    
+    def _begin(self):
+        if not self._active:
+            get_connection()
+            self._pool = current_pool()
+            self._cursor = self._pool.begin()
+            # Same page cache as Car.bulk_insert: a batch touches index pages all over the file
+            self._cursor.execute('PRAGMA cache_size=-65536')
+            self._active = True
+        return self._cursor
+    
+    def flush(self):
+        """Write every pending change inside the session's transaction"""
+        if not (self._new or self._dirty or self._deleted):
+            return
+        cursor = self._begin()
+        
+        if self._new:
+            cursor.executemany(INSERT_SQL, [
+                (car.make, car.model, car.year, car.engine, car.horsepower,
+                 car.price, car.fuel_type, car.date_added, car.is_custom)
+                for car in self._new.values()
+            ])
+            # AUTOINCREMENT hands out consecutive IDs to rows inserted back to
+            # back in one write transaction, so they can be assigned in order
+            last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+            first_id = last_id - len(self._new) + 1
+            for offset, car in enumerate(self._new.values()):
+                car.id = first_id + offset
+                self._touched[car.id] = car
+            self._inserted.extend(self._new.values())
+            self._new = {}
+        
+        if self._dirty:
+            for columns, rows in self._changed_columns(cursor).items():
+                assignments = ', '.join(f'{column}=?' for column in columns)
+                cursor.executemany(f'UPDATE cars SET {assignments} WHERE id=?', rows)
+            self._touched.update(self._dirty)
+            self._dirty = {}
+        
+        if self._deleted:
+            cursor.executemany('DELETE FROM cars WHERE id=?', [(car_id,) for car_id in self._deleted])
+            for car_id in self._deleted:
+                self._touched[car_id] = None
+            self._deleted = {}
+    
+    def _changed_columns(self, cursor):
+        """
+        Group the dirty cars' updates by the set of columns that changed.
+        
+        Writing only those columns lets SQLite skip the indexes and the
+        UPDATE OF triggers on every other column, which is most of the cost
+        of an update; cars that did not change at all are not written.
+        """
+        dirty = list(self._dirty)
+        updates = {}
+        for start in range(0, len(dirty), MAX_IN_PARAMETERS):
+            chunk = dirty[start:start + MAX_IN_PARAMETERS]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, {UPDATE_COLUMNS} FROM cars WHERE id IN ({placeholders})', chunk)
+            for car_id, *stored in cursor.fetchall():
+                car = self._dirty[car_id]
+                values = [getattr(car, field) for field in UPDATE_FIELDS]
+                changed = tuple(index for index, value in enumerate(values) if value != stored[index])
+                if changed:
+                    columns = tuple(UPDATE_FIELDS[index] for index in changed)
+                    row = [values[index] for index in changed]
+                    row.append(car_id)
+                    updates.setdefault(columns, []).append(row)
+        return updates
+    
+    def commit(self):
+        """Flush pending changes and commit the transaction"""
+        self.flush()
+        if self._active:
+            self._pool.end(commit=True)
+            self._active = False
+        cache = Car._identity_map()
+        for car_id, car in self._touched.items():
+            if car is None:
+                cache.invalidate(car_id)
+            else:
+                cache.put(car_id, car)
+        self._reset()
+    
+    def rollback(self):
+        """Discard pending changes and roll back everything flushed so far"""
+        if self._active:
+            self._pool.end(commit=False)
+            self._active = False
+        for car in self._inserted:
+            car.id = None
+        cache = Car._identity_map()
+        for car_id in self._touched:
+            cache.invalidate(car_id)
+        self._new, self._dirty, self._deleted = {}, {}, {}
+        self._reset()
+    
+    def _reset(self):
+        self._inserted = []
+        self._touched = {}
+        self._savepoints = 0
+    
+    def savepoint(self):
+        """
+        Context manager for a block that can fail on its own.
+        
+        Changes made inside the block are flushed when it exits cleanly; if
+        it raises, they are rolled back to the savepoint and the exception
+        propagates, leaving earlier changes in the session intact.
+        """
+        return _Savepoint(self)
+
+class _Savepoint:
+    """A named SAVEPOINT within a Session's transaction"""
+    
+    def __init__(self, session):
+        self.session = session
+    
+    def __enter__(self):
+        session = self.session
+        session.flush()
+        cursor = session._begin()
+        session._savepoints += 1
+        self.name = f"sp_{session._savepoints}"
+        self.pending = (dict(session._new), dict(session._dirty), dict(session._deleted))
+        self.inserted = len(session._inserted)
+        self.touched = dict(session._touched)
+        cursor.execute(f'SAVEPOINT {self.name}')
+        return session
+    
+    def __exit__(self, exc_type, exc, traceback):
+        session = self.session
+        cursor = session._cursor
+        if exc_type is None:
+            session.flush()
+            cursor.execute(f'RELEASE {self.name}')
+            return False
+        
+        cursor.execute(f'ROLLBACK TO {self.name}')
+        cursor.execute(f'RELEASE {self.name}')
+        for car in session._inserted[self.inserted:]:
+            car.id = None
+        for car_id in session._touched:
+            if car_id not in self.touched:
+                Car._identity_map().invalidate(car_id)
+        del session._inserted[self.inserted:]
+        session._touched = self.touched
+        session._new, session._dirty, session._deleted = self.pending
+        return False
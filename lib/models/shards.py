@@ -0,0 +1,337 @@
+# lib/models/shards.py
+
+"""
+A catalog split across several SQLite files.
+
+Cars are placed in a shard by a CRC32 hash of their make, so every make
+lives in exactly one file and per-make queries touch a single shard.
+Each shard is an ordinary catalog database with its own connection pool,
+schema, search indexes and summaries, so it can be loaded, migrated and
+backed up on its own. Writes to different shards proceed in parallel
+instead of queueing behind one file's write lock.
+
+Reads that span the catalog fan out: every shard runs the ordinary Car
+query on a thread pool (sqlite3 releases the GIL while a query runs), and
+the per-shard results are merged back into one ordering.
+
+Cars added to a shard take IDs from its own range (shard number << 40),
+but split() copies the source catalog's IDs as they are, and a replica or
+snapshot holds the same IDs as the file it came from. Loaded cars are
+therefore cached per database: each shard's pool keeps its own identity
+map, separate from Car.cache.
+"""
+
+import glob
+import heapq
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from . import ConnectionPool, get_connection, use_database, create_tables, drop_derived_tables
+from .car import Car, CAR_COLUMNS
+from .migrations import LOG_LOADED_CARS_SQL
+
+SHARD_ID_BITS = 40
+SHARD_FILE_PATTERN = 'shard-{:03d}.db'
+
+def shard_index(make, shard_count):
+    """Shard number for a make; stable across processes and Python versions"""
+    return zlib.crc32((make or '').casefold().encode('utf-8')) % shard_count
+
+def shard_paths(directory):
+    """Shard files in a directory, in shard order"""
+    return sorted(glob.glob(os.path.join(directory, SHARD_FILE_PATTERN.replace('{:03d}', '[0-9]' * 3))))
+
+class ShardedCatalog:
+    """
+    Car queries over a directory of shard files.
+    
+    Mirrors the Car class methods used for browsing, searching and
+    statistics, plus save(), delete() and bulk_insert() routed by make.
+    
+    Usage:
+        catalog = ShardedCatalog.create('shards', 4)   # or ShardedCatalog('shards')
+        catalog.bulk_insert(cars)
+        porsches = catalog.search('porsche')
+    """
+    
+    def __init__(self, directory, max_workers=None):
+        paths = shard_paths(directory)
+        if not paths:
+            raise ValueError(f"No shard files found in {directory!r}")
+        self.directory = directory
+        self.pools = [ConnectionPool(path, seed_samples=False) for path in paths]
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or len(paths),
+                                           thread_name_prefix='shard')
+        for index in range(len(self.pools)):
+            self.run(index, _reserve_ids, index)
+    
+    @classmethod
+    def create(cls, directory, shard_count, max_workers=None):
+        """Create shard_count empty shard files in directory and open them"""
+        if shard_paths(directory):
+            raise ValueError(f"{directory!r} already holds shards")
+        os.makedirs(directory, exist_ok=True)
+        for index in range(shard_count):
+            with use_database(ConnectionPool(os.path.join(directory, SHARD_FILE_PATTERN.format(index)),
+                                             seed_samples=False)) as pool:
+                get_connection()
+                pool.close_all()
+        return cls(directory, max_workers)
+    
+    @classmethod
+    def split(cls, source, directory, shard_count, max_workers=None):
+        """
+        Create shards in directory from an existing catalog database.
+        
+        Every shard ATTACHes the source and copies its own makes' cars with
+        one INSERT ... SELECT, keeping their IDs, then rebuilds its indexes
+        and summaries in a single pass. Shards are filled in parallel.
+        """
+        catalog = cls.create(directory, shard_count, max_workers)
+        catalog.fan_out_indexed(_copy_shard, source, shard_count)
+        return catalog
+    
+    def __len__(self):
+        return len(self.pools)
+    
+    def close(self):
+        """Stop the worker threads and close every shard connection"""
+        self.executor.shutdown()
+        for pool in self.pools:
+            pool.close_all()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+    
+    # Routing
+    
+    def shard_for(self, make):
+        """Shard number holding a make's cars"""
+        return shard_index(make, len(self.pools))
+    
+    def run(self, index, function, *args, **kwargs):
+        """Call function against one shard, on the calling thread"""
+        with use_database(self.pools[index]):
+            return function(*args, **kwargs)
+    
+    def fan_out(self, function, *args, **kwargs):
+        """Call function against every shard in parallel; results in shard order"""
+        futures = [self.executor.submit(self.run, index, function, *args, **kwargs)
+                   for index in range(len(self.pools))]
+        return [future.result() for future in futures]
+    
+    def fan_out_indexed(self, function, *args):
+        """Like fan_out, passing each call its shard number first"""
+        futures = [self.executor.submit(self.run, index, function, index, *args)
+                   for index in range(len(self.pools))]
+        return [future.result() for future in futures]
+    
+    # Reads
+    
+    def get_all(self):
+        """Every car in make/model order"""
+        return list(heapq.merge(*self.fan_out(Car.get_all), key=_browse_key))
+    
+    def iter_all(self, batch_size=500, where=None, after=None):
+        """
+        Lazily yield cars in make/model order, merging one keyset-paged
+        stream per shard (a make filter reads only its own shard).
+        """
+        where = where or {}
+        if where.get('make') is not None:
+            index = self.shard_for(where['make'])
+            yield from _ShardIterator(self.pools[index], Car.iter_all, batch_size, where, after)
+            return
+        streams = [_ShardIterator(pool, Car.iter_all, batch_size, where, after) for pool in self.pools]
+        yield from heapq.merge(*streams, key=_browse_key)
+    
+    def get_collection(self, is_custom=True, make=None, **filters):
+        """Cars matching Car.get_collection filters, in make/model order"""
+        if make is not None:
+            return self.run(self.shard_for(make), lambda: list(Car.get_collection(is_custom, make, **filters)))
+        results = self.fan_out(lambda: list(Car.get_collection(is_custom, **filters)))
+        return list(heapq.merge(*results, key=_browse_key))
+    
+    def get_by_id(self, car_id):
+        """A car by ID, asking the shard that issued the ID first"""
+        hinted = car_id >> SHARD_ID_BITS
+        order = ([hinted] if hinted < len(self.pools) else []) + [i for i in range(len(self.pools)) if i != hinted]
+        for index in order:
+            car = self.run(index, Car.get_by_id, car_id)
+            if car is not None:
+                return car
+        return None
+    
+    def search(self, query, limit=None, offset=0):
+        """
+        Full-text search across every shard, best match first.
+        
+        Each shard returns its own best offset + limit matches with their
+        BM25 scores, which are merged into one ranking; matches a shard
+        left unranked come after every ranked one.
+        """
+        wanted = None if limit is None else offset + limit
+        results = self.fan_out(Car.search_ranked, query, wanted)
+        merged = heapq.merge(*results, key=lambda match: (match[1] is None, match[1] or 0))
+        end = None if limit is None else offset + limit
+        return [car for car, _ in islice(merged, offset, end)]
+    
+    def get_collection_stats(self, is_custom=None, make=None):
+        """Car.get_collection_stats combined over the shards"""
+        if make is not None:
+            return self.run(self.shard_for(make), Car.get_collection_stats, is_custom, make)
+        total_cars = 0
+        total_value = 0
+        fuel_breakdown = {}
+        make_counts = {}
+        most_expensive = None
+        for stats in self.fan_out(Car.get_collection_stats, is_custom):
+            total_cars += stats['total_cars']
+            total_value += stats['total_value']
+            for fuel_type, count in stats['fuel_breakdown'].items():
+                fuel_breakdown[fuel_type] = fuel_breakdown.get(fuel_type, 0) + count
+            # Every make lives in one shard, so each shard's top makes are exact
+            make_counts.update(stats['make_breakdown'])
+            if stats['most_expensive'] and (most_expensive is None or stats['most_expensive'][2] > most_expensive[2]):
+                most_expensive = stats['most_expensive']
+        top_makes = sorted(make_counts.items(), key=lambda item: (-item[1], item[0]))[:5]
+        return {
+            'total_cars': total_cars,
+            'total_value': total_value,
+            'avg_price': total_value / total_cars if total_cars else 0,
+            'most_expensive': most_expensive,
+            'fuel_breakdown': dict(sorted(fuel_breakdown.items())),
+            'make_breakdown': dict(top_makes)
+        }
+    
+    def change_version(self):
+        """Sum of the shards' change counters; increases with every write to any shard"""
+        return sum(self.fan_out(Car.change_version))
+    
+    # Writes
+    
+    def save(self, car):
+        """
+        Insert or update a car in its make's shard.
+        
+        A saved car whose make now belongs to another shard is moved there
+        and receives an ID from that shard.
+        """
+        index = self.shard_for(car.make)
+        if car.id is not None and not self.run(index, _holds, car.id):
+            previous = self.get_by_id(car.id)
+            if previous is not None:
+                self.delete(previous)
+            car.id = None
+        self.run(index, car.save)
+    
+    def delete(self, car):
+        """Delete a car from the shard holding it"""
+        for index in range(len(self.pools)):
+            if self.run(index, _holds, car.id):
+                self.run(index, car.delete)
+                return
+    
+    def bulk_insert(self, cars, batch_size=10000, skip_invalid=False):
+        """
+        Insert many cars, writing every shard's share of each batch in parallel.
+        
+        Returns:
+            int: Number of cars inserted
+        """
+        cars = iter(cars)
+        inserted = 0
+        while True:
+            chunk = list(islice(cars, batch_size * len(self.pools)))
+            if not chunk:
+                return inserted
+            parts = [[] for _ in self.pools]
+            for car in chunk:
+                make = car.make if isinstance(car, Car) else car.get('make')
+                parts[self.shard_for(make)].append(car)
+            futures = [self.executor.submit(self.run, index, Car.bulk_insert, part, batch_size, skip_invalid)
+                       for index, part in enumerate(parts) if part]
+            inserted += sum(future.result() for future in futures)
+    
+    def backup(self, destination):
+        """
+        Copy every shard into destination with SQLite's online backup,
+        one file per shard, while readers and writers carry on.
+        
+        Returns:
+            list: Paths of the backup files
+        """
+        os.makedirs(destination, exist_ok=True)
+        paths = [os.path.join(destination, os.path.basename(pool.database)) for pool in self.pools]
+        self.fan_out_indexed(lambda index: _backup_current(paths[index]))
+        return paths
+
+def _browse_key(car):
+    return (car.make, car.model, car.id)
+
+def _holds(car_id):
+    return get_connection().execute('SELECT 1 FROM cars WHERE id = ?', (car_id,)).fetchone() is not None
+
+def _reserve_ids(index):
+    """Start the current shard's AUTOINCREMENT at its own ID range"""
+    connection = get_connection()
+    first_id = index << SHARD_ID_BITS
+    row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'cars'").fetchone()
+    if row is None:
+        connection.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('cars', ?)", (first_id,))
+    elif row[0] < first_id:
+        connection.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'cars'", (first_id,))
+    connection.commit()
+
+def _copy_shard(index, source, shard_count):
+    """Fill the current (empty) shard with its makes' cars from the source database"""
+    drop_derived_tables()
+    connection = get_connection()
+    connection.create_function('shard_index', 2, shard_index, deterministic=True)
+    connection.execute('ATTACH DATABASE ? AS source', (source,))
+    try:
+        connection.execute(f'''
+            INSERT INTO cars ({CAR_COLUMNS})
+            SELECT {CAR_COLUMNS} FROM source.cars WHERE shard_index(make, ?) = ?
+        ''', (shard_count, index))
+        # New IDs must not collide with IDs copied into the other shards
+        connection.execute('''
+            UPDATE sqlite_sequence SET seq = MAX(seq, IFNULL((
+                SELECT MAX(seq) FROM source.sqlite_sequence WHERE name = 'cars'), 0))
+            WHERE name = 'cars'
+        ''')
+        connection.execute(LOG_LOADED_CARS_SQL, (0,))
+        connection.commit()
+    finally:
+        connection.execute('DETACH DATABASE source')
+    create_tables()
+
+def _backup_current(path):
+    target = ConnectionPool(path, seed_samples=False).connect()
+    try:
+        get_connection().backup(target)
+    finally:
+        target.close()
+
+class _ShardIterator:
+    """Iterator over a Car generator that runs each step against one shard"""
+    
+    def __init__(self, pool, function, *args):
+        self.pool = pool
+        self.iterator = None
+        self.function = function
+        self.args = args
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        with use_database(self.pool):
+            if self.iterator is None:
+                self.iterator = self.function(*self.args)
+            return next(self.iterator)
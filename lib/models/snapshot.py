@@ -0,0 +1,207 @@
+# lib/models/snapshot.py
+
+"""
+Read-only snapshots of the reference catalog.
+
+A snapshot is an ordinary catalog database holding only the stock
+(is_custom = 0) cars, with every index, summary, histogram and search
+term built in advance, compacted and switched out of WAL mode. It is
+opened with SQLite's immutable=1 flag, so readers take no locks, never
+look for a journal or WAL file and never re-check the file for changes,
+and with a memory map, so pages are read straight from the OS page cache
+instead of being copied into each connection's own cache. Any number of
+processes can share one snapshot file at the cost of a single copy in
+memory, and a freshly started process can answer queries without
+warming up.
+
+Because readers assume the file never changes, a snapshot is never
+written in place: build() writes a new file and renames it over the old
+one, which readers that already have it open keep seeing until they
+reopen. A JSON manifest next to the file records its SHA-256 checksum,
+size, car count and schema version.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from . import ConnectionPool, MAX_IDLE_CONNECTIONS, get_connection, use_database, create_tables, drop_derived_tables
+from .car import Car, CAR_COLUMNS
+from .migrations import LATEST_VERSION, LOG_LOADED_CARS_SQL, current_version
+from . import fuzzy, histograms
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+# Upper bound on the memory map; SQLite clamps it to its compile-time limit
+MMAP_SIZE = 1 << 40
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# Snapshot pools already opened in this process, by absolute path
+_pools = {}
+
+class SnapshotPool(ConnectionPool):
+    """Connection pool over an immutable, memory-mapped snapshot file"""
+    
+    read_only = True
+    
+    def __init__(self, database, manifest, max_idle=MAX_IDLE_CONNECTIONS):
+        super().__init__(database, max_idle, seed_samples=False)
+        self.manifest = manifest
+        # Snapshots are built at the latest schema version and can't be migrated
+        self.schema_ready = True
+    
+    def connect(self):
+        """Open a read-only connection that trusts the file never to change"""
+        uri = Path(self.database).resolve().as_uri() + '?mode=ro&immutable=1'
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        connection.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        return connection
+
+def manifest_path(path):
+    return path + MANIFEST_SUFFIX
+
+def read_manifest(path):
+    """The manifest written alongside a snapshot"""
+    try:
+        with open(manifest_path(path), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"{path} has no manifest; rebuild the snapshot") from None
+
+def checksum(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build(path, source):
+    """
+    Compile the stock cars of the source database into a snapshot at path.
+    
+    The cars are copied with one INSERT ... SELECT into an empty file, the
+    derived tables are rebuilt in a single pass, histograms and search
+    terms are filled in, and the file is compacted. The new snapshot and
+    its manifest replace any previous ones only once complete.
+    
+    Returns:
+        dict: The manifest
+    """
+    start = time.perf_counter()
+    staging = path + '.tmp'
+    for leftover in (staging, staging + '-wal', staging + '-shm'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    
+    source_version = _source_version(source)
+    with use_database(ConnectionPool(staging, seed_samples=False)) as pool:
+        _copy_stock_cars(source)
+        for column in histograms.HISTOGRAM_COLUMNS:
+            histograms.rebuild(column)
+        fuzzy.sync_terms(Car.change_version())
+        connection = get_connection()
+        cars = connection.execute('SELECT COUNT(*) FROM cars').fetchone()[0]
+        connection.execute('ANALYZE')
+        connection.commit()
+        connection.execute('PRAGMA journal_mode=DELETE')
+        connection.execute('VACUUM')
+        pool.close_all()
+    
+    manifest = {
+        'sha256': checksum(staging),
+        'bytes': os.path.getsize(staging),
+        'cars': cars,
+        'schema_version': LATEST_VERSION,
+        'source': os.path.abspath(source),
+        'source_version': source_version,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(manifest_path(staging), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, path)
+    os.replace(manifest_path(staging), manifest_path(path))
+    return manifest
+
+def _source_version(source):
+    """Change counter of the source database, migrating it first if needed"""
+    with use_database(ConnectionPool(source, seed_samples=False)) as pool:
+        try:
+            return Car.change_version()
+        finally:
+            pool.close_all()
+
+def _copy_stock_cars(source):
+    """Fill the current (new) database with the source's stock cars"""
+    get_connection()
+    drop_derived_tables()
+    connection = get_connection()
+    connection.execute('ATTACH DATABASE ? AS source', (source,))
+    try:
+        connection.execute(f'''
+            INSERT INTO cars ({CAR_COLUMNS})
+            SELECT {CAR_COLUMNS} FROM source.cars WHERE is_custom = 0
+        ''')
+        connection.execute(LOG_LOADED_CARS_SQL, (0,))
+        connection.commit()
+    finally:
+        connection.execute('DETACH DATABASE source')
+    create_tables()
+
+def _check(path, manifest):
+    if not os.path.exists(path) or os.path.getsize(path) != manifest['bytes']:
+        raise ValueError(f"{path} does not match its manifest; rebuild the snapshot")
+    if manifest.get('schema_version') != LATEST_VERSION:
+        raise ValueError(f"{path} was built for schema version {manifest.get('schema_version')}, "
+                         f"not {LATEST_VERSION}; rebuild the snapshot")
+
+def verify(path):
+    """
+    Check a snapshot against its manifest, recomputing its checksum.
+    
+    Returns:
+        dict: The manifest
+    
+    Raises:
+        ValueError: If the file is missing, changed or built for another schema version
+    """
+    manifest = read_manifest(path)
+    _check(path, manifest)
+    if checksum(path) != manifest['sha256']:
+        raise ValueError(f"{path} does not match its manifest checksum; rebuild the snapshot")
+    return manifest
+
+def open_snapshot(path, verify_checksum=False):
+    """
+    Connection pool for a snapshot, for use with models.use_database().
+    
+    Opening checks the file's size and schema version against its
+    manifest, which is instant; verify_checksum=True also re-hashes the
+    whole file. Pools are reused within a process until the file on disk
+    is replaced by a rebuild.
+    """
+    if verify_checksum:
+        manifest = verify(path)
+    else:
+        manifest = read_manifest(path)
+        _check(path, manifest)
+    
+    key = os.path.abspath(path)
+    pool = _pools.get(key)
+    if pool is None or pool.manifest['sha256'] != manifest['sha256']:
+        if pool is not None:
+            pool.close_all()
+        pool = _pools[key] = SnapshotPool(path, manifest)
+        with use_database(pool):
+            if current_version(get_connection()) != LATEST_VERSION:
+                raise ValueError(f"{path} is not a snapshot for schema version {LATEST_VERSION}")
+    return pool
+
+def is_stale(path, source):
+    """Whether the source database has changed since the snapshot was built from it"""
+    return _source_version(source) != read_manifest(path)['source_version']
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# lib/server.py
+
+"""
+HTTP/JSON query service for Virtual Car Collection Manager
+Run from the project root, e.g. `python lib/server.py --port 8000`
+
+Endpoints (all GET):
+    /cars                 browse one page (make, fuel_type, is_custom, min_/max_year,
+                          min_/max_price, after, limit)
+    /cars/<id>            details for one car
+    /range                cars within price/horsepower/year ranges plus an estimated count
+                          (/cars filters, order_by, desc, after, limit, estimate)
+    /distribution/<col>   percentiles and histogram bins of price, horsepower or year
+    /facets               make/fuel/decade/price counts plus one page of cars (make,
+                          fuel_type, is_custom, year, price, after, limit)
+    /search?q=...         full-text search (limit, offset, fuzzy=1 for typo tolerance)
+    /compare?ids=1,2,3    side-by-side comparison
+    /stats                collection statistics (is_custom, make)
+    /export?format=csv    stream cars as csv, jsonl or txt (same filters as /cars)
+
+With --snapshot PATH every request reads the stock cars from a read-only
+catalog snapshot (see lib/snapshot.py) instead of the live database.
+
+Responses are HTTP/1.1 with keep-alive, gzip-compressed when the client
+accepts it, and tagged with an ETag derived from the cars change counter.
+JSON responses are cached in process per URL and reused until the counter
+moves, so repeat requests are answered without querying SQLite.
+"""
+
+import argparse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+import gzip
+import io
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import api
+from models.car import Car
+from models import export, use_database
+from models.snapshot import open_snapshot
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 512
+
+# Seconds a change counter reading is trusted before it is read again
+DEFAULT_REVALIDATE = 0.5
+
+DEFAULT_CACHE_SIZE = 512
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'txt': 'text/plain; charset=utf-8',
+}
+
+class ResponseCache:
+    """LRU cache of encoded responses tagged with the change version they were built at"""
+    
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, version):
+        """Return the cached entry for key if it was built at this version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['version'] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key, entry):
+        """Store an entry, evicting the least recently used one if full"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+class CatalogServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the response cache and change version"""
+    
+    daemon_threads = True
+    
+    def __init__(self, address, revalidate=DEFAULT_REVALIDATE, cache_size=DEFAULT_CACHE_SIZE, verbose=False,
+                 snapshot=None):
+        super().__init__(address, CatalogHandler)
+        self.snapshot = open_snapshot(snapshot) if snapshot else None
+        self.revalidate = revalidate
+        self.verbose = verbose
+        self.cache = ResponseCache(cache_size)
+        self._version = None
+        self._checked = 0.0
+        self._version_lock = threading.Lock()
+    
+    def change_version(self):
+        """
+        Current cars change counter.
+        
+        The counter is read at most once per revalidate interval, so a burst
+        of cached requests costs no database reads at all.
+        """
+        with self._version_lock:
+            now = time.monotonic()
+            if self._version is None or now - self._checked >= self.revalidate:
+                self._version = Car.change_version()
+                self._checked = now
+            return self._version
+    
+    def process_request_thread(self, request, client_address):
+        """Handle one connection, against the snapshot when serving one"""
+        if self.snapshot is None:
+            return super().process_request_thread(request, client_address)
+        with use_database(self.snapshot):
+            return super().process_request_thread(request, client_address)
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """Routes GET requests to the api views"""
+    
+    protocol_version = 'HTTP/1.1'
+    server_version = 'CarCollection/1.0'
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+    
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        parts = [part for part in url.path.split('/') if part]
+        
+        try:
+            if parts == ['export']:
+                self.send_export(params)
+                return
+            view = self.route(parts, params)
+            if view is None:
+                self.send_json(404, {'error': f"Not found: {url.path}"})
+                return
+            self.send_cached(view)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except sqlite3.Error as e:
+            # Locked, busy or unreadable database: worth retrying, unlike a bad request
+            self.send_json(503, {'error': f"Database unavailable: {e}"})
+    
+    def route(self, parts, params):
+        """Return a zero-argument callable producing the JSON payload, or None"""
+        if parts == ['cars']:
+            where = api.parse_filters(params)
+            return lambda: api.browse(where, params.get('after'), params.get('limit', api.DEFAULT_PAGE_SIZE))
+        if parts == ['facets']:
+            selection = api.parse_selection(params)
+            return lambda: api.faceted_browse(selection, params.get('after'), params.get('limit', api.facets.DEFAULT_PAGE_SIZE))
+        if parts == ['range']:
+            where = api.parse_filters(params)
+            descending = api.FILTERS['is_custom'][1](params.get('desc', '0'))
+            estimate_only = api.FILTERS['is_custom'][1](params.get('estimate', '0'))
+            return lambda: api.range_query(where, params.get('order_by', 'price'), descending, params.get('after'),
+                                           params.get('limit', api.DEFAULT_PAGE_SIZE), estimate_only)
+        if len(parts) == 2 and parts[0] == 'distribution':
+            where = api.parse_filters(params)
+            return lambda: api.distribution(parts[1], params.get('bins', 10), where)
+        if len(parts) == 2 and parts[0] == 'cars' and parts[1].isdigit():
+            return lambda: api.details(parts[1])
+        if parts == ['search']:
+            if not params.get('q'):
+                raise ValueError("Missing search query parameter 'q'")
+            fuzzy = api.FILTERS['is_custom'][1](params.get('fuzzy', '0'))
+            return lambda: api.search(params['q'], params.get('limit', api.DEFAULT_PAGE_SIZE), params.get('offset', 0), fuzzy)
+        if parts == ['compare']:
+            ids = [car_id for car_id in params.get('ids', '').split(',') if car_id.strip()]
+            if len(ids) < 2:
+                raise ValueError("Pass at least two car IDs, e.g. ids=1,2")
+            ids = [api.car_id_param(car_id) for car_id in ids]
+            return lambda: api.compare(ids)
+        if parts == ['stats']:
+            where = api.parse_filters({key: params[key] for key in ('is_custom', 'make') if key in params})
+            return lambda: api.stats(where.get('is_custom'), where.get('make'))
+        return None
+    
+    def send_cached(self, view):
+        """Serve a JSON view through the ETag check and response cache"""
+        version = self.server.change_version()
+        etag = f'W/"cars-{version}"'
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        entry = self.server.cache.get(self.path, version)
+        if entry is None:
+            payload = view()
+            if payload is None:
+                self.send_json(404, {'error': "Car not found"})
+                return
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            entry = {
+                'version': version,
+                'body': body,
+                'gzip': gzip.compress(body) if len(body) >= GZIP_MIN_BYTES else None,
+            }
+            self.server.cache.put(self.path, entry)
+        
+        self.send_body(200, entry['body'], entry['gzip'], etag)
+    
+    def send_json(self, status, payload):
+        """Send an uncached JSON response"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_body(status, body, None)
+    
+    def send_body(self, status, body, gzipped, etag=None):
+        """Send a JSON body, choosing the gzip variant if the client accepts it"""
+        if gzipped is not None and self.accepts_gzip():
+            body = gzipped
+            encoding = 'gzip'
+        else:
+            encoding = None
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_export(self, params):
+        """Stream an export with chunked transfer encoding, never holding it in memory"""
+        fmt = params.get('format', 'csv')
+        if fmt not in EXPORT_CONTENT_TYPES:
+            raise ValueError(f"Unsupported export format: {fmt!r} (use csv, jsonl or txt)")
+        where = api.parse_filters(params)
+        batches = export.iter_batches(where)
+        
+        compress = self.accepts_gzip()
+        self.send_response(200)
+        self.send_header('Content-Type', EXPORT_CONTENT_TYPES[fmt])
+        self.send_header('Transfer-Encoding', 'chunked')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Disposition', f'attachment; filename="cars{export.FORMATS[fmt]}"')
+        self.end_headers()
+        
+        stream = ChunkedWriter(self.wfile, compress)
+        f = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+        try:
+            if fmt == 'csv':
+                export.write_csv(f, batches)
+            elif fmt == 'jsonl':
+                export.write_jsonl(f, batches)
+            else:
+                export.write_text(f, batches, where, "CAR CATALOG EXPORT")
+        except (ValueError, sqlite3.Error):
+            # The 200 status has gone out, so an error can't be reported;
+            # dropping the connection without the last chunk marks the
+            # export as truncated rather than complete
+            self.close_connection = True
+            return
+        f.detach()
+        stream.finish()
+    
+    def accepts_gzip(self):
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class ChunkedWriter(io.RawIOBase):
+    """Binary stream that frames writes as HTTP chunks, optionally gzipped"""
+    
+    CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, wfile, compress=False):
+        self.wfile = wfile
+        self.compressor = zlib.compressobj(wbits=31) if compress else None
+        self.buffer = bytearray()
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        data = bytes(data)
+        self.buffer += self.compressor.compress(data) if self.compressor else data
+        if len(self.buffer) >= self.CHUNK_SIZE:
+            self._send_chunk()
+        return len(data)
+    
+    def _send_chunk(self):
+        if self.buffer:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(self.buffer), bytes(self.buffer)))
+            self.buffer.clear()
+    
+    def finish(self):
+        """Flush the remaining data and send the terminating chunk"""
+        if self.compressor:
+            self.buffer += self.compressor.flush()
+        self._send_chunk()
+        self.wfile.write(b'0\r\n\r\n')
+
+def serve(host='127.0.0.1', port=8000, revalidate=DEFAULT_REVALIDATE, cache_size=DEFAULT_CACHE_SIZE, verbose=False,
+          snapshot=None):
+    """Run the service until Ctrl+C"""
+    server = CatalogServer((host, port), revalidate=revalidate, cache_size=cache_size, verbose=verbose,
+                           snapshot=snapshot)
+    source = f" from snapshot {snapshot}" if snapshot else ""
+    print(f"🚗 Serving the car catalog{source} on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🏁 Server stopped.")
+    finally:
+        server.server_close()
+
+def main():
+    """Parse arguments and serve until interrupted"""
+    parser = argparse.ArgumentParser(description="Virtual Car Collection Manager HTTP service")
+    parser.add_argument('--host', default='127.0.0.1', help="address to bind (default 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8000, help="port to listen on (default 8000)")
+    parser.add_argument('--revalidate', type=float, default=DEFAULT_REVALIDATE,
+                        help="seconds between change counter checks (default 0.5)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help="cached responses to keep")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    parser.add_argument('--snapshot', metavar='PATH', help="serve the stock cars from a read-only catalog snapshot")
+    args = parser.parse_args()
+    try:
+        serve(args.host, args.port, args.revalidate, args.cache_size, args.verbose, args.snapshot)
+    except ValueError as e:
+        parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# lib/shard.py
+
+"""
+Split the car catalog across several database files and work with the shards
+e.g. `python lib/shard.py split shards --shards 4`, then `python lib/shard.py info shards`
+"""
+
+import argparse
+import os
+import time
+
+from models import POOL, get_connection
+from models.car import Car
+from models.migrations import current_version
+from models.shards import ShardedCatalog
+
+def main():
+    """Parse arguments and run one shard command"""
+    parser = argparse.ArgumentParser(description="Manage a sharded car catalog")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+    
+    split = commands.add_parser('split', help="create shards from the current database (CAR_COLLECTION_DB)")
+    split.add_argument('directory')
+    split.add_argument('--shards', type=int, default=4, help="number of shard files (default 4)")
+    
+    info = commands.add_parser('info', help="cars, size and schema version of every shard")
+    info.add_argument('directory')
+    
+    backup = commands.add_parser('backup', help="copy every shard with SQLite's online backup")
+    backup.add_argument('directory')
+    backup.add_argument('destination')
+    
+    search = commands.add_parser('search', help="full-text search across the shards")
+    search.add_argument('directory')
+    search.add_argument('query', nargs='+')
+    search.add_argument('--limit', type=int, default=20)
+    
+    stats = commands.add_parser('stats', help="collection statistics across the shards")
+    stats.add_argument('directory')
+    
+    args = parser.parse_args()
+    start = time.perf_counter()
+    
+    if args.command == 'split':
+        with ShardedCatalog.split(POOL.database, args.directory, args.shards) as catalog:
+            counts = catalog.fan_out(lambda: Car.get_collection_stats()['total_cars'])
+        print(f"✅ Split {sum(counts):,} cars from {POOL.database} into {len(counts)} shards "
+              f"in {time.perf_counter() - start:.1f}s: " + ", ".join(f"{count:,}" for count in counts))
+        return
+    
+    with ShardedCatalog(args.directory) as catalog:
+        if args.command == 'info':
+            counts = catalog.fan_out(lambda: Car.get_collection_stats()['total_cars'])
+            versions = catalog.fan_out(lambda: current_version(get_connection()))
+            for pool, count, version in zip(catalog.pools, counts, versions):
+                print(f"{pool.database}: {count:,} cars, {os.path.getsize(pool.database) / 1e6:,.1f} MB, "
+                      f"schema version {version}")
+        elif args.command == 'backup':
+            paths = catalog.backup(args.destination)
+            print(f"✅ Backed up {len(paths)} shards to {args.destination} in {time.perf_counter() - start:.1f}s")
+        elif args.command == 'search':
+            for car in catalog.search(' '.join(args.query), limit=args.limit):
+                print(f"ID: {car.id} | {car} | {car.horsepower:,} HP | ${car.price:,.2f}")
+            print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+        elif args.command == 'stats':
+            for key, value in catalog.get_collection_stats().items():
+                print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
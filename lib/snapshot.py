@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# lib/snapshot.py
+
+"""
+Build and check the read-only snapshot of the reference catalog
+e.g. `python lib/snapshot.py build catalog.snapshot.db`, then
+`python lib/cli.py search Ferrari --snapshot catalog.snapshot.db`
+"""
+
+import argparse
+import sys
+import time
+
+from models import POOL
+from models.snapshot import build, verify, read_manifest, is_stale
+
+def main():
+    """Parse arguments and run one snapshot command"""
+    parser = argparse.ArgumentParser(description="Manage the read-only catalog snapshot")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+    
+    build_command = commands.add_parser('build', help="(re)build a snapshot from the current database (CAR_COLLECTION_DB)")
+    build_command.add_argument('path')
+    build_command.add_argument('--if-stale', action='store_true', help="only rebuild when the database has changed")
+    
+    verify_command = commands.add_parser('verify', help="recompute the checksum and compare it with the manifest")
+    verify_command.add_argument('path')
+    
+    info = commands.add_parser('info', help="show the manifest and whether the database has changed since")
+    info.add_argument('path')
+    
+    args = parser.parse_args()
+    start = time.perf_counter()
+    
+    try:
+        if args.command == 'build':
+            if args.if_stale and not is_stale(args.path, POOL.database):
+                print(f"✅ {args.path} is up to date with {POOL.database}")
+                return 0
+            manifest = build(args.path, POOL.database)
+            print(f"✅ Built {args.path}: {manifest['cars']:,} cars, {manifest['bytes'] / 1e6:,.1f} MB "
+                  f"in {time.perf_counter() - start:.1f}s (sha256 {manifest['sha256'][:16]}…)")
+        elif args.command == 'verify':
+            manifest = verify(args.path)
+            print(f"✅ {args.path} matches its manifest ({manifest['bytes'] / 1e6:,.1f} MB checked "
+                  f"in {time.perf_counter() - start:.2f}s)")
+        elif args.command == 'info':
+            for key, value in read_manifest(args.path).items():
+                print(f"{key}: {value}")
+            stale = is_stale(args.path, POOL.database)
+            print(f"stale: {'yes, ' + POOL.database + ' has changed since' if stale else 'no'}")
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
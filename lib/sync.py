@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# lib/sync.py
+
+"""
+Keep replica catalog databases current by shipping only the changes
+e.g. `python lib/sync.py clone car_collection.db replica.db` once, then
+`python lib/sync.py pull car_collection.db replica.db` whenever wanted
+"""
+
+import argparse
+import sys
+import time
+
+from models import ConnectionPool, use_database
+from models import changes
+
+def main():
+    """Parse arguments and run one sync command"""
+    parser = argparse.ArgumentParser(description="Replicate the car catalog through its change log")
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+    
+    clone = commands.add_parser('clone', help="start a replica as a full copy of the source")
+    clone.add_argument('source')
+    clone.add_argument('replica')
+    
+    pull = commands.add_parser('pull', help="apply the source's new changes to a replica")
+    pull.add_argument('source')
+    pull.add_argument('replica')
+    pull.add_argument('--batch-size', type=int, default=changes.DEFAULT_BATCH_SIZE)
+    
+    status = commands.add_parser('status', help="how many changes a replica is behind its source")
+    status.add_argument('source')
+    status.add_argument('replica')
+    
+    export = commands.add_parser('export', help="write changes to a .jsonl(.gz) file to ship to another machine")
+    export.add_argument('source')
+    export.add_argument('path')
+    export.add_argument('--since', type=int, default=0, help="the replica's checkpoint (see status)")
+    
+    apply_file = commands.add_parser('apply', help="apply a file written by export to a replica")
+    apply_file.add_argument('replica')
+    apply_file.add_argument('path')
+    apply_file.add_argument('--batch-size', type=int, default=changes.DEFAULT_BATCH_SIZE)
+    
+    prune = commands.add_parser('prune', help="delete changes every replica has already applied")
+    prune.add_argument('source')
+    prune.add_argument('--before', type=int, required=True, metavar='SEQ',
+                       help="oldest change to keep (the lowest replica checkpoint + 1)")
+    
+    args = parser.parse_args()
+    start = time.perf_counter()
+    
+    try:
+        if args.command == 'clone':
+            seq = changes.clone(args.source, args.replica)
+            print(f"✅ Cloned {args.source} to {args.replica} at change {seq:,} "
+                  f"in {time.perf_counter() - start:.1f}s")
+        elif args.command == 'pull':
+            with use_database(ConnectionPool(args.replica, seed_samples=False)):
+                result = changes.pull(args.source, args.batch_size)
+            print(f"✅ Read {result['changes']:,} changes and wrote {result['cars']:,} cars in {result['batches']} "
+                  f"batches; {args.replica} is at change {result['seq']:,} ({result['seconds'] * 1000:.1f} ms)")
+        elif args.command == 'status':
+            with use_database(ConnectionPool(args.source, seed_samples=False)):
+                latest = changes.latest_seq()
+            with use_database(ConnectionPool(args.replica, seed_samples=False)):
+                applied = changes.checkpoint(changes.source_name(args.source))
+            print(f"{args.source}: change {latest:,}")
+            print(f"{args.replica}: change {applied:,} ({latest - applied:,} behind)")
+        elif args.command == 'export':
+            with use_database(ConnectionPool(args.source, seed_samples=False)):
+                result = changes.export_changes(args.path, args.since)
+            print(f"✅ Wrote {result['changes']:,} changes (through {result['seq']:,}) to {args.path}")
+        elif args.command == 'apply':
+            with use_database(ConnectionPool(args.replica, seed_samples=False)):
+                result = changes.apply_file(args.path, args.batch_size)
+            print(f"✅ Read {result['changes']:,} changes and wrote {result['cars']:,} cars; "
+                  f"{args.replica} is at change {result['seq']:,}")
+        elif args.command == 'prune':
+            with use_database(ConnectionPool(args.source, seed_samples=False)):
+                deleted = changes.prune(args.before)
+            print(f"✅ Deleted {deleted:,} changes before {args.before:,} from {args.source}")
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
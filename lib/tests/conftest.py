@@ -0,0 +1,21 @@
+# lib/tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+# The application imports its packages from lib/, as when run from there
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import ConnectionPool, get_connection, use_database
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh database seeded with the sample cars, used by every query in the test"""
+    pool = ConnectionPool(str(tmp_path / 'cars.db'))
+    with use_database(pool):
+        # Seed now, before a test opens the file through another pool
+        get_connection()
+        yield pool
+    pool.close_all()
@@ -0,0 +1,93 @@
+# lib/tests/test_changes.py
+
+import pytest
+
+from models import ConnectionPool, get_cursor, use_database
+from models import changes
+from models.car import Car
+
+def all_rows():
+    return get_cursor().execute('SELECT * FROM cars ORDER BY id').fetchall()
+
+def edit_source():
+    """Insert, update and delete a few cars in the current database"""
+    new_car = Car('Garage', 'Special', 2024, '6.0L V12', 800, 500000, is_custom=True)
+    new_car.save()
+    ferrari = Car.get_by_id(1)
+    ferrari.price = 270000
+    ferrari.save()
+    ferrari.price = 275000
+    ferrari.save()
+    Car.get_by_id(2).delete()
+
+@pytest.fixture
+def replica(database, tmp_path):
+    """A pool on a clone of the seeded database, taken before any edits"""
+    path = str(tmp_path / 'replica.db')
+    changes.clone(database.database, path)
+    pool = ConnectionPool(path, seed_samples=False)
+    yield pool
+    pool.close_all()
+
+def test_pull_catches_up_and_is_idempotent(database, replica):
+    edit_source()
+    expected = all_rows()
+    
+    with use_database(replica):
+        first = changes.pull(database.database)
+        assert first['changes'] == 4
+        assert first['cars'] == 3
+        assert all_rows() == expected
+        
+        version = Car.change_version()
+        again = changes.pull(database.database)
+        assert again['changes'] == 0
+        assert Car.change_version() == version
+
+def test_applying_a_batch_twice_writes_nothing(database, replica):
+    edit_source()
+    batch = changes.changes_since(0)
+    name = changes.source_name(database.database)
+    
+    with use_database(replica):
+        seq = changes.checkpoint(name)
+        pending = [change for change in batch if change[0] > seq]
+        assert changes.apply(name, pending) == 3
+        version = Car.change_version()
+        assert changes.apply(name, pending) == 0
+        assert Car.change_version() == version
+
+def test_interrupted_pull_resumes_where_it_stopped(database, replica, monkeypatch):
+    edit_source()
+    expected = all_rows()
+    apply = changes.apply
+    calls = []
+    
+    def fail_second_batch(source, batch):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return apply(source, batch)
+    
+    with use_database(replica):
+        start = changes.checkpoint(changes.source_name(database.database))
+        monkeypatch.setattr(changes, 'apply', fail_second_batch)
+        with pytest.raises(KeyboardInterrupt):
+            changes.pull(database.database, batch_size=2)
+        # Only the first batch was committed, checkpoint included
+        assert changes.checkpoint(changes.source_name(database.database)) == start + 2
+        
+        monkeypatch.setattr(changes, 'apply', apply)
+        resumed = changes.pull(database.database, batch_size=2)
+        assert resumed['changes'] == 2
+        assert all_rows() == expected
+
+def test_pruned_log_requires_a_new_clone(database, replica):
+    edit_source()
+    changes.prune(changes.latest_seq())
+    
+    with use_database(replica):
+        before = all_rows()
+        with pytest.raises(ValueError, match="clone the replica again"):
+            changes.pull(database.database)
+        assert all_rows() == before
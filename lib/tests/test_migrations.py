@@ -0,0 +1,90 @@
+# lib/tests/test_migrations.py
+
+import sqlite3
+
+from models import ConnectionPool, create_tables, drop_derived_tables, get_cursor, use_database
+from models.car import Car
+from models.collection import Collection
+from models.migrations import LATEST_VERSION, current_version
+
+# The cars table as the first release created it, before user_version was set
+BASELINE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS cars (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        make TEXT NOT NULL,
+        model TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        engine TEXT NOT NULL,
+        horsepower INTEGER NOT NULL,
+        price REAL NOT NULL,
+        fuel_type TEXT DEFAULT 'Gasoline',
+        date_added TEXT DEFAULT CURRENT_TIMESTAMP,
+        is_custom BOOLEAN DEFAULT 0
+    )
+'''
+
+INSERT_SQL = '''
+    INSERT INTO cars (make, model, year, engine, horsepower, price, fuel_type, date_added, is_custom)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+STOCK_CARS = [
+    ('Ferrari', '488 GTB', 2022, '3.9L Twin-Turbo V8', 661, 262000, 'Gasoline', '2024-01-01', 0),
+    ('Tesla', 'Model S Plaid', 2023, 'Electric Motors', 1020, 129990, 'Electric', '2024-01-01', 0),
+    ('Rimac', 'Nevera', 2023, 'Four Electric Motors', 1914, 2400000, 'Electric', '2024-01-01', 0),
+]
+
+def baseline_database(path):
+    """
+    A database as the first release left it: stock cars, collection cars
+    stored as is_custom copies of stock cars, and one car the user designed.
+    """
+    connection = sqlite3.connect(path)
+    connection.execute(BASELINE_SCHEMA)
+    connection.executemany(INSERT_SQL, STOCK_CARS)
+    copies = [STOCK_CARS[0][:7] + ('2024-03-01', 1), STOCK_CARS[2][:7] + ('2024-03-02', 1)]
+    connection.executemany(INSERT_SQL, copies)
+    connection.execute(INSERT_SQL, ('Garage', 'Special', 2024, '6.0L V12', 800, 500000, 'Gasoline', '2024-03-03', 1))
+    connection.commit()
+    connection.close()
+
+def test_collection_copies_become_items_of_stock_cars(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    baseline_database(path)
+    
+    pool = ConnectionPool(path)
+    with use_database(pool):
+        assert current_version(pool.get_connection()) == 0
+        cars = {(car.make, car.model): car for car in Car.get_all()}
+        assert current_version(pool.get_connection()) == LATEST_VERSION
+        
+        # The copies are gone; the stock cars and the user's design remain
+        assert len(cars) == 4
+        assert [car.id for car in cars.values() if car.is_custom] == [6]
+        
+        collection = Collection.for_user()
+        assert collection.id == 1
+        items = {car.id: added_at for car, added_at in collection.items()}
+        assert items == {1: '2024-03-01', 3: '2024-03-02', 6: '2024-03-03'}
+        
+        # Summaries and the search index were built from the migrated rows
+        assert Car.get_collection_stats()['total_cars'] == 4
+        assert [car.id for car in Car.search('Nevera')] == [3]
+        assert get_cursor().execute("SELECT COUNT(*) FROM cars WHERE make = 'Ferrari'").fetchone()[0] == 1
+    pool.close_all()
+
+def test_migrating_again_changes_nothing(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    baseline_database(path)
+    pool = ConnectionPool(path)
+    with use_database(pool):
+        Car.get_all()
+        Collection.for_user().add(2)
+        before = sorted(car.id for car in Collection.for_user().cars())
+        
+        # Bulk loads reset the version to the base migration and rerun the rest
+        drop_derived_tables()
+        create_tables()
+        assert sorted(car.id for car in Collection.for_user().cars()) == before == [1, 2, 3, 6]
+        assert len(Car.get_all()) == 4
+    pool.close_all()
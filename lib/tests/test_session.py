@@ -0,0 +1,69 @@
+# lib/tests/test_session.py
+
+import pytest
+
+from models import get_cursor
+from models.car import Car
+from models.session import Session
+
+def make_car(model, price=100000):
+    return Car('Testla', model, 2024, 'Electric Motors', 500, price, 'Electric', is_custom=True)
+
+def car_count():
+    return get_cursor().execute('SELECT COUNT(*) FROM cars').fetchone()[0]
+
+def test_savepoint_rollback_keeps_earlier_changes(database):
+    kept = make_car('Kept')
+    dropped = make_car('Dropped')
+    ferrari = Car.get_by_id(1)
+    original_price = ferrari.price
+    
+    with Session() as session:
+        session.add(kept)
+        with pytest.raises(RuntimeError):
+            with session.savepoint():
+                session.add(dropped)
+                ferrari.price = 1
+                session.add(ferrari)
+                session.flush()
+                assert dropped.id is not None
+                raise RuntimeError("abandon this block")
+    
+    assert kept.id is not None
+    assert dropped.id is None
+    assert Car.get_by_id(kept.id).model == 'Kept'
+    assert get_cursor().execute('SELECT price FROM cars WHERE id = 1').fetchone()[0] == original_price
+    assert car_count() == 20
+
+def test_savepoint_rollback_restores_pending_changes(database):
+    queued = make_car('Queued')
+    with Session() as session:
+        session.add(queued)
+        with pytest.raises(ValueError):
+            with session.savepoint():
+                session.add(make_car('Inside'))
+                raise ValueError("bad row")
+    assert queued.id is not None
+    assert [car.model for car in Car.search('Testla')] == ['Queued']
+
+def test_rollback_discards_everything(database):
+    car = make_car('Gone')
+    with pytest.raises(RuntimeError):
+        with Session() as session:
+            session.add(car)
+            session.flush()
+            raise RuntimeError("abort")
+    assert car.id is None
+    assert car_count() == 19
+
+def test_flush_writes_only_changed_cars(database):
+    before = Car.change_version()
+    cars = Car.get_many([1, 2, 3])
+    cars[1].price += 1000
+    with Session() as session:
+        for car in cars:
+            session.add(car)
+    # One change counter bump: the unchanged cars were not written
+    assert Car.change_version() == before + 1
+    stats = Car.get_collection_stats()
+    assert stats['total_value'] == get_cursor().execute('SELECT SUM(price) FROM cars').fetchone()[0]